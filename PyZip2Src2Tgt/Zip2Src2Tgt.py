@@ -24,20 +24,71 @@
 #
 # ========================================================================
 #
-# TODO: Make sure that the toxicity values being appended to each row
-# are correct both in value and in order for the CASNumber in question.
-# Presently, a dictionary is being used for the toxicity values and it
-# might need to be adjusted to a list object instead to preserve order. 
+# The toxicity values appended to each row are kept, for each CASNumber,
+# as a tuple in the order of the toxicities lookup result column names,
+# so they're appended in that order, whatever the toxicities file's
+# column order, and the CASNumbers can be normalized on both sides
+# of the lookup (--tox_key_normalization).
 #
 # ========================================================================
 
 import argparse
+import array
+import base64
+import bisect
+import collections
+import cProfile
+import concurrent.futures
 import csv
+import datetime
+import hashlib
 import io
+import itertools
+import json
+import locale
+import math
+import mmap
 import os
+import pstats
+import queue
+import re
+import shutil
+import sqlite3
+import struct
 import sys
+import threading
 import time
 import zipfile
+import zlib
+
+# used for compressing the target files with
+# Zstandard, which isn't in the standard library
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# used for being woken up by the file system events of the zip
+# path in watch mode, which otherwise only polls it, as watchdog
+# isn't in the standard library
+try:
+    import watchdog.observers
+except ImportError:
+    watchdog = None
+
+# used for transforming the batches of rows
+# all at once, in arrays, if installed,
+# though only imported once it's needed, as
+# importing it takes a while, e.g. for each
+# of the worker processes (see load_numpy)
+numpy = None
+
+# used for reporting peak memory usage,
+# which isn't available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
 
 # used for sorting dictionaries
 # by either their keys or values
@@ -92,6 +143,10 @@ arg_parser.add_argument('--src_file_extension',
                         type=str,
                         default='.csv',
                         help='source file extension')
+arg_parser.add_argument('--src_extract_to_disk',
+                        action='store_true',
+                        default=False,
+                        help='extract source files to the source path before converting them (debugging), rather than streaming them from the zip archive')
 arg_parser.add_argument('--src_col_delimiter',
                         type=str, default=',',
                         help='source column delimiter')
@@ -99,6 +154,18 @@ arg_parser.add_argument('--src_col_quotechar',
                         type=str,
                         default='"',
                         help='source column quote character')
+arg_parser.add_argument('--src_encoding',
+                        type=str,
+                        default=None,
+                        help='source file encoding, e.g. latin-1 (default is the platform\'s preferred encoding)')
+arg_parser.add_argument('--byte_char_xforms',
+                        action='store_true',
+                        default=False,
+                        help='apply the single-byte character transformations to the raw source bytes, before they\'re decoded and parsed, wherever that gives the same results')
+arg_parser.add_argument('--batch_rows',
+                        type=int,
+                        default=0,
+                        help='number of rows transformed and looked up at a time, all of their cells at once (in NumPy arrays if NumPy is installed), rather than row by row (0=row by row)')
 arg_parser.add_argument('--src_tox_lookup_col_name',
                         type=str,
                         default='CASNumber',
@@ -128,6 +195,36 @@ arg_parser.add_argument('--tgt_col_quotechar',
                         type=str,
                         default='"',
                         help='target column quote character')
+arg_parser.add_argument('--tgt_encoding',
+                        type=str,
+                        default=None,
+                        help='target CSV file encoding, e.g. utf-8 (default is the platform\'s preferred encoding)')
+arg_parser.add_argument('--tgt_format',
+                        type=str,
+                        choices=['csv', 'sqlite'],
+                        default='csv',
+                        help='target file format, either CSV files or SQLite database files')
+arg_parser.add_argument('--partition_by',
+                        type=str,
+                        default=None,
+                        help='target column name whose values partition the rows into <target base name>/<value><target file extension> files, e.g. StateName, or JobStartDate:year for the year of a date')
+arg_parser.add_argument('--partition_max_open',
+                        type=int,
+                        default=64,
+                        help='maximum number of partition files kept open at a time, the least recently used being closed first')
+arg_parser.add_argument('--partition_buffer_rows',
+                        type=int,
+                        default=500,
+                        help='number of rows buffered for each partition before being written to its file')
+arg_parser.add_argument('--tgt_sqlite_table_name',
+                        type=str,
+                        default=None,
+                        help='target SQLite table name (default is the target file base name)')
+arg_parser.add_argument('--tgt_index_col_names',
+                        type=str,
+                        nargs='*',
+                        default=[],
+                        help='target SQLite column names to be indexed, once all of the rows are loaded')
 
 arg_parser.add_argument('--tox_path',
                         type=str,
@@ -157,6 +254,19 @@ arg_parser.add_argument('--tox_default_value',
                         type=str,
                         default='None',
                         help='toxicities default value')
+arg_parser.add_argument('--tox_cache_path',
+                        type=str,
+                        default=None,
+                        help='toxicities lookup cache file path (default is the toxicities file path)')
+arg_parser.add_argument('--tox_no_cache',
+                        action='store_true',
+                        default=False,
+                        help='neither use nor build the toxicities lookup cache file')
+arg_parser.add_argument('--tox_key_normalization',
+                        type=str,
+                        choices=['none', 'strip', 'cas'],
+                        default='none',
+                        help='normalization of the toxicities lookup keys, of both the toxicities file and the source files: strip surrounding whitespace, or also reformat CAS numbers, e.g. " 0000050-00-0" or "50000" as "50-00-0"')
 
 arg_parser.add_argument('--break_after_first_file',
                         type=bool,
@@ -166,293 +276,5172 @@ arg_parser.add_argument('--progress_msg_template',
                         type=str,
                         default='{:s}: {:,.0f} rows in {:.2f} secs at {:,.0f} rows/sec',
                         help='process message template')
-arg_parser.add_argument('--rows_flush_interval',
+arg_parser.add_argument('--progress_interval',
                         type=int,
                         default=100000,
-                        help='flush rows to files interval')
+                        help='output a progress message every so many rows')
+arg_parser.add_argument('--rows_flush_interval',
+                        type=int,
+                        default=0,
+                        help='flush rows to files interval, zero to leave flushing to the byte and time thresholds')
+arg_parser.add_argument('--flush_bytes',
+                        type=int,
+                        default=64 * 1024 * 1024,
+                        help='flush rows to files once so many bytes were written since the last flush, zero to disable')
+arg_parser.add_argument('--flush_secs',
+                        type=float,
+                        default=0,
+                        help='flush rows to files once so many seconds have passed since the last flush, zero to disable')
+arg_parser.add_argument('--write_batch_rows',
+                        type=int,
+                        default=1000,
+                        help='number of rows written to files at a time')
+arg_parser.add_argument('--write_buffer_size',
+                        type=int,
+                        default=1024 * 1024,
+                        help='size in bytes of the output buffer of each target file')
+arg_parser.add_argument('--tgt_compression',
+                        type=str,
+                        choices=['none', 'gzip', 'zstd'],
+                        default='none',
+                        help='compression of the target CSV files, adding .gz or .zst to the target file extension (zstd needs the zstandard module)')
+arg_parser.add_argument('--tgt_compression_level',
+                        type=int,
+                        default=None,
+                        help='compression level of the target CSV files (default 6 for gzip, 3 for zstd)')
+arg_parser.add_argument('--compression_workers',
+                        type=int,
+                        default=0,
+                        help='number of threads compressing blocks of each target file in parallel (0=one per CPU)')
+arg_parser.add_argument('--compression_block_size',
+                        type=int,
+                        default=4 * 1024 * 1024,
+                        help='size in bytes of the blocks each target file is compressed in, each one a gzip member or zstd frame of its own')
 
 arg_parser.add_argument('--max_rows_per_file',
                         type=int,
                         default=0,
                         help='maximum rows per file (0=unlimited)')
+arg_parser.add_argument('--shard_rows',
+                        type=int,
+                        default=0,
+                        help='roll the target file over to a new shard file, e.g. <target base name>_00002<target file extension>, every so many rows (0=unlimited)')
+arg_parser.add_argument('--shard_bytes',
+                        type=int,
+                        default=0,
+                        help='roll the target file over to a new shard file once it holds about so many bytes (0=unlimited)')
+arg_parser.add_argument('--shard_key_col_name',
+                        type=str,
+                        default=None,
+                        help='target column name whose first and last values in each shard are listed in the shard manifest (default is the first column)')
+arg_parser.add_argument('--columns',
+                        type=str,
+                        nargs='+',
+                        default=None,
+                        help='source column names to be kept, in the order given (default is all of them)')
+arg_parser.add_argument('--where',
+                        type=str,
+                        nargs='+',
+                        default=None,
+                        help='row conditions, all to be met, on source column values, e.g. StateName=Texas|Oklahoma or JobStartDate>=1/1/2015, with =, !=, <, <=, >, >= comparing numbers, m/d/yyyy dates or text')
+arg_parser.add_argument('--dedupe_on',
+                        type=str,
+                        nargs='*',
+                        default=None,
+                        help='drop the rows already written to the same target file, comparing the given target column values, or whole rows if no column names are given')
+arg_parser.add_argument('--tgt_offset_index_rows',
+                        type=int,
+                        default=0,
+                        help='record the byte offset of every Nth record of each target CSV file in an .offsets sidecar file, for seeking straight to a record or split point (0=no offset index)')
+arg_parser.add_argument('--tgt_offset_index_col_name',
+                        type=str,
+                        default=None,
+                        help='also record in the .offsets sidecar file the byte offsets of the target records where this target column value changes, e.g. CASNumber or APINumber')
+arg_parser.add_argument('--tgt_stats',
+                        action='store_true',
+                        default=False,
+                        help='gather per-column null counts, distinct count estimates, inferred types, min/max values and max lengths as the rows are written, into a .stats.json sidecar file beside each target file')
 
-args = arg_parser.parse_args()
+arg_parser.add_argument('--workers',
+                        type=int,
+                        default=1,
+                        help='number of worker processes converting the zip archive members in parallel (0=one per CPU)')
+arg_parser.add_argument('--pipeline',
+                        action='store_true',
+                        default=False,
+                        help='decompress, convert and write each source file in pipelined threads, connected by bounded queues')
+arg_parser.add_argument('--pipeline_queue_size',
+                        type=int,
+                        default=8,
+                        help='maximum number of decompressed blocks or row batches held by each pipeline queue')
+arg_parser.add_argument('--pipeline_batch_rows',
+                        type=int,
+                        default=10000,
+                        help='number of rows per batch passed from the conversion to the writer pipeline stage')
+arg_parser.add_argument('--metrics_file',
+                        type=str,
+                        default=None,
+                        help='write per-stage and per-member timings and counts to this JSON file (instrumentation is off without it)')
+arg_parser.add_argument('--profile',
+                        action='store_true',
+                        default=False,
+                        help='profile the run (in the main process) with cProfile')
+arg_parser.add_argument('--profile_file',
+                        type=str,
+                        default='Zip2Src2Tgt.prof',
+                        help='cProfile statistics file name')
+arg_parser.add_argument('--incremental',
+                        action='store_true',
+                        default=False,
+                        help='only convert new or changed zip archive members, rebuilding the target files from the cached conversions of the unchanged ones')
+arg_parser.add_argument('--plan',
+                        action='store_true',
+                        default=False,
+                        help='dry run, listing the zip archive members that would be converted, with their sizes and projected target sizes and conversion times, writing nothing')
+arg_parser.add_argument('--plan_sample_bytes',
+                        type=int,
+                        default=1024 * 1024,
+                        help='number of uncompressed bytes of each zip archive member converted (into nothing) to calibrate its throughput when planning')
+arg_parser.add_argument('--watch',
+                        action='store_true',
+                        default=False,
+                        help='keep running, converting the new or changed zip archives as they arrive in the zip path, with the toxicities lookup dictionary loaded once')
+arg_parser.add_argument('--watch_interval',
+                        type=float,
+                        default=10.0,
+                        help='number of seconds between the polls of the zip path in watch mode, an archive being converted once it is unchanged from one poll to the next')
+arg_parser.add_argument('--watch_status_file',
+                        type=str,
+                        default=None,
+                        help='JSON status file kept up to date in watch mode, with the queue length and throughput (default Zip2Src2Tgt.watch.json in the target path)')
+arg_parser.add_argument('--chunk_workers',
+                        type=int,
+                        default=1,
+                        help='number of worker processes converting byte-range chunks of each large source file in parallel (0=one per CPU)')
+arg_parser.add_argument('--chunk_size',
+                        type=int,
+                        default=64 * 1024 * 1024,
+                        help='approximate size in bytes of each byte-range chunk of a source file')
 
+# the default parameter values, used by the routines below
+# for any parameters they're not given; importing this module
+# leaves sys.argv alone, running it as a program parses it
+args = arg_parser.parse_args([])
 
-# mainline routine, by default:
-#     zip_extension is '.zip'
-#     src_extension is '.csv'
-#     tgt_extension is '.tsv'        
-#     source is comma-delimited and quoted as needed
-#     target is tab-delimited and quoted as needed
 
-def main(zip_path,
-         src_path,
-         tgt_path,
-         tgt_file_basename=None,
-         tgt_file_append=None,
-         src_file_prefix=None,
-         zip_file_extension=None,
-         src_file_extension=None,
-         tgt_file_extension=None,
-         src_col_delimiter=None,
-         tgt_col_delimiter=None,
-         src_col_quotechar=None,
-         tgt_col_quotechar=None,
-         src_tox_lookup_col_name=None,
-         tox_path=None,
-         tox_file_name=None,
-         tox_lookup_key_col_name=None,
-         tox_lookup_result_col_names=None,
-         tox_col_delimiter=None,
-         tox_col_quotechar=None,
-         tox_default_value=None,
-         break_after_first_file=None,
-         rows_flush_interval=None,
-         progress_msg_template=None,
-         max_rows_per_file=None,
-         char_xform_tuples_list=None):
+# compiled character transformations, used in place of applying
+# each character transformation tuple to each cell in turn
+#
+# the tuples list is compiled, once per run, into a sequence of passes
+# that produce exactly the same results as the original per-cell loop:
+#
+#     for (src, tgt) in char_xform_tuples_list:
+#         while src in cell:
+#             cell = cell.replace(src, tgt).strip()
+#
+# i.e. (1) runs of consecutive single character transformations become
+# one str.translate() table, (2) the double-space style transformations,
+# e.g. ('  ', ' '), become one precompiled whitespace-collapse regex, and
+# (3) any other multi-character transformation is applied as before;
+# cells that contain none of the source characters are skipped entirely
+
+class CharXformer(object):
     
-    # default incoming parameters
-    # as needed if they are None
-    if src_file_prefix is None:
-        src_file_prefix = args.src_file_prefix
-    if src_file_extension is None:
-        src_file_extension = args.src_file_extension
-    if tgt_file_extension is None:
-        tgt_file_extension = args.tgt_file_extension
-    if zip_file_extension is None:
-        zip_file_extension = args.zip_file_extension
-    if src_col_delimiter is None:
-        src_col_delimiter = args.src_col_delimiter
-    if tox_col_delimiter is None:
-        tox_col_delimiter = args.tox_col_delimiter
-    if tgt_col_delimiter is None:
-        tgt_col_delimiter = args.tgt_col_delimiter
-    if src_col_quotechar is None:
-        src_col_quotechar = args.src_col_quotechar
-    if tox_col_quotechar is None:
-        tox_col_quotechar = args.tox_col_quotechar
-    if tox_default_value is None:
-        tox_default_value = args.tox_default_value
-    if tgt_col_quotechar is None:
-        tgt_col_quotechar = args.tgt_col_quotechar
-    if tgt_file_basename is None:
-        tgt_file_basename = args.tgt_file_basename
-    if tgt_file_append is None:
-        tgt_file_append = args.tgt_file_append
-    if src_tox_lookup_col_name is None:
-        src_tox_lookup_col_name = args.src_tox_lookup_col_name
-    if tox_lookup_key_col_name is None:
-        tox_lookup_key_col_name = args.tox_lookup_key_col_name
-    if tox_lookup_result_col_names is None:
-        tox_lookup_result_col_names = args.tox_lookup_result_col_names
-    if break_after_first_file is None:
-        break_after_first_file = args.break_after_first_file
-    if rows_flush_interval is None:
-        rows_flush_interval = args.rows_flush_interval
-    if progress_msg_template is None:
-        progress_msg_template = args.progress_msg_template
-    if max_rows_per_file is None:
-        max_rows_per_file = args.max_rows_per_file
+    # pass kinds
+    TRANSLATE = 0
+    COLLAPSE = 1
+    REPLACE = 2
     
-    if zip_path is not None:
-        if zip_path.startswith('~'):
-            zip_path = os.path.expanduser(zip_path)
-            
-        if not os.path.exists(zip_path):
-            os.makedirs(zip_path)
-            
-        if not os.path.exists(zip_path):
-            print('--zip_path not found: %s' % zip_path)
-            sys.exit(404)
+    def __init__(self, char_xform_tuples_list):
+        
+        self.char_xform_tuples = tuple((src, tgt) for src, tgt in char_xform_tuples_list if src)
+        self.passes = []
+        
+        # the consecutive single character
+        # transformations still to be compiled
+        # into a single translate pass
+        translate_run = []
+        
+        for src, tgt in self.char_xform_tuples:
+            if self._is_translatable(src, tgt, translate_run):
+                translate_run.append((src, tgt))
+                continue
+            self._add_translate_pass(translate_run)
+            if len(src) == 1 and self._is_translatable(src, tgt, []):
+                translate_run = [(src, tgt)]
+                continue
+            translate_run = []
+            # a doubled character collapsed to a single
+            # character, e.g. double-space to single space
+            if len(tgt) == 1 and src == tgt * 2:
+                self.passes.append((self.COLLAPSE,
+                                    src,
+                                    re.compile(re.escape(tgt) + '{2,}').sub,
+                                    tgt))
+            else:
+                self.passes.append((self.REPLACE, src, tgt, None))
+        self._add_translate_pass(translate_run)
+        
+        # cells (and rows) not matching this
+        # pattern need no transformations at all
+        if self.char_xform_tuples:
+            self.search = re.compile('|'.join(re.escape(src) for src, _tgt in self.char_xform_tuples)).search
+        else:
+            self.search = None
+        
+        # the character used to join a row's cells
+        # for the row-level fast path, it must not
+        # be part of any of the source characters
+        for code_point in range(0x20):
+            if not any(chr(code_point) in src for src, _tgt in self.char_xform_tuples):
+                self.row_joiner = chr(code_point)
+                break
+        else:
+            self.row_joiner = None
     
-    if src_path is not None:
-        if src_path.startswith('~'):
-            src_path = os.path.expanduser(src_path)
-            
-        if not os.path.exists(src_path):
-            os.makedirs(src_path)
-            
-        if not os.path.exists(src_path):
-            print('--src_path not found: %s' % src_path)
-            sys.exit(404)
-
-    if src_path is None or not os.path.exists(src_path):
-        print('--src_path not found: %s' % src_path)
-        sys.exit(404)
-
-    if tgt_path is not None:
-        if tgt_path.startswith('~'):
-            tgt_path = os.path.expanduser(tgt_path)
-            
-        if not os.path.exists(tgt_path):
-            os.makedirs(tgt_path)
-
-    if tgt_path is None or not os.path.exists(tgt_path):
-        print('--tgt_path not found: %s' % tgt_path)
-        sys.exit(404)
-
-    if tox_path is not None:    
-        if tox_path.startswith('~'):
-            tox_path = os.path.expanduser(tox_path)
-            
-        if not os.path.exists(tox_path):
-            os.makedirs(tox_path)
-            
-        if not os.path.exists(tox_path):
-            print('--tox_path not found: %s' % tox_path)
-            sys.exit(404)
-
-    if tox_path is not None and tox_file_name is not None:
-        tox_file_name = os.path.join(tox_path,
-                                     tox_file_name)
+    def __bool__(self):
+        return bool(self.char_xform_tuples)
+    
+    @staticmethod
+    def _is_translatable(src, tgt, translate_run):
+        # only single characters can be translated
+        if len(src) != 1 or src in tgt:
+            return False
+        # stripping between the transformations is only
+        # equivalent to stripping once at the end when
+        # whitespace is never transformed into non-whitespace
+        if src.isspace() and tgt and not tgt.isspace():
+            return False
+        # the earlier transformations of a run must not
+        # produce characters that later ones transform
+        for _src, _tgt in translate_run:
+            if src in _tgt:
+                return False
+        return True
+    
+    def _add_translate_pass(self, translate_run):
+        if translate_run:
+            # a repeated source character never matches again,
+            # its first transformation having removed them all
+            translate_table = {}
+            for src, tgt in translate_run:
+                translate_table.setdefault(ord(src), tgt)
+            self.passes.append((self.TRANSLATE,
+                                re.compile('[' + ''.join(re.escape(chr(code_point)) for code_point in translate_table) + ']').search,
+                                translate_table,
+                                None))
+    
+    def xform_cell(self, cell):
         
-        if not os.path.exists(tox_file_name):
-            print('--tox_file_name not found: %s' % tox_file_name)
-            sys.exit(404)
+        for kind, a, b, c in self.passes:
+            if kind == self.TRANSLATE:
+                if a(cell):
+                    cell = cell.translate(b).strip()
+            elif kind == self.COLLAPSE:
+                if a in cell:
+                    cell = b(c, cell).strip()
+            else:
+                while a in cell:
+                    cell = cell.replace(a, b).strip()
+        
+        return cell
     
-    # if the toxicities file name is specified and exists
-    # implement the loading of the toxicities lookup dictionary
+    __call__ = xform_cell
     
-    tox_dict = {}
+    def xform_row(self, row):
+        
+        search = self.search
+        
+        if search is None:
+            return row
+        
+        # fast path, nothing in the entire row to transform
+        if self.row_joiner is not None and not search(self.row_joiner.join(row)):
+            return row
+        
+        xform_cell = self.xform_cell
+        
+        for i, cell in enumerate(row):
+            if search(cell):
+                row[i] = xform_cell(cell)
+        
+        return row
     
-    if tox_file_name is not None:
+    def matching_cells(self, cells):
+        
+        search = self.search
+        
+        if search is None:
+            return []
+        
+        row_joiner = self.row_joiner
+        
+        if row_joiner is not None:
+            joined_cells = row_joiner.join(cells)
+        
+        # (the cells may have the joiner character in them)
+        if row_joiner is None or joined_cells.count(row_joiner) != len(cells) - 1:
+            return [i for i, cell in enumerate(cells) if search(cell)]
+        
+        # search all of the cells at once, each match leading to
+        # the cell it's in, by the joiners before it, and searching
+        # on from the next cell
+        cell_indexes = []
+        i = 0
+        cell_start = 0
+        match = search(joined_cells)
+        while match is not None:
+            pos = match.start()
+            i += joined_cells.count(row_joiner, cell_start, pos)
+            cell_indexes.append(i)
+            cell_start = joined_cells.find(row_joiner, pos) + 1
+            if cell_start == 0:
+                break
+            i += 1
+            match = search(joined_cells, cell_start)
+        
+        return cell_indexes
     
-        print('')
-        print('=============================')
-        print('TOX file: %s' % tox_file_name)
-        print('-----------------------------')
-        print('toxicities lookup dictionary loading started...')
+    def xform_cells(self, cells):
         
-        rows = 0
-        start_time = time.time()
-
-        with io.open(tox_file_name, 'r', newline='') as tox_file:
-            tox_dict_reader = csv.DictReader(tox_file,
-                                             delimiter=tox_col_delimiter,
-                                             quotechar=tox_col_quotechar,
-                                             quoting=csv.QUOTE_MINIMAL)
+        # the indexes and transformed values of the cells
+        # to transform, e.g. a few of a batch's cells
+        cell_indexes = self.matching_cells(cells)
         
-            for row in tox_dict_reader:
-                rows += 1
-                lookup_values_dict = {}
-                for col_name in tox_lookup_result_col_names:
-                    lookup_values_dict[col_name] = row[col_name]
-                tox_dict[row[tox_lookup_key_col_name]] = lookup_values_dict
-                
-                # flush output based on the interval
-                if rows % rows_flush_interval == 0:
-                    # output a progress message
-                    elapsed_time = time.time() - start_time
-                    print(progress_msg_template.format(tox_file_name,
-                                                       rows,
-                                                       elapsed_time,
-                                                       rows / elapsed_time if elapsed_time > 0 else rows))
-        # output a progress message
-        elapsed_time = time.time() - start_time
-        print(progress_msg_template.format(tox_file_name,
-                                           rows,
-                                           elapsed_time,
-                                           rows / elapsed_time if elapsed_time > 0 else rows))
-                
-        print('toxicities lookup dictionary loading finished!')
-        # pprint(tox_dict)
+        if not cell_indexes:
+            return []
+        
+        # transform them as a whole, unless they've NULs in them,
+        # as NumPy's fixed-width strings drop the trailing ones
+        matching_cells = [cells[i] for i in cell_indexes]
+        if load_numpy() and not any('\x00' in cell for cell in matching_cells):
+            return zip(cell_indexes, self.xform_array(numpy.array(matching_cells, dtype=str)).tolist())
+        
+        return zip(cell_indexes, map(self.xform_cell, matching_cells))
+    
+    def xform_column(self, column):
+        
+        xformed_column = list(column)
+        
+        for i, cell in self.xform_cells(column):
+            xformed_column[i] = cell
+        
+        return xformed_column
+    
+    def xform_array(self, cells):
+        
+        # the same passes as for a single cell, each one applied
+        # to the whole array, and stripping only the cells it
+        # transformed (the translations being replacements,
+        # one character at a time, as the earlier characters
+        # of a translation never produce the later ones)
+        char = numpy.char
+        replace = self.replace_array
+        
+        for kind, a, b, c in self.passes:
+            if kind == self.TRANSLATE:
+                xformed_cells = cells
+                for code_point, tgt in b.items():
+                    xformed_cells = replace(xformed_cells, chr(code_point), tgt)
+                cells = numpy.where(xformed_cells != cells, char.strip(xformed_cells), cells)
+            elif kind == self.COLLAPSE:
+                matches = char.find(cells, a) >= 0
+                if matches.any():
+                    xformed_cells = cells
+                    while True:
+                        xformed_cells = replace(xformed_cells, a, c)
+                        if not (char.find(xformed_cells, a) >= 0).any():
+                            break
+                    cells = numpy.where(matches, char.strip(xformed_cells), cells)
+            else:
+                while True:
+                    matches = char.find(cells, a) >= 0
+                    if not matches.any():
+                        break
+                    cells = numpy.where(matches, char.strip(replace(cells, a, b)), cells)
+        
+        return cells
+    
+    @staticmethod
+    def replace_array(cells, src, tgt):
+        # widen the fixed-width strings beforehand, for
+        # the longer ones not to be cut short by NumPy
+        if len(tgt) > len(src):
+            width = cells.dtype.itemsize // numpy.dtype('U1').itemsize
+            width += int(numpy.char.count(cells, src).max()) * (len(tgt) - len(src))
+            cells = cells.astype('U%d' % width)
+        return numpy.char.replace(cells, src, tgt)
 
-    # dictionary used to hold
-    # to hold the filenames found
-    # within the specified zip archive
-    # for subsequent sorted access via looping        
-    filenames = {}
+
+# compiled character transformations, keyed
+# by their character transformation tuples
+
+char_xformers = {}
+
+def compile_char_xforms(char_xform_tuples_list):
     
-    # walk through any files in the zip path
-    for root, _dirs, files in os.walk(zip_path):
-        # file-by-file
-        for file in files:
-            # only process zip archives
-            if file.lower().endswith(zip_file_extension.lower()):
-                first_file = True
-                # derive the zip archive's full file path
-                zip_file_name = os.path.join(root, file)
-                # open the zip archive file
-                with io.open(zip_file_name, 'rb') as fh:
-                    zh = zipfile.ZipFile(fh)
-                    # build up dictionary of file names and date-times
-                    # prior to them being sorted and extracted by date-time
-                    for info in zh.infolist():
-                        filenames[info.filename] = info.date_time
-                    # process file names in date-time sort order
-                    # so that the data is likely in the same order
-                    # from which it was originally split into CSVs
-                    for filename in sorted(filenames.items(), key=itemgetter(1)):
-                        # filename prefix needs to match source file prefix
-                        if not filename[0].lower().startswith(src_file_prefix.lower()):
-                            continue
-                        # derive the temporary file's name
-                        tmp_file_name = os.path.join(src_path, filename[0])
-                        # extract file from zip archive
-                        # into the zip archive's path
-                        zh.extract(filename[0], src_path)
-                        # sleep 1 second
-                        # to allow extract
-                        # to close output file
-                        time.sleep(1)
-                        # if the temporary file exists
-                        if os.path.exists(tmp_file_name):
-                            # if the temporary file ends with the desired extension
-                            if tmp_file_name.lower().endswith(src_file_extension.lower()):
-                                # derive the file output mode, either write ('w') or append ('a')
-                                file_mode = 'w' if (first_file or tgt_file_append is None) else 'a'
-                                # build target file name for output
-                                if tgt_file_basename is None:
-                                    tgt_file_name = os.path.join(tgt_path,
-                                                        os.path.splitext(os.path.basename(tmp_file_name))[0] + tgt_file_extension)
-                                else:
-                                    tgt_file_name = os.path.join(tgt_path,
-                                                        tgt_file_basename + tgt_file_extension)
-                                # if it's the first file
-                                # or the target file name
-                                # is to be different for each
-                                # file in the archive's manifest
-                                if first_file or tgt_file_basename is None:
-                                    # don't bypass the header row
-                                    bypass_header_row = False
-                                # otherwise
-                                else:
-                                    # bypass the header row
-                                    bypass_header_row = True
-                                # convert the source CSV
-                                # to the target CSV, with
-                                # delimiter and quote char
-                                # tweaks as needed
-                                src2tgt_file(tmp_file_name,
-                                             tgt_file_name,
-                                             file_mode,
-                                             src_col_delimiter,
-                                             tgt_col_delimiter,
-                                             src_col_quotechar,
-                                             tgt_col_quotechar,
-                                             src_tox_lookup_col_name,
-                                             tox_dict,
-                                             tox_lookup_key_col_name,
-                                             tox_lookup_result_col_names,
-                                             tox_col_delimiter,
-                                             tox_col_quotechar,
-                                             tox_default_value,
-                                             bypass_header_row,
-                                             rows_flush_interval,
-                                             progress_msg_template,
-                                             max_rows_per_file,
-                                             char_xform_tuples_list)
-                                first_file = False
-                                if break_after_first_file:
-                                    break
-                    # close the
-                    # zip archive
-                    zh.close()
+    if isinstance(char_xform_tuples_list, CharXformer):
+        return char_xform_tuples_list
+    
+    key = tuple(tuple(char_xform_tuple) for char_xform_tuple in (char_xform_tuples_list or []))
+    
+    try:
+        return char_xformers[key]
+    except KeyError:
+        char_xformer = char_xformers[key] = CharXformer(key)
+        return char_xformer
 
 
-# source to target CSV file converter routine, by default:
+# byte-level character transformations, applied to the raw bytes of the
+# source file, block by block, with bytes.translate(), before they're
+# decoded and parsed, rather than to each of the cells of each row
+#
+# a character transformation is only applied to the raw bytes when that
+# gives the same results as applying it to the cells, i.e. when:
+#
+#     (1) it transforms a single character into a single character,
+#         each of them a single byte of the source encoding, that
+#         decodes to it wherever it occurs, e.g. any byte of latin-1,
+#         or any ASCII byte of UTF-8, but not of Shift JIS,
+#     (2) neither of them is a column delimiter, quote character,
+#         carriage-return or line-feed, i.e. the CSV structure,
+#     (3) none of the (cell-level) transformations before it produce its
+#         source character, or match its source or target characters,
+#
+# and as the cell-level transformations strip each cell they transform,
+# the raw bytes of any row (record) with whitespace, once transformed,
+# that may be at the start or end of a cell, e.g. next to a column
+# delimiter, are left as they are, for the cell-level transformations;
+# those are still applied to every row, but their source characters are
+# then mostly gone, and the rows mostly take the row-level fast path;
+# how much faster that is depends on the data, i.e. on how many of its
+# rows are left as they are, so it's only done if so specified
+
+BYTE_XFORM_BLOCK_SIZE = 1024 * 1024
+
+
+def byte_class(byte_values):
+    return b''.join(b'\\x%02x' % byte_value for byte_value in sorted(byte_values))
+
+
+class ByteXformer(object):
+    
+    def __init__(self, byte_xforms, delimiter_byte, quote_byte, whitespace_bytes):
+        
+        self.byte_xforms = tuple(byte_xforms)
+        self.quote = bytes((quote_byte,))
+        self.table = bytes.maketrans(bytes(src for src, _tgt in self.byte_xforms),
+                                     bytes(tgt for _src, tgt in self.byte_xforms))
+        self.search = re.compile(b'[' + byte_class(src for src, _tgt in self.byte_xforms) + b']').search
+        
+        # whitespace that may be at the start or end of a cell, i.e.
+        # (1) after a column delimiter or a line ending, (2) after a
+        # quote character, (3) a line ending after the opening quote
+        # character of a cell, (4) before a column delimiter or a line
+        # ending, or (5) before the closing quote character of a cell,
+        # carriage-returns and line-feeds only counting as whitespace
+        # in quoted cells (in either case, at the ends of the block too),
+        # each match starting within the row the whitespace is in
+        delimiter = byte_class((delimiter_byte,))
+        quote = byte_class((quote_byte,))
+        space = byte_class(byte_value for byte_value in whitespace_bytes if byte_value not in (0x0d, 0x0a))
+        whitespace = byte_class(whitespace_bytes)
+        self.edge_search = re.compile(b''.join((b'(?<![^', delimiter, b'\\r\\n])[', space, b']',
+                                               b'|(?<=[', quote, b'])[', space, b']',
+                                               b'|(?<![^', delimiter, b'\\r\\n])[', quote, b'][\\r\\n]',
+                                               b'|[', space, b'](?=\\Z|[', delimiter, b'\\r\\n])',
+                                               b'|[', whitespace, b'](?=[', quote, b'](?:\\Z|[', delimiter, b'\\r\\n]))'))).search
+    
+    def records_end(self, block):
+        # just past the last line-feed that's outside of any quoted
+        # cell, i.e. that ends a row, counting the quote characters
+        # back from the end of the block, which begins a row
+        quotes = block.count(self.quote)
+        pos = len(block)
+        while True:
+            line_feed = block.rfind(b'\n', 0, pos)
+            if line_feed < 0:
+                return 0
+            quotes -= block.count(self.quote, line_feed, pos)
+            if quotes % 2 == 0:
+                return line_feed + 1
+            pos = line_feed
+    
+    def xform(self, block):
+        
+        if not self.search(block):
+            return block
+        
+        xformed_block = bytearray(block.translate(self.table))
+        
+        # leave the rows with whitespace that may be at the start
+        # or end of a cell as they are, the block beginning a row
+        records_end = 0
+        match = self.edge_search(xformed_block)
+        while match is not None:
+            pos = match.start()
+            # the row's start, i.e. that of the first line back
+            # that's outside of any quoted cell, from the end
+            # of the last row that was left as it is
+            record_start = block.rfind(b'\n', records_end, pos) + 1
+            while record_start > records_end and block.count(self.quote, records_end, record_start) % 2:
+                record_start = block.rfind(b'\n', records_end, record_start - 1) + 1
+            record_start = max(record_start, records_end)
+            # and its end, i.e. that of the first line on
+            # that's outside of any quoted cell
+            quotes = block.count(self.quote, record_start, pos)
+            line_start = pos
+            while True:
+                line_feed = block.find(b'\n', line_start)
+                if line_feed < 0:
+                    records_end = len(block)
+                    break
+                quotes += block.count(self.quote, line_start, line_feed)
+                if quotes % 2 == 0:
+                    records_end = line_feed + 1
+                    break
+                line_start = line_feed + 1
+            xformed_block[record_start:records_end] = block[record_start:records_end]
+            match = self.edge_search(xformed_block, records_end)
+        
+        return xformed_block
+
+
+# byte-level character transformations of a character
+# transformation tuples list, for a source encoding
+# and CSV structure, None if there are none
+
+byte_xformers = {}
+
+def compile_byte_xforms(char_xform_tuples_list, encoding, col_delimiter, col_quotechar):
+    
+    key = (tuple(tuple(char_xform_tuple) for char_xform_tuple in (char_xform_tuples_list or [])),
+           encoding,
+           col_delimiter,
+           col_quotechar)
+    
+    try:
+        return byte_xformers[key]
+    except KeyError:
+        pass
+    
+    # the characters that each byte decodes to wherever it occurs,
+    # which is any byte of an encoding that decodes its bytes one
+    # by one, but for UTF-8, say, only the ASCII bytes
+    byte_chars = {}
+    try:
+        decodes_bytewise = (bytes(range(256)).decode(encoding, 'replace') ==
+                            ''.join(bytes((byte_value,)).decode(encoding, 'replace') for byte_value in range(256)))
+    except LookupError:
+        decodes_bytewise = False
+    if decodes_bytewise:
+        for byte_value in range(256):
+            try:
+                char = bytes((byte_value,)).decode(encoding)
+            except UnicodeError:
+                continue
+            if len(char) == 1 and char.encode(encoding) == bytes((byte_value,)):
+                byte_chars[char] = byte_value
+    
+    structure_chars = set((col_delimiter, col_quotechar, '\r', '\n'))
+    if not structure_chars.issubset(byte_chars):
+        byte_xformers[key] = None
+        return None
+    
+    byte_xforms = []
+    cell_xforms = []
+    
+    for src, tgt in key[0]:
+        if not src:
+            continue
+        if (len(src) == 1 and len(tgt) == 1 and
+            src in byte_chars and tgt in byte_chars and
+            src not in structure_chars and tgt not in structure_chars and
+            all(src not in _src + _tgt and tgt not in _src for _src, _tgt in cell_xforms) and
+            all(src != _src and src != _tgt for _src, _tgt in byte_xforms)):
+            byte_xforms.append((src, tgt))
+        else:
+            cell_xforms.append((src, tgt))
+    
+    if byte_xforms:
+        byte_xformer = ByteXformer([(byte_chars[src], byte_chars[tgt]) for src, tgt in byte_xforms],
+                                   byte_chars[col_delimiter],
+                                   byte_chars[col_quotechar],
+                                   set(range(256)) - set(byte_value for char, byte_value in byte_chars.items() if not char.isspace()))
+    else:
+        byte_xformer = None
+    
+    byte_xformers[key] = byte_xformer
+    
+    return byte_xformer
+
+
+class ByteXformReader(io.RawIOBase):
+    
+    def __init__(self, raw_file, byte_xformer):
+        self.raw_file = raw_file
+        self.byte_xformer = byte_xformer
+        # the bytes of the last, possibly partial, row read
+        self.rest = b''
+        self.xformed_block = b''
+        self.pos = 0
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, b):
+        while self.pos >= len(self.xformed_block):
+            block = self.raw_file.read(BYTE_XFORM_BLOCK_SIZE)
+            if not block:
+                if not self.rest:
+                    return 0
+                block = self.rest
+                self.rest = b''
+            else:
+                block = self.rest + block
+                records_end = self.byte_xformer.records_end(block)
+                self.rest = block[records_end:]
+                block = block[:records_end]
+            self.xformed_block = memoryview(self.byte_xformer.xform(block))
+            self.pos = 0
+        n = min(len(b), len(self.xformed_block) - self.pos)
+        b[:n] = self.xformed_block[self.pos:self.pos + n]
+        self.pos += n
+        return n
+    
+    def close(self):
+        if not self.closed:
+            self.raw_file.close()
+        super(ByteXformReader, self).close()
+
+
+def open_byte_xformed_src_file(src_file, byte_xformer):
+    
+    # transform the raw bytes beneath the source stream,
+    # decoding them the same way that it would have
+    byte_xform_reader = ByteXformReader(src_file.buffer, byte_xformer)
+    # keep the source stream from being garbage collected,
+    # which would close the raw bytes beneath it
+    byte_xform_reader.src_file = src_file
+    
+    return io.TextIOWrapper(io.BufferedReader(byte_xform_reader),
+                            encoding=src_file.encoding,
+                            newline='')
+
+
+# toxicities lookup table cache, a read-only open-addressing hash table
+# file that is memory-mapped rather than loaded, so that it needs no
+# parsing when reused and is shared by all of the worker processes
+# through the operating system's page cache, each worker mapping it
+# (pickling a ToxTable only pickles its cache file name)
+#
+# file layout:
+#     magic (8 bytes), header length (uint32), JSON header, padding
+#     slots (uint64 * slot_count), each the file offset of a record or 0
+#     records, each a key followed by the lookup result column values,
+#     all of them encoded as a uint32 length (0xFFFFFFFF for None)
+#     followed by that many UTF-8 bytes
+#
+# the lookup results are tuples of the lookup result column
+# values, in the order of the lookup result column names
+
+TOX_CACHE_MAGIC = b'Z2STTOX1'
+
+TOX_CACHE_NONE = 0xFFFFFFFF
+
+class ToxTable(object):
+    
+    def __init__(self, cache_file_name):
+        
+        self.cache_file_name = cache_file_name
+        
+        with io.open(cache_file_name, 'rb') as cache_file:
+            self.mm = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        if self.mm[:len(TOX_CACHE_MAGIC)] != TOX_CACHE_MAGIC:
+            raise ValueError('not a toxicities lookup cache file: %s' % cache_file_name)
+        
+        header_length = struct.unpack_from('<I', self.mm, len(TOX_CACHE_MAGIC))[0]
+        header_offset = len(TOX_CACHE_MAGIC) + 4
+        self.header = json.loads(self.mm[header_offset:header_offset + header_length].decode('utf-8'))
+        
+        self.result_col_names = self.header['result_col_names']
+        self.slot_mask = self.header['slot_count'] - 1
+        self.slots_offset = self.header['slots_offset']
+        
+        # lookups already made, keyed by lookup key,
+        # either the lookup result or None if missing
+        self.memo = {}
+    
+    def __reduce__(self):
+        return (self.__class__, (self.cache_file_name,))
+    
+    def __len__(self):
+        return self.header['count']
+    
+    def __bool__(self):
+        return self.header['count'] > 0
+    
+    def __contains__(self, key):
+        return self.get(key) is not None
+    
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+    
+    def get(self, key, default=None):
+        
+        try:
+            value = self.memo[key]
+        except KeyError:
+            value = self.memo[key] = self._lookup(key)
+        
+        return default if value is None else value
+    
+    def _lookup(self, key):
+        
+        if not isinstance(key, str):
+            return None
+        
+        mm = self.mm
+        key_bytes = key.encode('utf-8', 'surrogatepass')
+        i = zlib.crc32(key_bytes) & self.slot_mask
+        
+        while True:
+            offset = struct.unpack_from('<Q', mm, self.slots_offset + 8 * i)[0]
+            if offset == 0:
+                return None
+            length = struct.unpack_from('<I', mm, offset)[0]
+            offset += 4
+            if mm[offset:offset + length] == key_bytes:
+                offset += length
+                values = []
+                for _col_name in self.result_col_names:
+                    length = struct.unpack_from('<I', mm, offset)[0]
+                    offset += 4
+                    if length == TOX_CACHE_NONE:
+                        values.append(None)
+                    else:
+                        values.append(mm[offset:offset + length].decode('utf-8', 'surrogatepass'))
+                        offset += length
+                return tuple(values)
+            i = (i + 1) & self.slot_mask
+    
+    def close(self):
+        self.mm.close()
+
+
+# derive the toxicities lookup cache file name, distinct
+# for each toxicities file, lookup key/result columns,
+# lookup key normalization and CSV delimiter and quote
+# char the toxicities file is parsed with
+
+def tox_cache_file_name(tox_file_name,
+                        tox_lookup_key_col_name,
+                        tox_lookup_result_col_names,
+                        tox_cache_path=None,
+                        tox_key_normalization='none',
+                        tox_col_delimiter=',',
+                        tox_col_quotechar='"'):
+    
+    if tox_cache_path is None:
+        tox_cache_path = os.path.dirname(tox_file_name)
+    
+    cache_identity = [os.path.abspath(tox_file_name),
+                      tox_lookup_key_col_name,
+                      list(tox_lookup_result_col_names),
+                      tox_key_normalization,
+                      tox_col_delimiter,
+                      tox_col_quotechar]
+    
+    digest = hashlib.sha1(json.dumps(cache_identity).encode('utf-8')).hexdigest()
+    
+    return os.path.join(tox_cache_path,
+                        '%s.%s.toxcache' % (os.path.basename(tox_file_name), digest[:12]))
+
+
+# open the toxicities lookup cache file, unless it's missing
+# or stale, i.e. built from a different toxicities file
+# (path, size or modification time), lookup columns,
+# lookup key normalization or CSV delimiter or quote char
+
+def open_tox_cache(cache_file_name,
+                   tox_file_name,
+                   tox_lookup_key_col_name,
+                   tox_lookup_result_col_names,
+                   tox_key_normalization='none',
+                   tox_col_delimiter=',',
+                   tox_col_quotechar='"'):
+    
+    if not os.path.exists(cache_file_name):
+        return None
+    
+    try:
+        tox_table = ToxTable(cache_file_name)
+    except (ValueError, struct.error):
+        return None
+    
+    tox_file_stat = os.stat(tox_file_name)
+    
+    if (tox_table.header['source'] != os.path.abspath(tox_file_name) or
+            tox_table.header['size'] != tox_file_stat.st_size or
+            tox_table.header['mtime_ns'] != tox_file_stat.st_mtime_ns or
+            tox_table.header['key_col_name'] != tox_lookup_key_col_name or
+            tox_table.header['result_col_names'] != list(tox_lookup_result_col_names) or
+            tox_table.header.get('key_normalization', 'none') != tox_key_normalization or
+            tox_table.header.get('col_delimiter') != tox_col_delimiter or
+            tox_table.header.get('col_quotechar') != tox_col_quotechar):
+        tox_table.close()
+        return None
+    
+    return tox_table
+
+
+# write the toxicities lookup dictionary to the toxicities lookup cache
+# file, atomically replacing any previous version of the cache file
+
+def write_tox_cache(cache_file_name,
+                    tox_dict,
+                    tox_file_name,
+                    tox_lookup_key_col_name,
+                    tox_lookup_result_col_names,
+                    tox_key_normalization='none',
+                    tox_col_delimiter=',',
+                    tox_col_quotechar='"'):
+    
+    tox_file_stat = os.stat(tox_file_name)
+    
+    keys = [key for key in tox_dict if isinstance(key, str)]
+    
+    # power of two slot count, at most half full
+    slot_count = 8
+    while slot_count < 2 * len(keys):
+        slot_count *= 2
+    
+    header = dict(source=os.path.abspath(tox_file_name),
+                  size=tox_file_stat.st_size,
+                  mtime_ns=tox_file_stat.st_mtime_ns,
+                  key_col_name=tox_lookup_key_col_name,
+                  result_col_names=list(tox_lookup_result_col_names),
+                  key_normalization=tox_key_normalization,
+                  col_delimiter=tox_col_delimiter,
+                  col_quotechar=tox_col_quotechar,
+                  count=len(keys),
+                  slot_count=slot_count,
+                  slots_offset=0)
+    
+    # the slots follow the header, 8-byte aligned,
+    # the header's length not depending on its offset
+    header_length = len(json.dumps(header).encode('utf-8')) + 20
+    slots_offset = len(TOX_CACHE_MAGIC) + 4 + header_length
+    slots_offset += -slots_offset % 8
+    header['slots_offset'] = slots_offset
+    header_bytes = json.dumps(header).encode('utf-8').ljust(slots_offset - len(TOX_CACHE_MAGIC) - 4)
+    
+    slots = array.array('Q', [0]) * slot_count
+    records = io.BytesIO()
+    records_offset = slots_offset + 8 * slot_count
+    
+    def write_value(value):
+        if value is None:
+            records.write(struct.pack('<I', TOX_CACHE_NONE))
+        else:
+            value_bytes = value.encode('utf-8', 'surrogatepass')
+            records.write(struct.pack('<I', len(value_bytes)))
+            records.write(value_bytes)
+    
+    for key in keys:
+        key_bytes = key.encode('utf-8', 'surrogatepass')
+        i = zlib.crc32(key_bytes) & (slot_count - 1)
+        while slots[i] != 0:
+            i = (i + 1) & (slot_count - 1)
+        slots[i] = records_offset + records.tell()
+        write_value(key)
+        for value in tox_dict[key]:
+            write_value(value)
+    
+    if sys.byteorder != 'little':
+        slots.byteswap()
+    
+    tmp_file_name = '%s.%d.tmp' % (cache_file_name, os.getpid())
+    
+    with io.open(tmp_file_name, 'wb') as cache_file:
+        cache_file.write(TOX_CACHE_MAGIC)
+        cache_file.write(struct.pack('<I', len(header_bytes)))
+        cache_file.write(header_bytes)
+        cache_file.write(slots.tobytes())
+        cache_file.write(records.getvalue())
+    
+    os.replace(tmp_file_name, cache_file_name)
+
+
+
+# toxicities lookup key normalizations, applied to the lookup keys of
+# both the toxicities file and the source files, so that e.g. a source
+# CASNumber of " 50-00-0 " or "50000" still matches the "50-00-0" of the
+# toxicities file: 'strip' strips the surrounding whitespace, and 'cas'
+# also reformats the CAS registry numbers, i.e. 2 to 7 digits, 2 digits
+# and a check digit, with or without their dashes and leading zeros,
+# as long as their check digit is right (leaving anything else stripped)
+
+CAS_NUMBER_REGEX = re.compile(r'^0*([0-9]{2,7})-?([0-9]{2})-?([0-9])$')
+
+# number of distinct keys whose normalization is memoized,
+# the memo starting over whenever it's full
+TOX_KEY_MEMO_SIZE = 1 << 16
+
+
+def normalize_cas_number(key):
+    
+    key = key.strip()
+    
+    match = CAS_NUMBER_REGEX.match(key)
+    if match is None:
+        return key
+    
+    # the check digit is the sum of the other digits, each one
+    # times its position counting from the right, modulo 10
+    digits = match.group(1) + match.group(2)
+    check_sum = sum(int(digit) * position for position, digit in enumerate(reversed(digits), 1))
+    if check_sum % 10 != int(match.group(3)):
+        return key
+    
+    return '%s-%s-%s' % match.groups()
+
+
+def bind_tox_key_normalizer(tox_key_normalization):
+    
+    if tox_key_normalization == 'strip':
+        normalize = str.strip
+    elif tox_key_normalization == 'cas':
+        normalize = normalize_cas_number
+    else:
+        return None
+    
+    # the same few thousand keys come up over and over
+    memo = {}
+    
+    def normalize_tox_key(key):
+        try:
+            return memo[key]
+        except KeyError:
+            if len(memo) >= TOX_KEY_MEMO_SIZE:
+                memo.clear()
+            normalized_key = memo[key] = normalize(key)
+            return normalized_key
+    
+    return normalize_tox_key
+
+
+# the toxicities lookup dictionary with its lookup results as tuples
+# of the lookup result column values, e.g. when it's provided by a
+# caller as a dictionary of lookup result dictionaries
+
+def tox_tuples_dict(tox_dict, tox_lookup_result_col_names):
+    
+    if not tox_dict or isinstance(tox_dict, ToxTable):
+        return tox_dict
+    
+    if not isinstance(next(iter(tox_dict.values())), dict):
+        return tox_dict
+    
+    return dict((key, tuple(values[col_name] for col_name in tox_lookup_result_col_names))
+                for key, values in tox_dict.items())
+
+
+# toxicities lookup statistics of a source file, the hits that
+# only matched once their key was normalized counted apart
+
+class ToxLookupStats(object):
+    
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.normalized_hits = 0
+    
+    def stats_msg(self, src_file_name):
+        lookups = self.hits + self.misses
+        return '%s: %d toxicities lookups, %d hits (%.1f%%), %d misses, %d hits after key normalization' % (src_file_name,
+                                                                                                            lookups,
+                                                                                                            self.hits,
+                                                                                                            100.0 * self.hits / lookups if lookups else 0.0,
+                                                                                                            self.misses,
+                                                                                                            self.normalized_hits)
+
+
+# toxicities lookup dictionary loader routine, reusing (or building)
+# the toxicities lookup cache file unless told not to, returning either
+# a dictionary or a memory-mapped ToxTable of the lookup result column
+# value tuples keyed by the (normalized) lookup key column values
+
+def load_tox_dict(tox_file_name,
+                  tox_lookup_key_col_name=None,
+                  tox_lookup_result_col_names=None,
+                  tox_col_delimiter=None,
+                  tox_col_quotechar=None,
+                  tox_cache_path=None,
+                  tox_no_cache=None,
+                  progress_interval=None,
+                  progress_msg_template=None,
+                  tox_key_normalization=None):
+    
+    if tox_lookup_key_col_name is None:
+        tox_lookup_key_col_name = args.tox_lookup_key_col_name
+    if tox_lookup_result_col_names is None:
+        tox_lookup_result_col_names = args.tox_lookup_result_col_names
+    if tox_col_delimiter is None:
+        tox_col_delimiter = args.tox_col_delimiter
+    if tox_col_quotechar is None:
+        tox_col_quotechar = args.tox_col_quotechar
+    if tox_cache_path is None:
+        tox_cache_path = args.tox_cache_path
+    if tox_no_cache is None:
+        tox_no_cache = args.tox_no_cache
+    if progress_interval is None:
+        progress_interval = args.progress_interval
+    if progress_msg_template is None:
+        progress_msg_template = args.progress_msg_template
+    if tox_key_normalization is None:
+        tox_key_normalization = args.tox_key_normalization
+    
+    tox_dict = {}
+    
+    print('')
+    print('=============================')
+    print('TOX file: %s' % tox_file_name)
+    print('-----------------------------')
+    print('toxicities lookup dictionary loading started...')
+    
+    # reuse the toxicities lookup cache file,
+    # unless it's missing or stale
+    tox_table = None
+    
+    if not tox_no_cache:
+        if tox_cache_path is not None and tox_cache_path.startswith('~'):
+            tox_cache_path = os.path.expanduser(tox_cache_path)
+        cache_file_name = tox_cache_file_name(tox_file_name,
+                                              tox_lookup_key_col_name,
+                                              tox_lookup_result_col_names,
+                                              tox_cache_path,
+                                              tox_key_normalization,
+                                              tox_col_delimiter,
+                                              tox_col_quotechar)
+        tox_table = open_tox_cache(cache_file_name,
+                                   tox_file_name,
+                                   tox_lookup_key_col_name,
+                                   tox_lookup_result_col_names,
+                                   tox_key_normalization,
+                                   tox_col_delimiter,
+                                   tox_col_quotechar)
+    
+    if tox_table is not None:
+        tox_dict = tox_table
+        print('toxicities lookup cache file: %s' % cache_file_name)
+    
+    else:
+    
+        rows = 0
+        start_time = time.time()
+        
+        normalize_tox_key = bind_tox_key_normalizer(tox_key_normalization)
+        
+        with io.open(tox_file_name, 'r', newline='') as tox_file:
+            tox_dict_reader = csv.DictReader(tox_file,
+                                             delimiter=tox_col_delimiter,
+                                             quotechar=tox_col_quotechar,
+                                             quoting=csv.QUOTE_MINIMAL)
+    
+            for row in tox_dict_reader:
+                rows += 1
+                tox_key = row[tox_lookup_key_col_name]
+                if normalize_tox_key is not None:
+                    tox_key = normalize_tox_key(tox_key)
+                tox_dict[tox_key] = tuple(row[col_name] for col_name in tox_lookup_result_col_names)
+            
+                # output a progress message based on the interval
+                if rows % progress_interval == 0:
+                    # output a progress message
+                    elapsed_time = time.time() - start_time
+                    print(progress_msg_template.format(tox_file_name,
+                                                       rows,
+                                                       elapsed_time,
+                                                       rows / elapsed_time if elapsed_time > 0 else rows))
+        # output a progress message
+        elapsed_time = time.time() - start_time
+        print(progress_msg_template.format(tox_file_name,
+                                           rows,
+                                           elapsed_time,
+                                           rows / elapsed_time if elapsed_time > 0 else rows))
+
+        # build the toxicities lookup cache file for later runs,
+        # and memory-map it for sharing with any worker processes
+        if not tox_no_cache:
+            write_tox_cache(cache_file_name,
+                            tox_dict,
+                            tox_file_name,
+                            tox_lookup_key_col_name,
+                            tox_lookup_result_col_names,
+                            tox_key_normalization,
+                            tox_col_delimiter,
+                            tox_col_quotechar)
+            tox_dict = ToxTable(cache_file_name)
+            print('toxicities lookup cache file built: %s' % cache_file_name)
+            
+    print('toxicities lookup dictionary loading finished!')
+    # pprint(tox_dict)
+    
+    return tox_dict
+
+
+# opt-in instrumentation of the conversion's hot path: when metrics are
+# collected, the source stream, CSV reader, character transformer,
+# toxicities lookup and CSV writer of each source file are wrapped in
+# metered stand-ins accumulating the time spent in, and counts through,
+# each stage; otherwise nothing is wrapped, so nothing is added per row
+
+# the metrics of each source file (or byte-range chunk) converted by this
+# process, appended to by src2tgt_file() and collected from worker
+# processes by call_collecting_metrics()
+member_metrics_list = []
+
+
+def new_stage_metrics():
+    return dict(secs=0.0, count=0)
+
+
+class MemberMetrics(object):
+    
+    def __init__(self, src_file_name, tgt_file_name):
+        self.src_file_name = src_file_name
+        self.tgt_file_name = tgt_file_name
+        self.stages = dict((stage, new_stage_metrics()) for stage in ('read',
+                                                                       'parse',
+                                                                       'xform',
+                                                                       'lookup',
+                                                                       'write'))
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.rows = 0
+        self.cells_xformed = 0
+        self.lookup_hits = 0
+        self.lookup_misses = 0
+        self.secs = 0.0
+    
+    def as_dict(self):
+        # the time spent reading (and inflating) the source
+        # stream is spent within the CSV reader's iteration
+        stages = dict((stage, dict(stage_metrics)) for stage, stage_metrics in self.stages.items())
+        stages['parse']['secs'] = max(0.0, stages['parse']['secs'] - stages['read']['secs'])
+        return dict(src_file_name=self.src_file_name,
+                    tgt_file_name=self.tgt_file_name,
+                    secs=self.secs,
+                    bytes_in=self.bytes_in,
+                    bytes_out=self.bytes_out,
+                    rows=self.rows,
+                    cells_xformed=self.cells_xformed,
+                    lookup_hits=self.lookup_hits,
+                    lookup_misses=self.lookup_misses,
+                    stages=stages)
+
+
+# raw reader metering the reads (and inflation) of a source stream
+
+class MeteredReader(io.RawIOBase):
+    
+    def __init__(self, raw_file, member_metrics):
+        self.raw_file = raw_file
+        self.member_metrics = member_metrics
+        self.stage_metrics = member_metrics.stages['read']
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, b):
+        start_time = time.perf_counter()
+        data = self.raw_file.read(len(b))
+        self.stage_metrics['secs'] += time.perf_counter() - start_time
+        self.stage_metrics['count'] += 1
+        size = len(data)
+        b[:size] = data
+        self.member_metrics.bytes_in += size
+        return size
+    
+    def close(self):
+        if not self.closed:
+            self.raw_file.close()
+        super(MeteredReader, self).close()
+
+
+def open_metered_src_file(src_file, member_metrics):
+    
+    # meter the raw bytes beneath the source stream,
+    # decoding them the same way that it would have
+    metered_reader = MeteredReader(src_file.buffer, member_metrics)
+    # keep the source stream from being garbage collected,
+    # which would close the raw bytes beneath it
+    metered_reader.src_file = src_file
+    
+    return io.TextIOWrapper(io.BufferedReader(metered_reader),
+                            encoding=src_file.encoding,
+                            newline='')
+
+
+class MeteredCsvReader(object):
+    
+    def __init__(self, csv_reader, member_metrics):
+        self.csv_reader = csv_reader
+        self.stage_metrics = member_metrics.stages['parse']
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        start_time = time.perf_counter()
+        try:
+            return next(self.csv_reader)
+        finally:
+            self.stage_metrics['secs'] += time.perf_counter() - start_time
+            self.stage_metrics['count'] += 1
+
+
+class MeteredCharXformer(object):
+    
+    def __init__(self, char_xformer, member_metrics):
+        self.char_xformer = char_xformer
+        self.member_metrics = member_metrics
+        self.stage_metrics = member_metrics.stages['xform']
+    
+    def xform_row(self, row):
+        before = list(row)
+        start_time = time.perf_counter()
+        self.char_xformer.xform_row(row)
+        self.stage_metrics['secs'] += time.perf_counter() - start_time
+        self.stage_metrics['count'] += 1
+        self.member_metrics.cells_xformed += sum(1 for cell, xformed_cell in zip(before, row) if cell != xformed_cell)
+    
+    def xform_cell(self, cell):
+        return self.char_xformer.xform_cell(cell)
+    
+    def xform_cells(self, cells):
+        start_time = time.perf_counter()
+        xformed_cells = list(self.char_xformer.xform_cells(cells))
+        self.stage_metrics['secs'] += time.perf_counter() - start_time
+        self.stage_metrics['count'] += 1
+        self.member_metrics.cells_xformed += sum(1 for i, xformed_cell in xformed_cells if cells[i] != xformed_cell)
+        return xformed_cells
+    
+    def xform_column(self, column):
+        return self.char_xformer.xform_column(column)
+
+
+class MeteredToxDict(object):
+    
+    def __init__(self, tox_dict, member_metrics):
+        self.tox_dict = tox_dict
+        self.member_metrics = member_metrics
+        self.stage_metrics = member_metrics.stages['lookup']
+    
+    def __bool__(self):
+        return bool(self.tox_dict)
+    
+    def __getitem__(self, key):
+        start_time = time.perf_counter()
+        try:
+            tox_values_dict = self.tox_dict[key]
+        except KeyError:
+            self.member_metrics.lookup_misses += 1
+            raise
+        else:
+            self.member_metrics.lookup_hits += 1
+            return tox_values_dict
+        finally:
+            self.stage_metrics['secs'] += time.perf_counter() - start_time
+            self.stage_metrics['count'] += 1
+
+
+class MeteredRowWriter(object):
+    
+    def __init__(self, row_writer, member_metrics):
+        self.row_writer = row_writer
+        self.member_metrics = member_metrics
+        self.stage_metrics = member_metrics.stages['write']
+    
+    def metered(self, method, *method_args):
+        start_time = time.perf_counter()
+        method(*method_args)
+        self.stage_metrics['secs'] += time.perf_counter() - start_time
+    
+    def writerow(self, row):
+        self.metered(self.row_writer.writerow, row)
+        self.stage_metrics['count'] += 1
+        self.member_metrics.rows += 1
+    
+    def writerows(self, rows):
+        self.metered(self.row_writer.writerows, rows)
+        self.stage_metrics['count'] += len(rows)
+        self.member_metrics.rows += len(rows)
+    
+    def flush(self):
+        self.metered(self.row_writer.flush)
+    
+    def close(self):
+        self.metered(self.row_writer.close)
+
+
+# call a routine in a worker process, returning its result
+# along with the metrics of the source files it converted
+
+def call_collecting_metrics(routine, *routine_args, **routine_kwargs):
+    del member_metrics_list[:]
+    result = routine(*routine_args, **routine_kwargs)
+    return result, list(member_metrics_list)
+
+
+# submit a routine to a worker process pool, collecting
+# the metrics of the source files it converts if need be
+
+def submit_collecting_metrics(executor, routine, *routine_args, **routine_kwargs):
+    if routine_kwargs.get('collect_metrics'):
+        return executor.submit(call_collecting_metrics, routine, *routine_args, **routine_kwargs)
+    return executor.submit(routine, *routine_args, **routine_kwargs)
+
+
+def future_result_collecting_metrics(future, collect_metrics):
+    if collect_metrics:
+        result, member_metrics_dicts = future.result()
+        member_metrics_list.extend(member_metrics_dicts)
+        return result
+    return future.result()
+
+
+# peak resident set sizes, in kilobytes, of this
+# process and of its (waited for) worker processes
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    # reported in bytes on macOS, and in kilobytes elsewhere
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return dict(self=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+                children=resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale)
+
+
+def write_metrics_file(metrics_file_name, run_stages, elapsed_secs):
+    
+    # the members' stage totals
+    stages = {}
+    totals = dict(bytes_in=0, bytes_out=0, rows=0, cells_xformed=0, lookup_hits=0, lookup_misses=0)
+    for member_metrics in member_metrics_list:
+        for stage, stage_metrics in member_metrics['stages'].items():
+            total_stage_metrics = stages.setdefault(stage, new_stage_metrics())
+            total_stage_metrics['secs'] += stage_metrics['secs']
+            total_stage_metrics['count'] += stage_metrics['count']
+        for key in totals:
+            totals[key] += member_metrics[key]
+    
+    report = dict(elapsed_secs=elapsed_secs,
+                  peak_rss_kb=peak_rss_kb(),
+                  run_stages=run_stages,
+                  stages=stages,
+                  totals=totals,
+                  members=member_metrics_list)
+    
+    with io.open(metrics_file_name, 'w') as metrics_file:
+        json.dump(report, metrics_file, indent=2)
+    
+    print('metrics written to: %s' % metrics_file_name)
+
+
+# mainline routine, by default:
+#     zip_extension is '.zip'
+#     src_extension is '.csv'
+#     tgt_extension is '.tsv'        
+#     source is comma-delimited and quoted as needed
+#     target is tab-delimited and quoted as needed
+
+def main(zip_path,
+         src_path,
+         tgt_path,
+         tgt_file_basename=None,
+         tgt_file_append=None,
+         src_file_prefix=None,
+         zip_file_extension=None,
+         src_file_extension=None,
+         tgt_file_extension=None,
+         src_col_delimiter=None,
+         tgt_col_delimiter=None,
+         src_col_quotechar=None,
+         tgt_col_quotechar=None,
+         src_tox_lookup_col_name=None,
+         tox_path=None,
+         tox_file_name=None,
+         tox_lookup_key_col_name=None,
+         tox_lookup_result_col_names=None,
+         tox_col_delimiter=None,
+         tox_col_quotechar=None,
+         tox_default_value=None,
+         break_after_first_file=None,
+         rows_flush_interval=None,
+         progress_msg_template=None,
+         max_rows_per_file=None,
+         char_xform_tuples_list=None,
+         src_extract_to_disk=None,
+         workers=None,
+         chunk_workers=None,
+         chunk_size=None,
+         tox_cache_path=None,
+         tox_no_cache=None,
+         incremental=None,
+         pipeline=None,
+         pipeline_queue_size=None,
+         pipeline_batch_rows=None,
+         progress_interval=None,
+         flush_bytes=None,
+         flush_secs=None,
+         write_batch_rows=None,
+         write_buffer_size=None,
+         tgt_format=None,
+         tgt_sqlite_table_name=None,
+         tgt_index_col_names=None,
+         metrics_file=None,
+         columns=None,
+         where=None,
+         partition_by=None,
+         partition_max_open=None,
+         partition_buffer_rows=None,
+         shard_rows=None,
+         shard_bytes=None,
+         shard_key_col_name=None,
+         tgt_compression=None,
+         tgt_compression_level=None,
+         compression_workers=None,
+         compression_block_size=None,
+         dedupe_on=None,
+         src_encoding=None,
+         tgt_encoding=None,
+         byte_char_xforms=None,
+         batch_rows=None,
+         tox_key_normalization=None,
+         plan=None,
+         plan_sample_bytes=None,
+         tgt_offset_index_rows=None,
+         tgt_offset_index_col_name=None,
+         watch=None,
+         watch_interval=None,
+         watch_status_file=None,
+         tgt_stats=None):
+    
+    # default incoming parameters
+    # as needed if they are None
+    if src_file_prefix is None:
+        src_file_prefix = args.src_file_prefix
+    if src_file_extension is None:
+        src_file_extension = args.src_file_extension
+    if tgt_file_extension is None:
+        tgt_file_extension = args.tgt_file_extension
+    if zip_file_extension is None:
+        zip_file_extension = args.zip_file_extension
+    if src_col_delimiter is None:
+        src_col_delimiter = args.src_col_delimiter
+    if tox_col_delimiter is None:
+        tox_col_delimiter = args.tox_col_delimiter
+    if tgt_col_delimiter is None:
+        tgt_col_delimiter = args.tgt_col_delimiter
+    if src_col_quotechar is None:
+        src_col_quotechar = args.src_col_quotechar
+    if tox_col_quotechar is None:
+        tox_col_quotechar = args.tox_col_quotechar
+    if tox_default_value is None:
+        tox_default_value = args.tox_default_value
+    if tgt_col_quotechar is None:
+        tgt_col_quotechar = args.tgt_col_quotechar
+    if tgt_file_basename is None:
+        tgt_file_basename = args.tgt_file_basename
+    if tgt_file_append is None:
+        tgt_file_append = args.tgt_file_append
+    if src_tox_lookup_col_name is None:
+        src_tox_lookup_col_name = args.src_tox_lookup_col_name
+    if tox_lookup_key_col_name is None:
+        tox_lookup_key_col_name = args.tox_lookup_key_col_name
+    if tox_lookup_result_col_names is None:
+        tox_lookup_result_col_names = args.tox_lookup_result_col_names
+    if break_after_first_file is None:
+        break_after_first_file = args.break_after_first_file
+    if rows_flush_interval is None:
+        rows_flush_interval = args.rows_flush_interval
+    if progress_msg_template is None:
+        progress_msg_template = args.progress_msg_template
+    if max_rows_per_file is None:
+        max_rows_per_file = args.max_rows_per_file
+    if src_extract_to_disk is None:
+        src_extract_to_disk = args.src_extract_to_disk
+    if workers is None:
+        workers = args.workers
+    if chunk_workers is None:
+        chunk_workers = args.chunk_workers
+    if chunk_size is None:
+        chunk_size = args.chunk_size
+    if tox_cache_path is None:
+        tox_cache_path = args.tox_cache_path
+    if tox_no_cache is None:
+        tox_no_cache = args.tox_no_cache
+    if incremental is None:
+        incremental = args.incremental
+    if pipeline is None:
+        pipeline = args.pipeline
+    if pipeline_queue_size is None:
+        pipeline_queue_size = args.pipeline_queue_size
+    if pipeline_batch_rows is None:
+        pipeline_batch_rows = args.pipeline_batch_rows
+    if progress_interval is None:
+        progress_interval = args.progress_interval
+    if flush_bytes is None:
+        flush_bytes = args.flush_bytes
+    if flush_secs is None:
+        flush_secs = args.flush_secs
+    if write_batch_rows is None:
+        write_batch_rows = args.write_batch_rows
+    if write_buffer_size is None:
+        write_buffer_size = args.write_buffer_size
+    if tgt_format is None:
+        tgt_format = args.tgt_format
+    if tgt_sqlite_table_name is None:
+        tgt_sqlite_table_name = args.tgt_sqlite_table_name
+    if tgt_index_col_names is None:
+        tgt_index_col_names = args.tgt_index_col_names
+    if metrics_file is None:
+        metrics_file = args.metrics_file
+    if columns is None:
+        columns = args.columns
+    if where is None:
+        where = args.where
+    if partition_by is None:
+        partition_by = args.partition_by
+    if partition_max_open is None:
+        partition_max_open = args.partition_max_open
+    if partition_buffer_rows is None:
+        partition_buffer_rows = args.partition_buffer_rows
+    if shard_rows is None:
+        shard_rows = args.shard_rows
+    if shard_bytes is None:
+        shard_bytes = args.shard_bytes
+    if shard_key_col_name is None:
+        shard_key_col_name = args.shard_key_col_name
+    if tgt_compression is None:
+        tgt_compression = args.tgt_compression
+    if tgt_compression_level is None:
+        tgt_compression_level = args.tgt_compression_level
+    if compression_workers is None:
+        compression_workers = args.compression_workers
+    if compression_block_size is None:
+        compression_block_size = args.compression_block_size
+    if dedupe_on is None:
+        dedupe_on = args.dedupe_on
+    if src_encoding is None:
+        src_encoding = args.src_encoding
+    if src_encoding is None:
+        src_encoding = locale.getpreferredencoding(False)
+    if tgt_encoding is None:
+        tgt_encoding = args.tgt_encoding
+    if tgt_encoding is None:
+        tgt_encoding = locale.getpreferredencoding(False)
+    if byte_char_xforms is None:
+        byte_char_xforms = args.byte_char_xforms
+    if batch_rows is None:
+        batch_rows = args.batch_rows
+    if tox_key_normalization is None:
+        tox_key_normalization = args.tox_key_normalization
+    if plan is None:
+        plan = args.plan
+    if plan_sample_bytes is None:
+        plan_sample_bytes = args.plan_sample_bytes
+    if tgt_offset_index_rows is None:
+        tgt_offset_index_rows = args.tgt_offset_index_rows
+    if tgt_offset_index_col_name is None:
+        tgt_offset_index_col_name = args.tgt_offset_index_col_name
+    if watch is None:
+        watch = args.watch
+    if watch_interval is None:
+        watch_interval = args.watch_interval
+    if watch_status_file is None:
+        watch_status_file = args.watch_status_file
+    if tgt_stats is None:
+        tgt_stats = args.tgt_stats
+    
+    # check the row conditions up front, rather
+    # than once the first source file is reached
+    if where:
+        parse_where(where)
+    
+    # watching only reconverts the new or changed members,
+    # unless the target files below need converting in full
+    if watch:
+        incremental = True
+    
+    # SQLite database files can't be stitched together from
+    # shards or segments, so they're loaded by a single process,
+    # one member after the other, each time in full
+    if tgt_format == 'sqlite':
+        if partition_by is not None:
+            raise ValueError('--partition_by is only supported for CSV target files')
+        if tgt_file_extension == arg_parser.get_default('tgt_file_extension'):
+            tgt_file_extension = '.sqlite'
+        if workers != 1 or chunk_workers != 1 or incremental:
+            print('SQLite target files are loaded serially, and in full')
+        workers = 1
+        chunk_workers = 1
+        incremental = False
+    
+    # and neither can partition files, whose rows
+    # come from any of the members, in any order,
+    # nor shard files, rolling over from one member
+    # to the next after so many rows or bytes
+    sharding = shard_rows > 0 or shard_bytes > 0
+    if sharding and (partition_by is not None or tgt_format == 'sqlite'):
+        raise ValueError('--shard_rows and --shard_bytes are only supported for unpartitioned CSV target files')
+
+    # compressed target files are concatenations of compressed
+    # blocks, so the converted shards and chunks of the members
+    # can still be merged as they are, but the incremental
+    # segments can't have their header rows cut off by byte offset
+    if tgt_compression != 'none':
+        if tgt_format == 'sqlite' or partition_by is not None or sharding:
+            raise ValueError('--tgt_compression is only supported for unpartitioned, unsharded CSV target files')
+        if tgt_compression == 'zstd' and zstandard is None:
+            raise ValueError('--tgt_compression zstd needs the zstandard module')
+        if not tgt_file_extension.endswith(TGT_COMPRESSION_EXTENSIONS[tgt_compression]):
+            tgt_file_extension += TGT_COMPRESSION_EXTENSIONS[tgt_compression]
+        if incremental:
+            print('compressed target files are converted in full')
+        incremental = False
+    if partition_by is not None or sharding:
+        if workers != 1 or chunk_workers != 1 or incremental:
+            print('partitioned or sharded target files are written serially, and in full')
+        workers = 1
+        chunk_workers = 1
+        incremental = False
+    
+    # and neither can the de-duplicated target files,
+    # whose rows are compared with all of the rows
+    # written to them before, from any of the members
+    if dedupe_on is not None:
+        if workers != 1 or chunk_workers != 1 or incremental:
+            print('de-duplicated target files are written serially, and in full')
+        workers = 1
+        chunk_workers = 1
+        incremental = False
+    
+    # and neither can the offset indexed target files, whose
+    # record offsets run on from one member to the next, the
+    # offsets being those of the target files' own bytes
+    if tgt_offset_index_rows > 0 or tgt_offset_index_col_name is not None:
+        if tgt_format == 'sqlite' or partition_by is not None or sharding or tgt_compression != 'none':
+            raise ValueError('--tgt_offset_index_rows and --tgt_offset_index_col_name are only supported for uncompressed, unpartitioned, unsharded CSV target files')
+        if workers != 1 or chunk_workers != 1 or incremental:
+            print('offset indexed target files are written serially, and in full')
+        workers = 1
+        chunk_workers = 1
+        incremental = False
+    
+    # the column statistics of partition or shard files would
+    # need gathering file by file, as their rows are written
+    if tgt_stats and (partition_by is not None or sharding):
+        raise ValueError('--tgt_stats is only supported for unpartitioned, unsharded target files')
+    
+    if zip_path is not None:
+        if zip_path.startswith('~'):
+            zip_path = os.path.expanduser(zip_path)
+            
+        if not os.path.exists(zip_path) and not plan:
+            os.makedirs(zip_path)
+            
+        if not os.path.exists(zip_path):
+            print('--zip_path not found: %s' % zip_path)
+            sys.exit(404)
+    
+    # the source path is only needed
+    # when extracting the source files
+    # to disk, streaming needs no temp space
+    # (and a plan neither extracts nor writes)
+    if src_extract_to_disk and not plan:
+        if src_path is not None:
+            if src_path.startswith('~'):
+                src_path = os.path.expanduser(src_path)
+                
+            if not os.path.exists(src_path):
+                os.makedirs(src_path)
+                
+            if not os.path.exists(src_path):
+                print('--src_path not found: %s' % src_path)
+                sys.exit(404)
+    
+        if src_path is None or not os.path.exists(src_path):
+            print('--src_path not found: %s' % src_path)
+            sys.exit(404)
+
+    if tgt_path is not None:
+        if tgt_path.startswith('~'):
+            tgt_path = os.path.expanduser(tgt_path)
+            
+        if not os.path.exists(tgt_path) and not plan:
+            os.makedirs(tgt_path)
+    
+    if tgt_path is None or (not os.path.exists(tgt_path) and not plan):
+        print('--tgt_path not found: %s' % tgt_path)
+        sys.exit(404)
+
+    if tox_path is not None:    
+        if tox_path.startswith('~'):
+            tox_path = os.path.expanduser(tox_path)
+            
+        if not os.path.exists(tox_path) and not plan:
+            os.makedirs(tox_path)
+            
+        if not os.path.exists(tox_path):
+            print('--tox_path not found: %s' % tox_path)
+            sys.exit(404)
+
+    if tox_path is not None and tox_file_name is not None:
+        tox_file_name = os.path.join(tox_path,
+                                     tox_file_name)
+        
+        if not os.path.exists(tox_file_name):
+            print('--tox_file_name not found: %s' % tox_file_name)
+            sys.exit(404)
+    
+    # the time spent in each of the run's stages,
+    # and the metrics of each converted source file
+    run_start_time = time.perf_counter()
+    run_stages = {}
+    del member_metrics_list[:]
+    row_fingerprint_sets.clear()
+    offset_indexes.clear()
+    column_stats_sets.clear()
+    
+    # if the toxicities file name is specified and exists
+    # implement the loading of the toxicities lookup dictionary
+    
+    tox_dict = {}
+    
+    if tox_file_name is not None:
+        # a plan uses the toxicities lookup cache file if it's
+        # up to date, but never builds it, as it writes nothing
+        if plan and not tox_no_cache:
+            tox_table = open_tox_cache(tox_cache_file_name(tox_file_name,
+                                                           tox_lookup_key_col_name,
+                                                           tox_lookup_result_col_names,
+                                                           os.path.expanduser(tox_cache_path) if tox_cache_path is not None else None,
+                                                           tox_key_normalization,
+                                                           tox_col_delimiter,
+                                                           tox_col_quotechar),
+                                       tox_file_name,
+                                       tox_lookup_key_col_name,
+                                       tox_lookup_result_col_names,
+                                       tox_key_normalization,
+                                       tox_col_delimiter,
+                                       tox_col_quotechar)
+            if tox_table is None:
+                tox_no_cache = True
+            else:
+                tox_table.close()
+        tox_dict = load_tox_dict(tox_file_name,
+                                 tox_lookup_key_col_name,
+                                 tox_lookup_result_col_names,
+                                 tox_col_delimiter,
+                                 tox_col_quotechar,
+                                 tox_cache_path,
+                                 tox_no_cache,
+                                 progress_interval,
+                                 progress_msg_template,
+                                 tox_key_normalization)
+        run_stages['tox_load_secs'] = time.perf_counter() - run_start_time
+
+    # keyword arguments common to the conversion
+    # of each of the source files within the zip archive(s)
+    src2tgt_file_kwargs = dict(src_col_delimiter=src_col_delimiter,
+                               tgt_col_delimiter=tgt_col_delimiter,
+                               src_col_quotechar=src_col_quotechar,
+                               tgt_col_quotechar=tgt_col_quotechar,
+                               src_tox_lookup_col_name=src_tox_lookup_col_name,
+                               tox_dict=tox_dict,
+                               tox_lookup_key_col_name=tox_lookup_key_col_name,
+                               tox_lookup_result_col_names=tox_lookup_result_col_names,
+                               tox_col_delimiter=tox_col_delimiter,
+                               tox_col_quotechar=tox_col_quotechar,
+                               tox_default_value=tox_default_value,
+                               rows_flush_interval=rows_flush_interval,
+                               progress_msg_template=progress_msg_template,
+                               max_rows_per_file=max_rows_per_file,
+                               char_xform_tuples_list=char_xform_tuples_list,
+                               chunk_workers=chunk_workers,
+                               chunk_size=chunk_size,
+                               pipeline=pipeline,
+                               pipeline_queue_size=pipeline_queue_size,
+                               pipeline_batch_rows=pipeline_batch_rows,
+                               progress_interval=progress_interval,
+                               flush_bytes=flush_bytes,
+                               flush_secs=flush_secs,
+                               write_batch_rows=write_batch_rows,
+                               write_buffer_size=write_buffer_size,
+                               tgt_format=tgt_format,
+                               tgt_sqlite_table_name=tgt_sqlite_table_name,
+                               collect_metrics=metrics_file is not None,
+                               columns=columns,
+                               where=where,
+                               partition_by=partition_by,
+                               partition_max_open=partition_max_open,
+                               partition_buffer_rows=partition_buffer_rows,
+                               shard_rows=shard_rows,
+                               shard_bytes=shard_bytes,
+                               shard_key_col_name=shard_key_col_name,
+                               tgt_compression=tgt_compression,
+                               tgt_compression_level=tgt_compression_level,
+                               compression_workers=compression_workers,
+                               compression_block_size=compression_block_size,
+                               dedupe_on=dedupe_on,
+                               src_encoding=src_encoding,
+                               tgt_encoding=tgt_encoding,
+                               byte_char_xforms=byte_char_xforms,
+                               batch_rows=batch_rows,
+                               tox_key_normalization=tox_key_normalization,
+                               tgt_offset_index_rows=tgt_offset_index_rows,
+                               tgt_offset_index_col_name=tgt_offset_index_col_name,
+                               tgt_stats=tgt_stats)
+
+    # keep converting the zip archives as they arrive, each
+    # time with the same toxicities lookup dictionary, rather
+    # than converting the ones in the zip path once
+    if watch and not plan:
+        
+        def convert_work_list(work_list):
+            
+            if break_after_first_file:
+                work_list = work_list[:1]
+            
+            members, tgt_file_names = zip_work_list_members(work_list,
+                                                            tgt_path,
+                                                            tgt_file_basename,
+                                                            tgt_file_append,
+                                                            tgt_file_extension)
+            
+            del member_metrics_list[:]
+            round_start_time = time.perf_counter()
+            
+            # only the new or changed members are reconverted
+            if incremental:
+                converted = convert_zip_members_incrementally(members,
+                                                              src_path,
+                                                              src_extract_to_disk,
+                                                              workers,
+                                                              **src2tgt_file_kwargs)
+            else:
+                rows = convert_zip_members(members,
+                                           src_path,
+                                           src_extract_to_disk,
+                                           workers,
+                                           **src2tgt_file_kwargs)
+                converted = [(member[0], member[1], member_rows) for member, member_rows in zip(members, rows)]
+            
+            if tgt_format == 'sqlite' and tgt_index_col_names:
+                for tgt_file_name in tgt_file_names:
+                    create_sqlite_indexes(tgt_file_name,
+                                          sqlite_table_name(tgt_file_name, tgt_sqlite_table_name),
+                                          tgt_index_col_names)
+            
+            if metrics_file is not None:
+                write_metrics_file(metrics_file,
+                                   dict(run_stages, convert_secs=time.perf_counter() - round_start_time),
+                                   time.perf_counter() - round_start_time)
+            
+            return converted
+        
+        if watch_status_file is None:
+            watch_status_file = os.path.join(tgt_path, WATCH_STATUS_FILE_NAME)
+        
+        watch_zip_path(zip_path,
+                       zip_file_extension,
+                       src_file_prefix,
+                       src_file_extension,
+                       watch_interval,
+                       watch_status_file,
+                       incremental,
+                       convert_work_list)
+        return
+    
+    # plan the conversion of the source files of all of the zip
+    # archives within the zip path at once, from their central
+    # directories, as one work list of members, in date-time order
+    work_list = plan_zip_members(zip_path,
+                                 zip_file_extension,
+                                 src_file_prefix,
+                                 src_file_extension)
+    
+    if break_after_first_file:
+        work_list = work_list[:1]
+    
+    members, tgt_file_names = zip_work_list_members(work_list,
+                                                    tgt_path,
+                                                    tgt_file_basename,
+                                                    tgt_file_append,
+                                                    tgt_file_extension)
+    
+    # list the plan, rather than carrying it out
+    if plan:
+        print_zip_plan(work_list,
+                       members,
+                       tgt_path,
+                       workers,
+                       plan_sample_bytes,
+                       run_stages.get('tox_load_secs', 0.0),
+                       src_extract_to_disk,
+                       **src2tgt_file_kwargs)
+        return
+    
+    # convert the source CSVs
+    # to the target CSVs, with
+    # delimiter and quote char
+    # tweaks as needed
+    if incremental:
+        convert_zip_members_incrementally(members,
+                                          src_path,
+                                          src_extract_to_disk,
+                                          workers,
+                                          **src2tgt_file_kwargs)
+    else:
+        convert_zip_members(members,
+                            src_path,
+                            src_extract_to_disk,
+                            workers,
+                            **src2tgt_file_kwargs)
+    
+    run_stages['convert_secs'] = time.perf_counter() - run_start_time - run_stages.get('tox_load_secs', 0.0)
+    
+    if dedupe_on is not None:
+        print('%d duplicate rows dropped' % sum(row_fingerprints.duplicates for row_fingerprints in row_fingerprint_sets.values()))
+    
+    # index the SQLite target files only once all
+    # of their rows are loaded, which is much faster
+    # than keeping the indexes up to date row by row
+    if tgt_format == 'sqlite' and tgt_index_col_names:
+        index_start_time = time.perf_counter()
+        for tgt_file_name in tgt_file_names:
+            create_sqlite_indexes(tgt_file_name,
+                                  sqlite_table_name(tgt_file_name, tgt_sqlite_table_name),
+                                  tgt_index_col_names)
+        run_stages['index_secs'] = time.perf_counter() - index_start_time
+    
+    if metrics_file is not None:
+        write_metrics_file(metrics_file,
+                           run_stages,
+                           time.perf_counter() - run_start_time)
+
+
+# planner of the conversion of the zip archives within the zip path,
+# reading only their central directories, returning one work list of
+# the source file members to be converted, as (zip archive file name,
+# member name, uncompressed size, date-time) tuples in date-time order,
+# so that the data is likely in the same order from which it was
+# originally split into CSVs; a member found in more than one zip
+# archive, e.g. in a later release of an archive, is only converted
+# once, from the zip archive holding its latest version (or from the
+# last of them in path order, if they're all of the same date-time)
+
+def plan_zip_members(zip_path,
+                     zip_file_extension,
+                     src_file_prefix,
+                     src_file_extension):
+    
+    plan = {}
+    
+    # walk through the zip path in path order, so that the
+    # plan doesn't depend on the order the files are listed in
+    for root, dirs, files in os.walk(zip_path):
+        dirs.sort()
+        for file in sorted(files):
+            # only process zip archives
+            if not file.lower().endswith(zip_file_extension.lower()):
+                continue
+            zip_file_name = os.path.join(root, file)
+            with zipfile.ZipFile(zip_file_name) as zh:
+                for info in zh.infolist():
+                    # filename prefix needs to match source file prefix
+                    if not info.filename.lower().startswith(src_file_prefix.lower()):
+                        continue
+                    # filename needs to end with the desired extension
+                    if not info.filename.lower().endswith(src_file_extension.lower()):
+                        continue
+                    planned = plan.get(info.filename)
+                    if planned is None or planned[3] <= info.date_time:
+                        plan[info.filename] = (zip_file_name,
+                                               info.filename,
+                                               info.file_size,
+                                               info.date_time)
+    
+    # process file names in date-time sort order (a stable sort,
+    # keeping the members of the same date-time in path order)
+    return sorted(plan.values(), key=itemgetter(3))
+
+
+# zip archive members' infos, i.e. their CRC32s, uncompressed sizes
+# and date-times, from their zip archives' central directories
+
+def zip_member_infos(members):
+    
+    infos = {}
+    
+    for zip_file_name in set(member[0] for member in members):
+        with zipfile.ZipFile(zip_file_name) as zh:
+            for info in zh.infolist():
+                infos[(zip_file_name, info.filename)] = info
+    
+    return [infos[(member[0], member[1])] for member in members]
+
+
+# the source files of a work list to be converted, as (zip archive
+# file name, member name, target file name, target file mode, bypass
+# header row) tuples, in conversion order, along with the target
+# file names, in order, e.g. for indexing once they're loaded
+
+def zip_work_list_members(work_list,
+                          tgt_path,
+                          tgt_file_basename,
+                          tgt_file_append,
+                          tgt_file_extension):
+    
+    members = []
+    tgt_file_names = []
+    
+    for zip_file_name, member_name, _file_size, _date_time in work_list:
+        first_file = len(members) == 0
+        # derive the file output mode, either write ('w') or append ('a')
+        file_mode = 'w' if (first_file or tgt_file_append is None) else 'a'
+        # build target file name for output
+        if tgt_file_basename is None:
+            tgt_file_name = os.path.join(tgt_path,
+                                         os.path.splitext(os.path.basename(member_name))[0] + tgt_file_extension)
+        else:
+            tgt_file_name = os.path.join(tgt_path,
+                                         tgt_file_basename + tgt_file_extension)
+        # if it's the first file
+        # or the target file name
+        # is to be different for each
+        # file in the archives' manifests
+        if first_file or tgt_file_basename is None:
+            # don't bypass the header row
+            bypass_header_row = False
+        # otherwise
+        else:
+            # bypass the header row
+            bypass_header_row = True
+        members.append((zip_file_name,
+                        member_name,
+                        tgt_file_name,
+                        file_mode,
+                        bypass_header_row))
+        if tgt_file_name not in tgt_file_names:
+            tgt_file_names.append(tgt_file_name)
+    
+    return members, tgt_file_names
+
+
+# dry run of the plan, calibrating the conversion of each member on
+# a sample of its first uncompressed bytes, read straight from the
+# zip archive, transformed, looked up, filtered and written (into
+# nothing) just as the conversion would, to project its target size
+# (compressed, if need be, SQLite databases being projected as CSV)
+# and conversion time; the run time is projected for the workers
+# taking the members largest first, as convert_zip_members() does
+
+def calibrate_zip_member(zip_file_name,
+                         member_name,
+                         bypass_header_row,
+                         sample_bytes,
+                         **src2tgt_file_kwargs):
+    
+    kwargs = src2tgt_file_kwargs
+    src_encoding = kwargs.get('src_encoding') or locale.getpreferredencoding(False)
+    tgt_encoding = kwargs.get('tgt_encoding') or locale.getpreferredencoding(False)
+    tgt_compression = kwargs.get('tgt_compression', 'none')
+    tgt_compression_level = kwargs.get('tgt_compression_level')
+    if tgt_compression_level is None:
+        tgt_compression_level = 6 if tgt_compression == 'gzip' else 3
+    
+    start_time = time.perf_counter()
+    
+    with zipfile.ZipFile(zip_file_name) as zh:
+        with zh.open(member_name) as member_file:
+            sample = member_file.read(sample_bytes + 1)
+    
+    # whole rows only, unless it's the whole member
+    if len(sample) > sample_bytes:
+        sample = sample[:sample.rfind(b'\n', 0, sample_bytes) + 1] or sample[:sample_bytes]
+    
+    src_file = io.TextIOWrapper(io.BytesIO(sample),
+                                encoding=src_encoding,
+                                errors='replace',
+                                newline='')
+    tox_lookup_result_col_names = kwargs['tox_lookup_result_col_names']
+    tgt_file = io.StringIO()
+    csv_writer = csv.writer(tgt_file,
+                            delimiter=kwargs['tgt_col_delimiter'],
+                            quotechar=kwargs['tgt_col_quotechar'],
+                            quoting=csv.QUOTE_MINIMAL)
+    rows = 0
+    
+    for row in convert_rows(csv.reader(src_file,
+                                       delimiter=kwargs['src_col_delimiter'],
+                                       quotechar=kwargs['src_col_quotechar'],
+                                       quoting=csv.QUOTE_MINIMAL),
+                            compile_char_xforms(kwargs['char_xform_tuples_list']),
+                            tox_tuples_dict(kwargs['tox_dict'], tox_lookup_result_col_names),
+                            (kwargs['tox_default_value'],) * len(tox_lookup_result_col_names),
+                            kwargs['src_tox_lookup_col_name'],
+                            tox_lookup_result_col_names,
+                            bypass_header_row,
+                            columns=kwargs.get('columns'),
+                            row_conditions=parse_where(kwargs['where']) if kwargs.get('where') else None,
+                            dedupe_on=kwargs.get('dedupe_on'),
+                            row_fingerprints=RowFingerprintSet() if kwargs.get('dedupe_on') is not None else None,
+                            batch_rows=kwargs.get('batch_rows', 0),
+                            normalize_tox_key=bind_tox_key_normalizer(kwargs.get('tox_key_normalization'))):
+        rows += 1
+        if row is not None:
+            csv_writer.writerow(row)
+    
+    tgt_bytes = tgt_file.getvalue().encode(tgt_encoding, 'replace')
+    if tgt_compression != 'none':
+        tgt_bytes = compress_block(tgt_bytes, tgt_compression, tgt_compression_level)
+    
+    return len(sample), rows, len(tgt_bytes), time.perf_counter() - start_time
+
+
+def print_zip_plan(work_list,
+                   members,
+                   tgt_path,
+                   workers,
+                   sample_bytes,
+                   tox_load_secs,
+                   src_extract_to_disk,
+                   **src2tgt_file_kwargs):
+    
+    if workers < 1:
+        workers = os.cpu_count() or 1
+    
+    print('')
+    print('=============================')
+    print('PLAN: %d members of %d zip archives' % (len(members), len(set(member[0] for member in members))))
+    print('-----------------------------')
+    
+    infos = zip_member_infos(members)
+    
+    compressed_total = 0
+    uncompressed_total = 0
+    tgt_total = 0
+    member_secs = []
+    
+    for (zip_file_name, member_name, tgt_file_name, tgt_file_mode, bypass_header_row), info in zip(members, infos):
+        calibrated_bytes, rows, tgt_bytes, secs = calibrate_zip_member(zip_file_name,
+                                                                        member_name,
+                                                                        bypass_header_row,
+                                                                        sample_bytes,
+                                                                        **src2tgt_file_kwargs)
+        # scale the sample up to the whole member
+        scale = info.file_size / calibrated_bytes if calibrated_bytes else 0.0
+        projected_tgt_bytes = int(tgt_bytes * scale)
+        projected_secs = secs * scale
+        compressed_total += info.compress_size
+        uncompressed_total += info.file_size
+        tgt_total += projected_tgt_bytes
+        member_secs.append(projected_secs)
+        print('%s: %s bytes compressed, %s bytes uncompressed, dated %s' % (os.path.join(zip_file_name, member_name),
+                                                                          format(info.compress_size, ','),
+                                                                          format(info.file_size, ','),
+                                                                          datetime.datetime(*info.date_time).isoformat(' ')))
+        print('    %s (%s): ~%s bytes, ~%s rows, in ~%.2f secs at %s bytes/sec (from a %s byte sample)' % (tgt_file_name,
+                                                                                                          tgt_file_mode,
+                                                                                                          format(projected_tgt_bytes, ','),
+                                                                                                          format(int(rows * scale), ','),
+                                                                                                          projected_secs,
+                                                                                                          format(int(calibrated_bytes / secs) if secs > 0 else 0, ','),
+                                                                                                          format(calibrated_bytes, ',')))
+    
+    # the workers each taking the largest of the
+    # members left as soon as they're done with one
+    worker_secs = [0.0] * min(workers, max(len(members), 1))
+    for secs in sorted(member_secs, reverse=True):
+        worker_secs[worker_secs.index(min(worker_secs))] += secs
+    run_secs = tox_load_secs + max(worker_secs)
+    
+    # the disk space needed, i.e. the target files and, if
+    # extracting them to disk, the source files, found on the
+    # nearest existing directory of the target path
+    disk_bytes = tgt_total + (uncompressed_total if src_extract_to_disk else 0)
+    disk_path = os.path.abspath(tgt_path)
+    while not os.path.exists(disk_path):
+        disk_path = os.path.dirname(disk_path)
+    free_bytes = shutil.disk_usage(disk_path).free
+    
+    print('-----------------------------')
+    print('total: %s bytes compressed, %s bytes uncompressed, ~%s target bytes' % (format(compressed_total, ','),
+                                                                              format(uncompressed_total, ','),
+                                                                              format(tgt_total, ',')))
+    print('projected run time: ~%.2f secs with %d workers (~%.2f secs serially, including %.2f secs loading the toxicities)' % (run_secs,
+                                                                                                                             len(worker_secs),
+                                                                                                                             tox_load_secs + sum(member_secs),
+                                                                                                                             tox_load_secs))
+    print('projected disk space: ~%s bytes needed%s, %s bytes free at %s%s' % (format(disk_bytes, ','),
+                                                                           ' (including the extracted source files)' if src_extract_to_disk else '',
+                                                                           format(free_bytes, ','),
+                                                                           disk_path,
+                                                                           '' if disk_bytes < free_bytes else ' (NOT ENOUGH)'))
+
+
+# zip archive members to target CSV files converter routine,
+# converting the members either one after the other or, when
+# more than one worker process is specified, in parallel, the
+# largest members first, so that the conversion doesn't end up
+# waiting on a large member started last, each target file's
+# rows still being written in the members' conversion order
+
+def convert_zip_members(members,
+                        src_path,
+                        src_extract_to_disk,
+                        workers=None,
+                        **src2tgt_file_kwargs):
+    
+    if workers is None:
+        workers = args.workers
+    if workers < 1:
+        workers = os.cpu_count() or 1
+    
+    # the number of rows read from each member
+    rows = []
+    
+    # serially, one member after the other
+    if workers == 1 or len(members) < 2:
+        for zip_file_name, member_name, tgt_file_name, tgt_file_mode, bypass_header_row in members:
+            rows.append(convert_zip_member(zip_file_name,
+                                           member_name,
+                                           src_path,
+                                           src_extract_to_disk,
+                                           tgt_file_name,
+                                           tgt_file_mode,
+                                           bypass_header_row,
+                                           **src2tgt_file_kwargs))
+        return rows
+    
+    # when several members are converted into the same
+    # target file, each worker converts its member into
+    # a private shard file and the shards are then merged
+    # into the target file in the members' conversion order
+    tgt_file_names = [member[2] for member in members]
+    merge_shards = len(set(tgt_file_names)) < len(tgt_file_names)
+    
+    if merge_shards:
+        shard_file_names = ['%s.%05d.shard' % (tgt_file_name, i) for i, tgt_file_name in enumerate(tgt_file_names)]
+    else:
+        shard_file_names = []
+    
+    # the largest members first (a stable sort,
+    # keeping members of the same size in order)
+    member_sizes = [info.file_size for info in zip_member_infos(members)]
+    schedule = sorted(range(len(members)), key=lambda i: member_sizes[i], reverse=True)
+    
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(members))) as executor:
+            futures = {}
+            for i in schedule:
+                zip_file_name, member_name, tgt_file_name, tgt_file_mode, bypass_header_row = members[i]
+                if merge_shards:
+                    tgt_file_name = shard_file_names[i]
+                    tgt_file_mode = 'w'
+                futures[i] = submit_collecting_metrics(executor,
+                                                       convert_zip_member,
+                                                       zip_file_name,
+                                                       member_name,
+                                                       src_path,
+                                                       src_extract_to_disk,
+                                                       tgt_file_name,
+                                                       tgt_file_mode,
+                                                       bypass_header_row,
+                                                       **src2tgt_file_kwargs)
+            # wait for all of the members' conversions, in
+            # conversion order, raising the first of any
+            # of their exceptions in that order
+            for i in range(len(members)):
+                rows.append(future_result_collecting_metrics(futures[i], src2tgt_file_kwargs.get('collect_metrics')))
+        
+        # merge the shards into their target files,
+        # writing ('w') or appending ('a') to each
+        # exactly as the serial conversion would have
+        for (zip_file_name, member_name, tgt_file_name, tgt_file_mode, bypass_header_row), shard_file_name in zip(members, shard_file_names):
+            if src2tgt_file_kwargs.get('tgt_stats'):
+                column_stats = open_column_stats(tgt_file_name, tgt_file_mode, False)
+            else:
+                column_stats = None
+            with io.open(tgt_file_name, tgt_file_mode + 'b') as tgt_file:
+                with io.open(shard_file_name, 'rb') as shard_file:
+                    shutil.copyfileobj(shard_file, tgt_file, 1024 * 1024)
+            if column_stats is not None:
+                column_stats.merge(read_column_stats(column_stats_file_name(shard_file_name)))
+                column_stats.write()
+    
+    finally:
+        for shard_file_name in shard_file_names:
+            for file_name in (shard_file_name, column_stats_file_name(shard_file_name)):
+                if os.path.exists(file_name):
+                    os.remove(file_name)
+    
+    return rows
+
+
+# fingerprint of the settings that affect the
+# converted output of a zip archive member
+
+CONVERSION_ONLY_SETTINGS = ('rows_flush_interval',
+                            'progress_msg_template',
+                            'progress_interval',
+                            'flush_bytes',
+                            'flush_secs',
+                            'write_batch_rows',
+                            'write_buffer_size',
+                            'collect_metrics',
+                            'chunk_workers',
+                            'chunk_size',
+                            'pipeline',
+                            'pipeline_queue_size',
+                            'pipeline_batch_rows',
+                            'compression_workers',
+                            'byte_char_xforms',
+                            'batch_rows',
+                            'tgt_offset_index_rows',
+                            'tgt_offset_index_col_name')
+
+def settings_fingerprint(src2tgt_file_kwargs):
+    
+    settings = {}
+    
+    for key, value in sorted(src2tgt_file_kwargs.items()):
+        # the settings that only affect how
+        # the conversion is made, not its output
+        if key in CONVERSION_ONLY_SETTINGS:
+            continue
+        if key == 'tox_dict':
+            value = tox_fingerprint(value)
+        elif key == 'char_xform_tuples_list':
+            value = compile_char_xforms(value).char_xform_tuples
+        settings[key] = value
+    
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+# fingerprint of the toxicities lookup dictionary, either
+# its cache file's source identity or its actual contents
+
+def tox_fingerprint(tox_dict):
+    
+    if not tox_dict:
+        return None
+    
+    if isinstance(tox_dict, ToxTable):
+        return [tox_dict.header[key] for key in ('source', 'size', 'mtime_ns', 'key_col_name', 'result_col_names')]
+    
+    return hashlib.sha1(json.dumps(sorted((key, list(values)) for key, values in tox_dict.items() if isinstance(key, str))).encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+# number of bytes taken up by the first CSV record
+# (the header row) of a file, i.e. up to the first line-feed
+# outside of any quoted field
+
+def csv_header_bytes(file_name, quotechar, encoding=None):
+    
+    if encoding is None:
+        encoding = locale.getpreferredencoding(False)
+    
+    quotechar_byte = quotechar.encode(encoding)
+    header_bytes = 0
+    parity = 0
+    
+    with io.open(file_name, 'rb') as csv_file:
+        for line in csv_file:
+            header_bytes += len(line)
+            parity ^= line.count(quotechar_byte) & 1
+            if parity == 0:
+                break
+    
+    return header_bytes
+
+
+# incremental zip archive members to target CSV files converter routine
+#
+# each member is converted into its own segment file, header row and all,
+# and a manifest sidecar file beside each target file records every member's
+# zip archive, name, CRC32, size, date-time and output settings fingerprint,
+# along with the segment's and the target's byte counts and row counts;
+# a later run only reads the zip archives' central directories, reconverts
+# just the new or changed members (of all of the target files at once),
+# and then rebuilds each target file from the segments in the members'
+# conversion order (unless it's already up to date), returning the
+# (zip archive file name, member name, rows) of the members converted
+
+MANIFEST_VERSION = 1
+
+def convert_zip_members_incrementally(members,
+                                      src_path,
+                                      src_extract_to_disk,
+                                      workers=None,
+                                      **src2tgt_file_kwargs):
+    
+    infos = zip_member_infos(members)
+    
+    settings = settings_fingerprint(src2tgt_file_kwargs)
+    
+    # the members grouped by target file, in conversion order
+    tgt_members = {}
+    for member, info in zip(members, infos):
+        tgt_members.setdefault(member[2], []).append((member, info))
+    
+    # the target files' manifests, entries and changed
+    # entries, and the changed members of all of them
+    tgt_files = []
+    changed_members = []
+    
+    for tgt_file_name, tgt_file_members in tgt_members.items():
+        
+        manifest_file_name = tgt_file_name + '.manifest.json'
+        segments_path = tgt_file_name + '.segments'
+        
+        # a target file converted from a single member
+        # is that member's segment file, needing no rebuild
+        single_segment = (len(tgt_file_members) == 1 and
+                          tgt_file_members[0][0][3] == 'w' and
+                          not tgt_file_members[0][0][4])
+        
+        manifest = {}
+        if os.path.exists(manifest_file_name):
+            with io.open(manifest_file_name, 'r', encoding='utf-8') as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest.get('version') != MANIFEST_VERSION:
+                manifest = {}
+        
+        cached_entries = dict(((entry['archive'], entry['member']), entry) for entry in manifest.get('members', []))
+        
+        entries = []
+        changed_entries = []
+        
+        for (zip_file_name, member_name, _tgt_file_name, tgt_file_mode, bypass_header_row), info in tgt_file_members:
+            archive = os.path.basename(zip_file_name)
+            if single_segment:
+                segment_file_name = tgt_file_name
+            else:
+                segment_file_name = os.path.join(segments_path,
+                                                 '%s.%s.segment' % (os.path.basename(member_name),
+                                                                    hashlib.sha1((archive + '/' + member_name).encode('utf-8')).hexdigest()[:8]))
+            entry = dict(archive=archive,
+                         member=member_name,
+                         crc=info.CRC,
+                         size=info.file_size,
+                         date_time=list(info.date_time),
+                         settings=settings,
+                         segment=os.path.relpath(segment_file_name, os.path.dirname(tgt_file_name)))
+            cached_entry = cached_entries.get((archive, member_name))
+            # unchanged members, whose segment
+            # files are still as they were left
+            if (cached_entry is not None and
+                    all(cached_entry.get(key) == value for key, value in entry.items()) and
+                    os.path.exists(segment_file_name) and
+                    os.path.getsize(segment_file_name) == cached_entry['segment_bytes'] and
+                    (not src2tgt_file_kwargs.get('tgt_stats') or os.path.exists(column_stats_file_name(segment_file_name)))):
+                entry = dict(cached_entry)
+            else:
+                changed_entries.append(entry)
+                changed_members.append((zip_file_name, member_name, segment_file_name, 'w', False))
+            entries.append(entry)
+        
+        print('')
+        print('=============================')
+        print('TGT file: %s' % tgt_file_name)
+        print('-----------------------------')
+        print('%d of %d members unchanged, %d to be converted' % (len(entries) - len(changed_entries),
+                                                                   len(entries),
+                                                                   len(changed_entries)))
+        
+        if changed_entries and not single_segment and not os.path.exists(segments_path):
+            os.makedirs(segments_path)
+        
+        # the manifest is removed until the target
+        # is rebuilt, so that an interrupted run
+        # is never mistaken for an up to date one
+        if changed_entries and os.path.exists(manifest_file_name):
+            os.remove(manifest_file_name)
+        
+        tgt_files.append((tgt_file_name,
+                          [member for member, _info in tgt_file_members],
+                          manifest,
+                          entries,
+                          changed_entries,
+                          single_segment))
+    
+    changed_rows = convert_zip_members(changed_members,
+                                       src_path,
+                                       src_extract_to_disk,
+                                       workers,
+                                       **src2tgt_file_kwargs)
+    
+    # measure the newly converted segments, the changed
+    # entries being in the changed members' order
+    changed_entries = [entry for tgt_file in tgt_files for entry in tgt_file[4]]
+    for entry, (_zip_file_name, _member_name, segment_file_name, _tgt_file_mode, _bypass_header_row), rows in zip(changed_entries, changed_members, changed_rows):
+        entry['segment_bytes'] = os.path.getsize(segment_file_name)
+        entry['header_bytes'] = csv_header_bytes(segment_file_name,
+                                                 src2tgt_file_kwargs['tgt_col_quotechar'],
+                                                 src2tgt_file_kwargs.get('tgt_encoding'))
+        entry['rows'] = rows
+    
+    for tgt_file_name, tgt_file_members, manifest, entries, changed_entries, single_segment in tgt_files:
+        
+        manifest_file_name = tgt_file_name + '.manifest.json'
+        segments_path = tgt_file_name + '.segments'
+        
+        # rebuild the target file from the segment files, writing
+        # ('w') or appending ('a') and bypassing the header row
+        # exactly as the non-incremental conversion would have
+        tgt_offset = 0
+        for entry, (_zip_file_name, _member_name, _tgt_file_name, tgt_file_mode, bypass_header_row) in zip(entries, tgt_file_members):
+            if tgt_file_mode == 'w':
+                tgt_offset = 0
+            entry['tgt_offset'] = tgt_offset
+            entry['tgt_bytes'] = entry['segment_bytes'] - (entry['header_bytes'] if bypass_header_row else 0)
+            entry['tgt_rows'] = entry['rows'] - (1 if bypass_header_row else 0)
+            tgt_offset += entry['tgt_bytes']
+        
+        up_to_date = (not changed_entries and
+                      manifest.get('members') == entries and
+                      os.path.exists(tgt_file_name) and
+                      os.path.getsize(tgt_file_name) == tgt_offset and
+                      (not src2tgt_file_kwargs.get('tgt_stats') or os.path.exists(column_stats_file_name(tgt_file_name))))
+        
+        # along with its column statistics, merged from
+        # those of the segments (a segment's header row
+        # is never counted amongst its statistics' rows)
+        if not single_segment and not up_to_date:
+            for entry, (_zip_file_name, _member_name, _tgt_file_name, tgt_file_mode, bypass_header_row) in zip(entries, tgt_file_members):
+                segment_file_name = os.path.join(os.path.dirname(tgt_file_name), entry['segment'])
+                if src2tgt_file_kwargs.get('tgt_stats'):
+                    column_stats = open_column_stats(tgt_file_name, tgt_file_mode, False)
+                else:
+                    column_stats = None
+                with io.open(tgt_file_name, tgt_file_mode + 'b') as tgt_file:
+                    with io.open(segment_file_name, 'rb') as segment_file:
+                        if bypass_header_row:
+                            segment_file.seek(entry['header_bytes'])
+                        shutil.copyfileobj(segment_file, tgt_file, 1024 * 1024)
+                if column_stats is not None:
+                    column_stats.merge(read_column_stats(column_stats_file_name(segment_file_name)))
+                    column_stats.write()
+            print('target file rebuilt from %d segments: %s' % (len(entries), tgt_file_name))
+        
+        # remove the segments of members no longer converted
+        # (and their column statistics)
+        if os.path.exists(segments_path):
+            segment_file_names = set(os.path.normpath(os.path.join(os.path.dirname(tgt_file_name), entry['segment'])) for entry in entries)
+            segment_file_names.update([column_stats_file_name(segment_file_name) for segment_file_name in segment_file_names])
+            for file_name in os.listdir(segments_path):
+                if os.path.normpath(os.path.join(segments_path, file_name)) not in segment_file_names:
+                    os.remove(os.path.join(segments_path, file_name))
+        
+        tmp_file_name = '%s.%d.tmp' % (manifest_file_name, os.getpid())
+        with io.open(tmp_file_name, 'w', encoding='utf-8') as manifest_file:
+            json.dump(dict(version=MANIFEST_VERSION,
+                           target=os.path.basename(tgt_file_name),
+                           members=entries),
+                      manifest_file,
+                      indent=1)
+        os.replace(tmp_file_name, manifest_file_name)
+    
+    return [(zip_file_name, member_name, rows) for (zip_file_name, member_name, _segment_file_name, _tgt_file_mode, _bypass_header_row), rows in zip(changed_members, changed_rows)]
+
+
+# watcher of the zip path, converting the new or changed zip archives
+# as they arrive, within the one long running process, so that the
+# toxicities lookup dictionary is only loaded once and the compiled
+# character transformations stay memoized from one round to the next;
+# the zip path is polled every so often, or as soon as its file system
+# events say something changed if watchdog is installed, and a round
+# of conversion starts once all of its zip archives have been the same
+# size and modification time for two polls in a row, i.e. once they're
+# done being copied or downloaded; the status file is rewritten after
+# every poll with the queue length, i.e. the number of members of the
+# new or changed zip archives, and the throughput of the conversions
+
+WATCH_STATUS_FILE_NAME = 'Zip2Src2Tgt.watch.json'
+
+
+def zip_path_snapshot(zip_path, zip_file_extension):
+    
+    snapshot = {}
+    
+    for root, _dirs, files in os.walk(zip_path):
+        for file in files:
+            if not file.lower().endswith(zip_file_extension.lower()):
+                continue
+            zip_file_name = os.path.join(root, file)
+            try:
+                stat = os.stat(zip_file_name)
+            except OSError:
+                # e.g. removed since it was listed
+                continue
+            snapshot[zip_file_name] = (stat.st_size, stat.st_mtime_ns)
+    
+    return snapshot
+
+
+def write_watch_status(status_file_name, status):
+    
+    status['updated'] = datetime.datetime.now().isoformat(timespec='seconds')
+    
+    # replaced all at once, so it's never read half written
+    tmp_file_name = '%s.%d.tmp' % (status_file_name, os.getpid())
+    with io.open(tmp_file_name, 'w', encoding='utf-8') as status_file:
+        json.dump(status, status_file, indent=1)
+    os.replace(tmp_file_name, status_file_name)
+
+
+# a watchdog event handler only needs a dispatch method,
+# which just wakes the watcher up to poll the zip path
+
+class ZipPathEventHandler(object):
+    
+    def __init__(self, wake_event):
+        self.wake_event = wake_event
+    
+    def dispatch(self, event):
+        self.wake_event.set()
+
+
+def watch_zip_path(zip_path,
+                   zip_file_extension,
+                   src_file_prefix,
+                   src_file_extension,
+                   watch_interval,
+                   status_file_name,
+                   incremental,
+                   convert_work_list):
+    
+    status = dict(state='starting',
+                  pid=os.getpid(),
+                  zip_path=zip_path,
+                  incremental=incremental,
+                  events='watchdog' if watchdog is not None else 'polling',
+                  started=datetime.datetime.now().isoformat(timespec='seconds'),
+                  polls=0,
+                  rounds=0,
+                  archives=0,
+                  unsettled_archives=0,
+                  queue_members=0,
+                  queue_bytes=0,
+                  converted_members=0,
+                  converted_rows=0,
+                  converted_bytes=0,
+                  convert_secs=0.0,
+                  rows_per_sec=0.0,
+                  bytes_per_sec=0.0,
+                  last_round=None,
+                  last_error=None)
+    
+    wake_event = threading.Event()
+    observer = None
+    if watchdog is not None:
+        observer = watchdog.observers.Observer()
+        observer.schedule(ZipPathEventHandler(wake_event), zip_path, recursive=True)
+        observer.daemon = True
+        observer.start()
+    
+    print('watching %s for %s zip archives (%s), status in %s' % (zip_path,
+                                                                  zip_file_extension,
+                                                                  status['events'],
+                                                                  status_file_name))
+    
+    # the zip archives as of the previous poll,
+    # and as of their last successful conversion
+    previous_snapshot = None
+    converted_snapshot = {}
+    
+    try:
+        while True:
+            snapshot = zip_path_snapshot(zip_path, zip_file_extension)
+            status['polls'] += 1
+            status['archives'] = len(snapshot)
+            status['unsettled_archives'] = sum(1 for zip_file_name, signature in snapshot.items()
+                                               if previous_snapshot is None or previous_snapshot.get(zip_file_name) != signature)
+            
+            changed_zip_file_names = set(zip_file_name for zip_file_name, signature in snapshot.items()
+                                         if converted_snapshot.get(zip_file_name) != signature)
+            removed = any(zip_file_name not in snapshot for zip_file_name in converted_snapshot)
+            
+            # nothing is converted while any of the zip
+            # archives are still being copied or downloaded
+            if (changed_zip_file_names or removed) and status['unsettled_archives'] == 0:
+                try:
+                    work_list = plan_zip_members(zip_path,
+                                                 zip_file_extension,
+                                                 src_file_prefix,
+                                                 src_file_extension)
+                    
+                    # all of the members are reconverted, unless incrementally
+                    queue = [member for member in work_list if not incremental or member[0] in changed_zip_file_names]
+                    status['state'] = 'converting'
+                    status['queue_members'] = len(queue)
+                    status['queue_bytes'] = sum(member[2] for member in queue)
+                    write_watch_status(status_file_name, status)
+                    
+                    round_start_time = time.perf_counter()
+                    converted = convert_work_list(work_list)
+                    round_secs = time.perf_counter() - round_start_time
+                    
+                    file_sizes = dict(((zip_file_name, member_name), file_size) for zip_file_name, member_name, file_size, _date_time in work_list)
+                    round_bytes = sum(file_sizes.get((zip_file_name, member_name), 0) for zip_file_name, member_name, _rows in converted)
+                    round_rows = sum(rows for _zip_file_name, _member_name, rows in converted)
+                    
+                    status['rounds'] += 1
+                    status['converted_members'] += len(converted)
+                    status['converted_rows'] += round_rows
+                    status['converted_bytes'] += round_bytes
+                    status['convert_secs'] += round_secs
+                    status['rows_per_sec'] = status['converted_rows'] / status['convert_secs'] if status['convert_secs'] > 0 else 0.0
+                    status['bytes_per_sec'] = status['converted_bytes'] / status['convert_secs'] if status['convert_secs'] > 0 else 0.0
+                    status['last_round'] = dict(finished=datetime.datetime.now().isoformat(timespec='seconds'),
+                                                archives=sorted(os.path.relpath(zip_file_name, zip_path) for zip_file_name in changed_zip_file_names),
+                                                members=len(converted),
+                                                rows=round_rows,
+                                                bytes=round_bytes,
+                                                secs=round_secs)
+                    status['last_error'] = None
+                    converted_snapshot = snapshot
+                    print('watch round %d: %d members, %d rows converted in %.2f secs' % (status['rounds'],
+                                                                                         len(converted),
+                                                                                         round_rows,
+                                                                                         round_secs))
+                # keep watching, trying again after the next
+                # change, e.g. once a broken archive is replaced
+                except Exception as e:
+                    status['last_error'] = '%s: %s' % (type(e).__name__, e)
+                    print('watch round failed: %s' % status['last_error'])
+                    converted_snapshot = dict(converted_snapshot)
+                    for zip_file_name in changed_zip_file_names:
+                        converted_snapshot[zip_file_name] = snapshot[zip_file_name]
+                    for zip_file_name in list(converted_snapshot):
+                        if zip_file_name not in snapshot:
+                            del converted_snapshot[zip_file_name]
+                status['queue_members'] = 0
+                status['queue_bytes'] = 0
+            
+            status['state'] = 'idle' if status['unsettled_archives'] == 0 else 'settling'
+            write_watch_status(status_file_name, status)
+            previous_snapshot = snapshot
+            
+            wake_event.wait(watch_interval)
+            wake_event.clear()
+    
+    except KeyboardInterrupt:
+        print('watch stopped')
+    
+    finally:
+        status['state'] = 'stopped'
+        write_watch_status(status_file_name, status)
+        if observer is not None:
+            observer.stop()
+
+
+# zip archive member to target CSV file converter routine,
+# either streaming the member straight from the zip archive
+# or extracting it into the source path beforehand
+
+def convert_zip_member(zip_file_name,
+                       member_name,
+                       src_path,
+                       src_extract_to_disk,
+                       tgt_file_name,
+                       tgt_file_mode=None,
+                       bypass_header_row=None,
+                       **src2tgt_file_kwargs):
+    
+    with zipfile.ZipFile(zip_file_name) as zh:
+        # if extracting the source files to disk
+        if src_extract_to_disk:
+            # derive the temporary file's name
+            src_file_name = os.path.join(src_path, member_name)
+            # extract file from zip archive
+            # into the zip archive's path
+            zh.extract(member_name, src_path)
+            # sleep 1 second
+            # to allow extract
+            # to close output file
+            time.sleep(1)
+            # if the temporary file doesn't exist
+            if not os.path.exists(src_file_name):
+                return 0
+            src_file = None
+            src_raw_range = None
+        # otherwise, the source file will be
+        # streamed straight from the zip archive,
+        # decoding it the same way that the
+        # extracted file would have been read
+        else:
+            # derive the source file's display name
+            src_file_name = os.path.join(zip_file_name, member_name)
+            src_file = io.TextIOWrapper(zh.open(member_name),
+                                        encoding=src2tgt_file_kwargs.get('src_encoding') or args.src_encoding or locale.getpreferredencoding(False),
+                                        newline='')
+            # a stored (uncompressed) member's bytes can be
+            # read straight from the zip archive by byte range
+            info = zh.getinfo(member_name)
+            if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+                src_raw_range = (zip_file_name,
+                                 zip_member_data_offset(zip_file_name, info),
+                                 info.file_size)
+            else:
+                src_raw_range = None
+        try:
+            return src2tgt_file(src_file_name,
+                                tgt_file_name,
+                                tgt_file_mode,
+                                bypass_header_row=bypass_header_row,
+                                src_file=src_file,
+                                src_raw_range=src_raw_range,
+                                **src2tgt_file_kwargs)
+        finally:
+            if src_file is not None:
+                src_file.close()
+
+
+# byte offset of a zip archive member's data within the zip archive,
+# i.e. just past the member's local file header
+
+def zip_member_data_offset(zip_file_name, info):
+    
+    with io.open(zip_file_name, 'rb') as zip_file:
+        zip_file.seek(info.header_offset)
+        file_header = struct.unpack(zipfile.structFileHeader,
+                                    zip_file.read(zipfile.sizeFileHeader))
+    
+    if file_header[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile('Bad magic number for file header: %s' % info.filename)
+    
+    # the local file header is followed by the
+    # file name and the extra field, whose lengths
+    # are its 11th and 12th fields respectively
+    return info.header_offset + zipfile.sizeFileHeader + file_header[10] + file_header[11]
+
+
+# raw reader of a byte range of a file, e.g. a chunk
+# of an extracted source file or of a stored member
+
+class RawRangeReader(io.RawIOBase):
+    
+    def __init__(self, file_name, offset, size):
+        self.raw_file = io.open(file_name, 'rb')
+        self.raw_file.seek(offset)
+        self.remaining = size
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, b):
+        size = min(len(b), self.remaining)
+        if size <= 0:
+            return 0
+        size = self.raw_file.readinto(memoryview(b)[:size])
+        self.remaining -= size
+        return size
+    
+    def close(self):
+        self.raw_file.close()
+        super(RawRangeReader, self).close()
+
+
+def open_raw_range(file_name, offset, size, encoding):
+    
+    return io.TextIOWrapper(io.BufferedReader(RawRangeReader(file_name, offset, size), 1024 * 1024),
+                            encoding=encoding,
+                            newline='')
+
+
+# split a byte range of a source file into chunks of approximately
+# chunk_size bytes each, ending each chunk just after a line-feed that
+# is outside of any quoted field, so that quoted fields with embedded
+# new-lines are never split; quote characters are assumed to appear
+# only within quoted fields (doubled when escaped), as per RFC 4180
+
+def find_chunk_boundaries(file_name, offset, size, chunk_size, quotechar_byte, block_size=16 * 1024 * 1024):
+    
+    boundaries = [offset]
+    
+    end = offset + size
+    target = offset + chunk_size
+    
+    # parity of the quote characters
+    # found between offset and pos
+    parity = 0
+    pos = offset
+    
+    with io.open(file_name, 'rb') as raw_file:
+        raw_file.seek(offset)
+        while pos < end:
+            block = raw_file.read(min(block_size, end - pos))
+            if not block:
+                break
+            # index within the block up to
+            # which the parity is accounted for
+            i = 0
+            while True:
+                start = max(target - pos, i)
+                if start >= len(block):
+                    break
+                parity ^= block.count(quotechar_byte, i, start) & 1
+                i = start
+                j = block.find(b'\n', i)
+                if j < 0:
+                    break
+                parity ^= block.count(quotechar_byte, i, j) & 1
+                i = j + 1
+                # outside of any quoted field
+                if parity == 0:
+                    if pos + i < end:
+                        boundaries.append(pos + i)
+                    target = pos + i + chunk_size
+                else:
+                    target = pos + i
+            parity ^= block.count(quotechar_byte, i) & 1
+            pos += len(block)
+    
+    boundaries.append(end)
+    
+    return boundaries
+
+
+# source to target CSV file converter routine for large source files,
+# converting byte-range chunks of the source file in parallel worker
+# processes, each into its own shard, and then concatenating the shards
+# into the target file in order
+
+def src2tgt_file_chunked(src_file_name,
+                         tgt_file_name,
+                         tgt_file_mode,
+                         bypass_header_row,
+                         src_raw_range,
+                         chunk_encoding,
+                         quotechar_byte,
+                         chunk_workers,
+                         chunk_size,
+                         **src2tgt_file_kwargs):
+    
+    raw_file_name, raw_offset, raw_size = src_raw_range
+    
+    boundaries = find_chunk_boundaries(raw_file_name,
+                                       raw_offset,
+                                       raw_size,
+                                       chunk_size,
+                                       quotechar_byte)
+    
+    print('')
+    print('=============================')
+    print('SRC file: %s' % src_file_name)
+    print('-----------------------------')
+    print('converting %d chunks with %d workers...' % (len(boundaries) - 1, chunk_workers))
+    
+    start_time = time.time()
+    
+    # the header row, needed by every chunk but the first
+    with open_raw_range(raw_file_name, raw_offset, raw_size, chunk_encoding) as src_file:
+        src_header_row = next(csv.reader(src_file,
+                                         delimiter=src2tgt_file_kwargs['src_col_delimiter'],
+                                         quotechar=src2tgt_file_kwargs['src_col_quotechar'],
+                                         quoting=csv.QUOTE_MINIMAL))
+    
+    shard_file_names = []
+    
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(chunk_workers, len(boundaries) - 1)) as executor:
+            futures = []
+            for i in range(len(boundaries) - 1):
+                shard_file_name = '%s.chunk%05d.shard' % (tgt_file_name, i)
+                shard_file_names.append(shard_file_name)
+                futures.append(submit_collecting_metrics(executor,
+                                                         src2tgt_chunk,
+                                                         '%s[%d:%d]' % (src_file_name, boundaries[i], boundaries[i + 1]),
+                                                         shard_file_name,
+                                                         (raw_file_name, boundaries[i], boundaries[i + 1] - boundaries[i]),
+                                                         chunk_encoding,
+                                                         bypass_header_row,
+                                                         src_header_row if i > 0 else None,
+                                                         **src2tgt_file_kwargs))
+            rows = 0
+            for future in futures:
+                rows += future_result_collecting_metrics(future, src2tgt_file_kwargs.get('collect_metrics'))
+        
+        if src2tgt_file_kwargs.get('tgt_stats'):
+            column_stats = open_column_stats(tgt_file_name, tgt_file_mode, False)
+        else:
+            column_stats = None
+        
+        # stitch the shards back together, in order
+        with io.open(tgt_file_name, tgt_file_mode + 'b') as tgt_file:
+            for shard_file_name in shard_file_names:
+                with io.open(shard_file_name, 'rb') as shard_file:
+                    shutil.copyfileobj(shard_file, tgt_file, 1024 * 1024)
+        
+        # along with their column statistics
+        if column_stats is not None:
+            for shard_file_name in shard_file_names:
+                column_stats.merge(read_column_stats(column_stats_file_name(shard_file_name)))
+            column_stats.write()
+    
+    finally:
+        for shard_file_name in shard_file_names:
+            for file_name in (shard_file_name, column_stats_file_name(shard_file_name)):
+                if os.path.exists(file_name):
+                    os.remove(file_name)
+    
+    # the header row of each chunk after
+    # the first one was counted as a row
+    rows -= len(shard_file_names) - 1
+    
+    # output a progress message
+    elapsed_time = time.time() - start_time
+    print(src2tgt_file_kwargs['progress_msg_template'].format(src_file_name,
+                                                              rows,
+                                                              elapsed_time,
+                                                              rows / elapsed_time if elapsed_time > 0 else rows))
+    
+    return rows
+
+
+# byte-range chunk of a source file to target shard converter routine
+
+def src2tgt_chunk(src_file_name,
+                  shard_file_name,
+                  src_raw_range,
+                  chunk_encoding,
+                  bypass_header_row,
+                  src_header_row,
+                  **src2tgt_file_kwargs):
+    
+    src_file = open_raw_range(src_raw_range[0],
+                              src_raw_range[1],
+                              src_raw_range[2],
+                              chunk_encoding)
+    
+    return src2tgt_file(src_file_name,
+                        shard_file_name,
+                        'w',
+                        bypass_header_row=bypass_header_row,
+                        src_file=src_file,
+                        src_header_row=src_header_row,
+                        chunk_workers=1,
+                        **src2tgt_file_kwargs)
+
+
+# writer of the converted rows, batching them up for the CSV writer's
+# writerows, and flushing the target file once enough bytes have been
+# written to it, or enough time has passed, since it was last flushed
+
+class BatchedRowWriter(object):
+    
+    def __init__(self, csv_writer, tgt_file, batch_rows, flush_bytes, flush_secs):
+        self.csv_writer = csv_writer
+        self.tgt_file = tgt_file
+        self.batch_rows = batch_rows
+        self.flush_bytes = flush_bytes
+        self.flush_secs = flush_secs
+        self.batch = []
+        self.flushed_pos = tgt_file.buffer.tell()
+        self.flushed_time = time.time()
+    
+    def writerow(self, row):
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_rows:
+            batch = self.batch
+            self.batch = []
+            self.writerows(batch)
+    
+    def writerows(self, rows):
+        self.csv_writer.writerows(rows)
+        # the position of the binary buffer beneath the target
+        # file is cheap to get, unlike that of the text file
+        if self.flush_bytes > 0 and self.tgt_file.buffer.tell() - self.flushed_pos >= self.flush_bytes:
+            self.flush()
+        elif self.flush_secs > 0 and time.time() - self.flushed_time >= self.flush_secs:
+            self.flush()
+    
+    def flush(self):
+        if self.batch:
+            self.csv_writer.writerows(self.batch)
+            self.batch = []
+        self.tgt_file.flush()
+        self.flushed_pos = self.tgt_file.buffer.tell()
+        self.flushed_time = time.time()
+    
+    def close(self):
+        if self.batch:
+            self.csv_writer.writerows(self.batch)
+            self.batch = []
+
+
+# offset index sidecar file of a target CSV file, beside it with an
+# .offsets extension, recording the byte offsets of every Nth record
+# and, if a key column is given, of every record starting a run of
+# records of the same key column value (e.g. every CASNumber's or
+# APINumber's records), so that readers can seek straight to a record
+# or to a safe split point, quoted values with embedded line-feeds
+# and all, rather than scanning the target file from its start; the
+# offsets are counted as the records are written, member after member
+#
+# file layout:
+#     magic (8 bytes), header length (uint32), JSON header
+#     points (uint64 * 2 * point count), each a record number and offset
+#     key runs (uint64 * 2 * key run count), each a record number and offset
+#     key run key value lengths (uint32 * key run count)
+#     key run key values, as UTF-8 bytes
+#
+# the record numbers count the header row, if any, as record 0; the
+# offset indexes are kept in memory as well, by target file name, while
+# the members are converted into their target files, so that appending
+# a member to a target file doesn't mean reading its offset index back
+
+OFFSET_INDEX_MAGIC = b'Z2STOFX1'
+
+offset_indexes = {}
+
+
+def offset_index_file_name(tgt_file_name):
+    return tgt_file_name + '.offsets'
+
+
+def read_offset_index(index_file_name):
+    
+    with io.open(index_file_name, 'rb') as index_file:
+        data = index_file.read()
+    
+    if data[:len(OFFSET_INDEX_MAGIC)] != OFFSET_INDEX_MAGIC:
+        raise ValueError('not a target file offset index: %s' % index_file_name)
+    
+    header_length = struct.unpack_from('<I', data, len(OFFSET_INDEX_MAGIC))[0]
+    offset = len(OFFSET_INDEX_MAGIC) + 4
+    header = json.loads(data[offset:offset + header_length].decode('utf-8'))
+    offset += header_length
+    
+    arrays = []
+    for typecode, count in (('Q', 2 * header['points']),
+                            ('Q', 2 * header['key_runs']),
+                            ('I', header['key_runs'])):
+        values = array.array(typecode)
+        values.frombytes(data[offset:offset + values.itemsize * count])
+        if sys.byteorder != 'little':
+            values.byteswap()
+        offset += values.itemsize * count
+        arrays.append(values)
+    points, key_run_points, key_lengths = arrays
+    
+    key_run_keys = []
+    for length in key_lengths:
+        key_run_keys.append(data[offset:offset + length].decode('utf-8', 'surrogatepass'))
+        offset += length
+    
+    return header, points, key_run_points, key_run_keys
+
+
+class OffsetIndex(object):
+    
+    def __init__(self,
+                 tgt_file_name,
+                 every,
+                 key_col_name,
+                 delimiter,
+                 quotechar,
+                 encoding,
+                 has_header):
+        self.tgt_file_name = tgt_file_name
+        self.every = every
+        self.key_col_name = key_col_name
+        self.key_col_index = None
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.encoding = encoding
+        self.has_header = has_header
+        self.records = 0
+        self.offset = 0
+        self.last_key = None
+        self.points = array.array('Q')
+        self.key_run_points = array.array('Q')
+        self.key_run_keys = []
+    
+    def settings(self):
+        return dict(every=self.every,
+                    key_col_name=self.key_col_name,
+                    delimiter=self.delimiter,
+                    quotechar=self.quotechar,
+                    encoding=self.encoding)
+    
+    def add(self, row):
+        # called with each record just before it's written
+        record = self.records
+        if self.every > 0 and record % self.every == 0:
+            self.points.append(record)
+            self.points.append(self.offset)
+        if record == 0 and self.has_header:
+            if self.key_col_name is not None:
+                try:
+                    self.key_col_index = row.index(self.key_col_name)
+                except ValueError:
+                    raise ValueError('--tgt_offset_index_col_name: target column not found: %s' % self.key_col_name)
+        elif self.key_col_index is not None:
+            key = row[self.key_col_index] if self.key_col_index < len(row) else ''
+            if key != self.last_key:
+                self.key_run_points.append(record)
+                self.key_run_points.append(self.offset)
+                self.key_run_keys.append(key)
+                self.last_key = key
+        self.records = record + 1
+    
+    def write(self):
+        
+        # the offsets are only those of the target file
+        # if all of its bytes were counted as written
+        if not os.path.exists(self.tgt_file_name) or os.path.getsize(self.tgt_file_name) != self.offset:
+            print('%s: target file size not as counted, offset index not written' % self.tgt_file_name)
+            return
+        
+        header = self.settings()
+        header.update(target=os.path.basename(self.tgt_file_name),
+                      size=self.offset,
+                      records=self.records,
+                      has_header=self.has_header,
+                      key_col_index=self.key_col_index,
+                      last_key=self.last_key,
+                      points=len(self.points) // 2,
+                      key_runs=len(self.key_run_keys))
+        header_bytes = json.dumps(header).encode('utf-8')
+        
+        key_bytes = [key.encode('utf-8', 'surrogatepass') for key in self.key_run_keys]
+        
+        arrays = [array.array('Q', self.points),
+                  array.array('Q', self.key_run_points),
+                  array.array('I', map(len, key_bytes))]
+        if sys.byteorder != 'little':
+            for values in arrays:
+                values.byteswap()
+        
+        index_file_name = offset_index_file_name(self.tgt_file_name)
+        tmp_file_name = '%s.%d.tmp' % (index_file_name, os.getpid())
+        
+        with io.open(tmp_file_name, 'wb') as index_file:
+            index_file.write(OFFSET_INDEX_MAGIC)
+            index_file.write(struct.pack('<I', len(header_bytes)))
+            index_file.write(header_bytes)
+            for values in arrays:
+                index_file.write(values.tobytes())
+            index_file.write(b''.join(key_bytes))
+        
+        os.replace(tmp_file_name, index_file_name)
+        
+        print('%s: offset index written, %d points and %d key runs over %d records' % (index_file_name,
+                                                                                      len(self.points) // 2,
+                                                                                      len(self.key_run_keys),
+                                                                                      self.records))
+
+
+# start the offset index of a target file being written ('w'),
+# or carry on with its offset index if it's being appended to ('a'),
+# unless that offset index is missing or stale, in which case the
+# target file can't be indexed without being read, so it isn't
+
+def open_offset_index(tgt_file_name,
+                      tgt_file_mode,
+                      bypass_header_row,
+                      every,
+                      key_col_name,
+                      delimiter,
+                      quotechar,
+                      encoding):
+    
+    offset_index = OffsetIndex(tgt_file_name,
+                               every,
+                               key_col_name,
+                               delimiter,
+                               quotechar,
+                               encoding,
+                               not bypass_header_row)
+    
+    if tgt_file_mode.startswith('w') or not os.path.exists(tgt_file_name):
+        if key_col_name is not None and bypass_header_row:
+            print('%s: no header row, so no key runs in the offset index' % tgt_file_name)
+        offset_indexes[tgt_file_name] = offset_index
+        return offset_index
+    
+    tgt_file_size = os.path.getsize(tgt_file_name)
+    
+    # the offset index kept in memory since the last member,
+    # or else the offset index sidecar file it was written to
+    kept_offset_index = offset_indexes.pop(tgt_file_name, None)
+    
+    if (kept_offset_index is not None and
+            kept_offset_index.offset == tgt_file_size and
+            kept_offset_index.settings() == offset_index.settings()):
+        offset_indexes[tgt_file_name] = kept_offset_index
+        return kept_offset_index
+    
+    index_file_name = offset_index_file_name(tgt_file_name)
+    
+    try:
+        header, points, key_run_points, key_run_keys = read_offset_index(index_file_name)
+    except (IOError, ValueError, KeyError):
+        header = None
+    
+    if (header is None or
+            header['size'] != tgt_file_size or
+            any(header[key] != value for key, value in offset_index.settings().items())):
+        print('%s: offset index missing or stale, not indexing the appended records' % tgt_file_name)
+        if os.path.exists(index_file_name):
+            os.remove(index_file_name)
+        return None
+    
+    offset_index.has_header = header['has_header']
+    offset_index.key_col_index = header['key_col_index']
+    offset_index.records = header['records']
+    offset_index.offset = header['size']
+    offset_index.last_key = header['last_key']
+    offset_index.points = points
+    offset_index.key_run_points = key_run_points
+    offset_index.key_run_keys = key_run_keys
+    
+    offset_indexes[tgt_file_name] = offset_index
+    return offset_index
+
+
+# CSV writer counting the bytes of the records it writes into
+# the target file, noting the offsets of the indexed ones (the
+# csv module writes each record with a single write() call)
+
+class OffsetIndexingCsvWriter(object):
+    
+    def __init__(self, tgt_file, offset_index, **fmtparams):
+        self.tgt_file = tgt_file
+        self.offset_index = offset_index
+        self.encoding = offset_index.encoding
+        self.csv_writer = csv.writer(self, **fmtparams)
+    
+    def write(self, text):
+        self.tgt_file.write(text)
+        self.offset_index.offset += len(text.encode(self.encoding))
+    
+    def writerow(self, row):
+        self.offset_index.add(row)
+        self.csv_writer.writerow(row)
+    
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+
+# reader of a target CSV file by way of its offset index, e.g.
+#
+#     tgt_index = TgtOffsetIndex('FracFocusRegistry.csv')
+#     # a worker's share of the records, split at indexed records
+#     start_record, stop_record = tgt_index.split_records(4)[1]
+#     for row in tgt_index.iter_rows(start_record, stop_record):
+#         ...
+#     # the records of a key column value
+#     for row in tgt_index.iter_key_rows('7732-18-5'):
+#         ...
+
+class TgtOffsetIndex(object):
+    
+    def __init__(self, tgt_file_name, index_file_name=None):
+        
+        self.tgt_file_name = tgt_file_name
+        
+        if index_file_name is None:
+            index_file_name = offset_index_file_name(tgt_file_name)
+        
+        self.header, points, key_run_points, key_run_keys = read_offset_index(index_file_name)
+        
+        if os.path.getsize(tgt_file_name) != self.header['size']:
+            raise ValueError('stale target file offset index: %s' % index_file_name)
+        
+        self.point_records = points[0::2]
+        self.point_offsets = points[1::2]
+        
+        # the key runs of each key, in record order
+        self.key_runs = {}
+        for key, record, record_offset in zip(key_run_keys, key_run_points[0::2], key_run_points[1::2]):
+            self.key_runs.setdefault(key, []).append((record, record_offset))
+    
+    def __len__(self):
+        return self.header['records']
+    
+    def record_offset(self, record):
+        # the nearest indexed record at or before the record,
+        # and its offset, the first record if none is indexed
+        i = bisect.bisect_right(self.point_records, record) - 1
+        if i < 0:
+            return 0, 0
+        return self.point_records[i], self.point_offsets[i]
+    
+    def open_rows(self, record_offset):
+        # a CSV reader of the records from the offset onwards
+        tgt_file = io.TextIOWrapper(io.open(self.tgt_file_name, 'rb'),
+                                    encoding=self.header['encoding'],
+                                    newline='')
+        tgt_file.buffer.seek(record_offset)
+        return tgt_file, csv.reader(tgt_file,
+                                    delimiter=self.header['delimiter'],
+                                    quotechar=self.header['quotechar'],
+                                    quoting=csv.QUOTE_MINIMAL)
+    
+    def iter_rows(self, start_record=0, stop_record=None):
+        # the records from the start record up to the stop record
+        if stop_record is None:
+            stop_record = len(self)
+        record, record_offset = self.record_offset(start_record)
+        tgt_file, csv_reader = self.open_rows(record_offset)
+        with tgt_file:
+            for row in csv_reader:
+                if record >= stop_record:
+                    break
+                if record >= start_record:
+                    yield row
+                record += 1
+    
+    def split_records(self, parts):
+        # (start record, stop record) ranges splitting the data records
+        # into so many parts of about the same size, at indexed records
+        first_record = 1 if self.header['has_header'] else 0
+        first_offset = self.record_offset(first_record)[1] if first_record else 0
+        starts = [first_record]
+        for part in range(1, parts):
+            target_offset = first_offset + (self.header['size'] - first_offset) * part // parts
+            i = bisect.bisect_left(self.point_offsets, target_offset)
+            if i < len(self.point_records) and self.point_records[i] > starts[-1]:
+                starts.append(self.point_records[i])
+        return list(zip(starts, starts[1:] + [len(self)]))
+    
+    def iter_key_rows(self, key):
+        # the records of a key column value, run by run
+        key_col_index = self.header['key_col_index']
+        for record, record_offset in self.key_runs.get(key, []):
+            tgt_file, csv_reader = self.open_rows(record_offset)
+            with tgt_file:
+                for row in csv_reader:
+                    if (row[key_col_index] if key_col_index < len(row) else '') != key:
+                        break
+                    yield row
+
+
+# writer of the target file's bytes, compressing them in blocks of
+# its own, each one a complete gzip member or zstd frame, by a pool of
+# threads (zlib and zstandard both release the GIL while compressing),
+# so the compression keeps up with the conversion, and writing the
+# compressed blocks in order; gzip members and zstd frames can be
+# concatenated, so the target file can be appended to, and merged
+# from shards or chunks, without being decompressed
+
+TGT_COMPRESSION_EXTENSIONS = {'gzip': '.gz',
+                              'zstd': '.zst'}
+
+def compress_block(block, compression, level):
+    
+    if compression == 'gzip':
+        # a window bits value of 16 + 15 makes zlib
+        # write the gzip header and trailer, with
+        # a zero modification time in the header
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + 15)
+        return compressor.compress(block) + compressor.flush()
+    
+    return zstandard.ZstdCompressor(level=level).compress(block)
+
+
+class BlockCompressedWriter(io.BufferedIOBase):
+    
+    def __init__(self, raw_file, compression, level, workers, block_size):
+        self.raw_file = raw_file
+        self.compression = compression
+        if level is None:
+            level = 6 if compression == 'gzip' else 3
+        self.level = level
+        if workers < 1:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.block_size = block_size
+        self.block = bytearray()
+        self.pos = 0
+        self.futures = collections.deque()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    
+    def writable(self):
+        return True
+    
+    def tell(self):
+        # the position in the uncompressed bytes
+        return self.pos
+    
+    def write(self, b):
+        self.block += b
+        self.pos += len(b)
+        if len(self.block) >= self.block_size:
+            self.submit_block()
+        return len(b)
+    
+    def submit_block(self):
+        if self.block:
+            self.futures.append(self.executor.submit(compress_block,
+                                                     bytes(self.block),
+                                                     self.compression,
+                                                     self.level))
+            self.block = bytearray()
+        # write out the compressed blocks that are done, in order,
+        # waiting on them once there are more of them in flight
+        # than there are threads, to bound the memory used
+        while self.futures and (self.futures[0].done() or len(self.futures) > 2 * self.workers):
+            self.raw_file.write(self.futures.popleft().result())
+    
+    def flush(self):
+        if self.closed:
+            return
+        self.submit_block()
+        while self.futures:
+            self.raw_file.write(self.futures.popleft().result())
+        self.raw_file.flush()
+    
+    def close(self):
+        if self.closed:
+            return
+        # closing flushes the blocks still to be written
+        try:
+            super(BlockCompressedWriter, self).close()
+        finally:
+            self.executor.shutdown()
+            self.raw_file.close()
+
+
+# open a target CSV file for either write or append, as a text
+# file, compressing it in parallel blocks if so specified
+
+def open_tgt_file(tgt_file_name,
+                  tgt_file_mode,
+                  write_buffer_size,
+                  tgt_compression,
+                  tgt_compression_level,
+                  compression_workers,
+                  compression_block_size,
+                  tgt_encoding=None):
+    
+    if tgt_encoding is None:
+        tgt_encoding = locale.getpreferredencoding(False)
+    
+    if tgt_compression == 'none':
+        return io.open(tgt_file_name, tgt_file_mode, newline='', buffering=write_buffer_size, encoding=tgt_encoding)
+    
+    raw_file = io.open(tgt_file_name, tgt_file_mode + 'b', buffering=write_buffer_size)
+    
+    return io.TextIOWrapper(BlockCompressedWriter(raw_file,
+                                                  tgt_compression,
+                                                  tgt_compression_level,
+                                                  compression_workers,
+                                                  compression_block_size),
+                            encoding=tgt_encoding,
+                            newline='')
+
+
+# SQLite target table name, by default
+# the base name of the target file
+
+def sqlite_table_name(tgt_file_name, tgt_sqlite_table_name=None):
+    if tgt_sqlite_table_name:
+        return tgt_sqlite_table_name
+    return os.path.splitext(os.path.basename(tgt_file_name))[0]
+
+
+# quote an SQLite identifier, e.g. a table or column name
+
+def sqlite_quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+# writer of the converted rows into an SQLite database table, created
+# from the header row (tox result columns included), bulk inserting
+# them in batches within large transactions, committed when flushed;
+# the same interface as the batched row writer, so that it can be
+# handed over to the pipeline's writer thread as well
+
+class SqliteRowWriter(object):
+    
+    def __init__(self, tgt_file_name, tgt_file_mode, table_name, bypass_header_row, batch_rows, flush_secs):
+        # a new target file is written from scratch, as a CSV file would be
+        if tgt_file_mode.startswith('w') and os.path.exists(tgt_file_name):
+            os.remove(tgt_file_name)
+        self.table_name = table_name
+        self.bypass_header_row = bypass_header_row
+        self.batch_rows = batch_rows
+        self.flush_secs = flush_secs
+        self.batch = []
+        self.col_count = None
+        self.insert_sql = None
+        self.connection = sqlite3.connect(tgt_file_name,
+                                          isolation_level=None,
+                                          check_same_thread=False)
+        # bulk load pragmas: the target file is rebuilt
+        # from the source files if the load is interrupted
+        for pragma in ('journal_mode = OFF',
+                       'synchronous = OFF',
+                       'locking_mode = EXCLUSIVE',
+                       'temp_store = MEMORY',
+                       'cache_size = -262144'):
+            self.connection.execute('PRAGMA ' + pragma)
+        self.connection.execute('BEGIN')
+        self.flushed_time = time.time()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if exc_type is None:
+            self.connection.execute('COMMIT')
+        self.connection.close()
+    
+    def writerow(self, row):
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_rows:
+            batch = self.batch
+            self.batch = []
+            self.writerows(batch)
+    
+    def writerows(self, rows):
+        if self.insert_sql is None:
+            # the header row creates the table, unless it was
+            # bypassed, the rows being appended to the table
+            # from an earlier member, taking on its columns
+            if not self.bypass_header_row:
+                self.connection.execute('CREATE TABLE IF NOT EXISTS %s (%s)' % (sqlite_quote(self.table_name),
+                                                                                ', '.join(sqlite_quote(col_name) for col_name in rows[0])))
+                rows = rows[1:]
+            self.col_count = len(self.connection.execute('PRAGMA table_info(%s)' % sqlite_quote(self.table_name)).fetchall())
+            self.insert_sql = 'INSERT INTO %s VALUES (%s)' % (sqlite_quote(self.table_name),
+                                                               ', '.join(['?'] * self.col_count))
+        col_count = self.col_count
+        # short rows are padded with NULLs, long
+        # rows have no column to go to, so fail
+        for i, row in enumerate(rows):
+            if len(row) != col_count:
+                if len(row) > col_count:
+                    raise ValueError('row has %d columns, table %s has %d' % (len(row), self.table_name, col_count))
+                rows[i] = row + [None] * (col_count - len(row))
+        self.connection.executemany(self.insert_sql, rows)
+        if self.flush_secs > 0 and time.time() - self.flushed_time >= self.flush_secs:
+            self.flush()
+    
+    def flush(self):
+        if self.batch:
+            batch = self.batch
+            self.batch = []
+            self.writerows(batch)
+        self.connection.execute('COMMIT')
+        self.connection.execute('BEGIN')
+        self.flushed_time = time.time()
+    
+    def close(self):
+        if self.batch:
+            batch = self.batch
+            self.batch = []
+            self.writerows(batch)
+
+
+# index an SQLite target table's specified columns
+
+def create_sqlite_indexes(tgt_file_name, table_name, index_col_names):
+    connection = sqlite3.connect(tgt_file_name)
+    try:
+        for col_name in index_col_names:
+            start_time = time.time()
+            connection.execute('CREATE INDEX IF NOT EXISTS %s ON %s (%s)' % (sqlite_quote('ix_%s_%s' % (table_name, col_name)),
+                                                                           sqlite_quote(table_name),
+                                                                           sqlite_quote(col_name)))
+            connection.commit()
+            print('%s: %s indexed on %s in %.2f secs' % (tgt_file_name,
+                                                        table_name,
+                                                        col_name,
+                                                        time.time() - start_time))
+    finally:
+        connection.close()
+
+
+# partition file name of a row's partition value, made safe for
+# use as a file name, within the partitions' path; a value that had
+# to be changed to be safe gets the start of its SHA-1 hash appended,
+# after a ~ (which no safe name holds), so that different values
+# made the same, e.g. North Dakota and North_Dakota, or A/B and A B,
+# still get partition files of their own, from member to member
+
+def partition_file_name(partition_path, value, tgt_file_extension):
+    safe_value = re.sub(r'[^\w.-]+', '_', value).strip('._') or '_'
+    if safe_value != value:
+        safe_value += '~' + hashlib.sha1(value.encode('utf-8', 'surrogatepass')).hexdigest()[:8]
+    return os.path.join(partition_path, safe_value + tgt_file_extension)
+
+
+# partition value of a target column, either its value or, given as
+# e.g. JobStartDate:year, the year of its m/d/yyyy (or yyyy-mm-dd) date
+
+def bind_partition_value(partition_by, header_row):
+    
+    col_name, _sep, part = partition_by.partition(':')
+    
+    try:
+        col_index = header_row.index(col_name)
+    except ValueError:
+        raise ValueError('--partition_by: target column not found: %s' % col_name)
+    
+    if part == '':
+        return lambda row: row[col_index] if col_index < len(row) else ''
+    if part == 'year':
+        def partition_year(row):
+            date = parse_where_date(row[col_index]) if col_index < len(row) else None
+            return str(date.year) if date is not None else ''
+        return partition_year
+    raise ValueError('--partition_by: unknown partition part: %s' % part)
+
+
+# writer of the converted rows into partition files by a target column's
+# value, each with its own header row, buffering each partition's rows
+# and keeping only a bounded number of the partition files open at a
+# time, closing the least recently used first, so that thousands of
+# partitions neither exhaust file descriptors nor make for tiny writes;
+# the same interface as the batched row writer
+
+class PartitionedRowWriter(object):
+    
+    def __init__(self,
+                 tgt_file_name,
+                 tgt_file_mode,
+                 partition_by,
+                 max_open,
+                 buffer_rows,
+                 tgt_col_delimiter,
+                 tgt_col_quotechar,
+                 tgt_encoding=None):
+        # the partition files go into a directory named
+        # after the target file, less its extension
+        self.partition_path, self.tgt_file_extension = os.path.splitext(tgt_file_name)
+        self.partition_by = partition_by
+        self.max_open = max(1, max_open)
+        self.buffer_rows = buffer_rows
+        self.tgt_col_delimiter = tgt_col_delimiter
+        self.tgt_col_quotechar = tgt_col_quotechar
+        self.tgt_encoding = tgt_encoding
+        self.header_row = None
+        self.partition_value = None
+        # rows buffered by partition file name
+        self.buffers = {}
+        self.buffered_rows = 0
+        # open (file, CSV writer) pairs by partition
+        # file name, the least recently used first
+        self.open_files = collections.OrderedDict()
+        if not os.path.exists(self.partition_path):
+            os.makedirs(self.partition_path)
+        # a new target is written from scratch, as a CSV file would be
+        elif tgt_file_mode.startswith('w'):
+            for file_name in os.listdir(self.partition_path):
+                if file_name.endswith(self.tgt_file_extension):
+                    os.remove(os.path.join(self.partition_path, file_name))
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.close()
+        finally:
+            for tgt_file, _csv_writer in self.open_files.values():
+                tgt_file.close()
+            self.open_files.clear()
+    
+    def writerow(self, row):
+        # the first row is always the (converted) header row
+        if self.header_row is None:
+            self.header_row = row
+            self.partition_value = bind_partition_value(self.partition_by, row)
+            return
+        file_name = partition_file_name(self.partition_path,
+                                        self.partition_value(row),
+                                        self.tgt_file_extension)
+        try:
+            buffer = self.buffers[file_name]
+        except KeyError:
+            buffer = self.buffers[file_name] = []
+        buffer.append(row)
+        self.buffered_rows += 1
+        if len(buffer) >= self.buffer_rows:
+            self.write_partition(file_name)
+        # bound the memory held by the buffers
+        # of the many partitions to that of
+        # as many buffers as there are open files
+        elif self.buffered_rows >= self.max_open * self.buffer_rows:
+            self.write_partitions()
+    
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+    
+    def write_partition(self, file_name):
+        buffer = self.buffers.pop(file_name)
+        self.buffered_rows -= len(buffer)
+        try:
+            tgt_file, csv_writer = self.open_files.pop(file_name)
+        except KeyError:
+            # close the least recently used partition file, if need be
+            if len(self.open_files) >= self.max_open:
+                self.open_files.popitem(last=False)[1][0].close()
+            new_file = not os.path.exists(file_name)
+            tgt_file = io.open(file_name, 'a', newline='', encoding=self.tgt_encoding)
+            csv_writer = csv.writer(tgt_file,
+                                    delimiter=self.tgt_col_delimiter,
+                                    quotechar=self.tgt_col_quotechar,
+                                    quoting=csv.QUOTE_MINIMAL)
+            if new_file:
+                csv_writer.writerow(self.header_row)
+        self.open_files[file_name] = (tgt_file, csv_writer)
+        csv_writer.writerows(buffer)
+    
+    def write_partitions(self):
+        for file_name in sorted(self.buffers):
+            self.write_partition(file_name)
+    
+    def flush(self):
+        self.write_partitions()
+        for tgt_file, _csv_writer in self.open_files.values():
+            tgt_file.flush()
+    
+    def close(self):
+        self.write_partitions()
+
+
+# writer of the converted rows into rolling shard files, e.g.
+# FracFocusRegistry_00001.csv, FracFocusRegistry_00002.csv, ...,
+# rolling over to the next shard every so many rows or bytes, each
+# shard with its own header row, and listing the shards' rows, bytes
+# and first and last key values in a shard manifest file, e.g.
+# FracFocusRegistry.shards.json, for loading them in parallel;
+# the same interface as the batched row writer
+
+SHARD_FILE_NAME_TEMPLATE = '%s_%05d%s'
+
+
+class ShardedRowWriter(object):
+    
+    def __init__(self,
+                 tgt_file_name,
+                 tgt_file_mode,
+                 shard_rows,
+                 shard_bytes,
+                 shard_key_col_name,
+                 write_buffer_size,
+                 tgt_col_delimiter,
+                 tgt_col_quotechar,
+                 tgt_encoding=None):
+        self.tgt_path = os.path.dirname(tgt_file_name)
+        self.tgt_file_base_name, self.tgt_file_extension = os.path.splitext(tgt_file_name)
+        self.manifest_file_name = self.tgt_file_base_name + '.shards.json'
+        self.shard_rows = shard_rows
+        self.shard_bytes = shard_bytes
+        self.shard_key_col_name = shard_key_col_name
+        self.write_buffer_size = write_buffer_size
+        self.tgt_col_delimiter = tgt_col_delimiter
+        self.tgt_col_quotechar = tgt_col_quotechar
+        self.tgt_encoding = tgt_encoding
+        self.header_row = None
+        self.shard_key_col_index = 0
+        self.shard = None
+        self.tgt_file = None
+        self.csv_writer = None
+        self.shards = []
+        # appending continues the shards listed in the manifest,
+        # while writing starts over, removing the listed shards
+        if os.path.exists(self.manifest_file_name):
+            with io.open(self.manifest_file_name, 'r') as manifest_file:
+                shards = json.load(manifest_file)['shards']
+            if tgt_file_mode.startswith('a'):
+                self.shards = shards
+            else:
+                for shard in shards:
+                    shard_file_name = os.path.join(self.tgt_path, shard['file_name'])
+                    if os.path.exists(shard_file_name):
+                        os.remove(shard_file_name)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.tgt_file is not None:
+            self.close_shard()
+        if exc_type is None:
+            self.write_manifest()
+    
+    def shard_full(self):
+        if self.shard_rows > 0 and self.shard['rows'] >= self.shard_rows:
+            return True
+        # the position of the binary buffer beneath the target
+        # file is cheap to get, unlike that of the text file
+        if self.shard_bytes > 0 and self.tgt_file.buffer.tell() >= self.shard_bytes:
+            return True
+        return False
+    
+    def open_shard_file(self, mode):
+        self.tgt_file = io.open(os.path.join(self.tgt_path, self.shard['file_name']),
+                                mode,
+                                newline='',
+                                buffering=self.write_buffer_size,
+                                encoding=self.tgt_encoding)
+        self.csv_writer = csv.writer(self.tgt_file,
+                                     delimiter=self.tgt_col_delimiter,
+                                     quotechar=self.tgt_col_quotechar,
+                                     quoting=csv.QUOTE_MINIMAL)
+    
+    def open_shard(self):
+        if self.tgt_file is not None:
+            self.close_shard()
+        # continue the last of the shards being appended to,
+        # i.e. the first time round, unless it's already full
+        if self.shard is None and self.shards:
+            self.shard = self.shards[-1]
+            self.open_shard_file('a')
+            if not self.shard_full():
+                return
+            self.close_shard()
+        self.shard = dict(file_name=os.path.basename(SHARD_FILE_NAME_TEMPLATE % (self.tgt_file_base_name,
+                                                                                 len(self.shards) + 1,
+                                                                                 self.tgt_file_extension)),
+                          rows=0,
+                          bytes=0,
+                          first_key=None,
+                          last_key=None)
+        self.shards.append(self.shard)
+        self.open_shard_file('w')
+        self.csv_writer.writerow(self.header_row)
+    
+    def close_shard(self):
+        self.tgt_file.close()
+        self.tgt_file = None
+        self.shard['bytes'] = os.path.getsize(os.path.join(self.tgt_path, self.shard['file_name']))
+    
+    def writerow(self, row):
+        # the first row is always the (converted) header row
+        if self.header_row is None:
+            self.header_row = row
+            if self.shard_key_col_name is not None:
+                try:
+                    self.shard_key_col_index = row.index(self.shard_key_col_name)
+                except ValueError:
+                    raise ValueError('--shard_key_col_name: target column not found: %s' % self.shard_key_col_name)
+            self.open_shard()
+            return
+        if self.shard_full():
+            self.open_shard()
+        self.csv_writer.writerow(row)
+        shard = self.shard
+        shard['rows'] += 1
+        key = row[self.shard_key_col_index] if self.shard_key_col_index < len(row) else None
+        if shard['first_key'] is None:
+            shard['first_key'] = key
+        shard['last_key'] = key
+    
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+    
+    def flush(self):
+        if self.tgt_file is not None:
+            self.tgt_file.flush()
+    
+    def close(self):
+        self.flush()
+    
+    def write_manifest(self):
+        manifest = dict(header_row=self.header_row,
+                        shard_key_col_name=self.header_row[self.shard_key_col_index] if self.header_row else None,
+                        rows=sum(shard['rows'] for shard in self.shards),
+                        bytes=sum(shard['bytes'] for shard in self.shards),
+                        shards=self.shards)
+        tmp_file_name = '%s.%d.tmp' % (self.manifest_file_name, os.getpid())
+        with io.open(tmp_file_name, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(tmp_file_name, self.manifest_file_name)
+
+
+# pipelined conversion of a source file, with the decompression (or
+# reading) of the source file and the writing of the target file each
+# running in their own thread, the conversion itself running in the
+# calling thread, and the stages connected by bounded queues so that the
+# memory used stays capped; zlib releases the GIL while inflating, as
+# does file I/O, so the stages genuinely overlap
+
+PIPELINE_BLOCK_SIZE = 1024 * 1024
+
+# marker passed down the row batches queue to flush the target file
+PIPELINE_FLUSH = 'flush'
+
+
+# bounded queue between two pipeline stages, keeping track of its depth
+# and of the time that its producer and consumer spent blocked on it
+
+class PipelineQueue(object):
+    
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.queue = queue.Queue(maxsize)
+        self.maxsize = maxsize
+        # set by a consumer that has stopped consuming,
+        # so that its producer stops blocking on it
+        self.closed = False
+        self.items = 0
+        self.depth_max = 0
+        self.depth_total = 0
+        self.put_blocked = 0.0
+        self.get_blocked = 0.0
+    
+    def put(self, item):
+        start_time = time.perf_counter()
+        while not self.closed:
+            try:
+                self.queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self.put_blocked += time.perf_counter() - start_time
+        depth = self.queue.qsize()
+        self.items += 1
+        self.depth_total += depth
+        self.depth_max = max(self.depth_max, depth)
+    
+    def get(self):
+        start_time = time.perf_counter()
+        item = self.queue.get()
+        self.get_blocked += time.perf_counter() - start_time
+        return item
+    
+    def stats_msg(self):
+        return '%s queue: %d items, depth max %d/%d, mean %.1f, producer blocked %.2f secs, consumer blocked %.2f secs' % (
+            self.name,
+            self.items,
+            self.depth_max,
+            self.maxsize,
+            self.depth_total / self.items if self.items > 0 else 0.0,
+            self.put_blocked,
+            self.get_blocked)
+
+
+# raw reader of a source file whose blocks are read (and decompressed)
+# by its own thread, ahead of the conversion, through a bounded queue
+
+class PipelineReader(io.RawIOBase):
+    
+    def __init__(self, raw_file, queue_size, block_size=PIPELINE_BLOCK_SIZE):
+        self.raw_file = raw_file
+        self.block_size = block_size
+        self.queue = PipelineQueue('decompressed blocks', queue_size)
+        self.block = memoryview(b'')
+        self.eof = False
+        self.thread = threading.Thread(target=self._read_blocks, name='pipeline-decompress')
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def _read_blocks(self):
+        try:
+            while not self.queue.closed:
+                block = self.raw_file.read(self.block_size)
+                if not block:
+                    break
+                self.queue.put(block)
+            self.queue.put(None)
+        except BaseException as e:
+            self.queue.put(e)
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, b):
+        while not self.block:
+            if self.eof:
+                return 0
+            item = self.queue.get()
+            if item is None:
+                self.eof = True
+                return 0
+            if isinstance(item, BaseException):
+                self.eof = True
+                raise item
+            self.block = memoryview(item)
+        size = min(len(b), len(self.block))
+        b[:size] = self.block[:size]
+        self.block = self.block[size:]
+        return size
+    
+    def close(self):
+        if not self.closed:
+            self.queue.closed = True
+            self.thread.join()
+            self.raw_file.close()
+        super(PipelineReader, self).close()
+
+
+def open_pipeline_src_file(src_file, queue_size):
+    
+    # read the raw bytes beneath the source stream (e.g. a member
+    # streamed from a zip archive), decoding them the same way
+    # that the source stream would have
+    pipeline_reader = PipelineReader(src_file.buffer, queue_size)
+    # keep the source stream from being garbage collected,
+    # which would close the raw bytes beneath it
+    pipeline_reader.src_file = src_file
+    
+    return pipeline_reader, io.TextIOWrapper(io.BufferedReader(pipeline_reader, PIPELINE_BLOCK_SIZE),
+                                             encoding=src_file.encoding,
+                                             newline='')
+
+
+# writer of the converted rows, batching them up for its own thread
+# to pass on to the batched row writer, through a bounded queue
+
+class PipelineWriter(object):
+    
+    def __init__(self, row_writer, queue_size, batch_rows):
+        self.row_writer = row_writer
+        self.batch_rows = batch_rows
+        self.batch = []
+        self.queue = PipelineQueue('row batches', queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self._write_batches, name='pipeline-write')
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def _write_batches(self):
+        try:
+            while True:
+                batch = self.queue.get()
+                if batch is None:
+                    break
+                if batch is PIPELINE_FLUSH:
+                    self.row_writer.flush()
+                else:
+                    self.row_writer.writerows(batch)
+            self.row_writer.close()
+        except BaseException as e:
+            self.error = e
+            self.queue.closed = True
+    
+    def writerow(self, row):
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_rows:
+            self.queue.put(self.batch)
+            self.batch = []
+    
+    def flush(self):
+        if self.batch:
+            self.queue.put(self.batch)
+            self.batch = []
+        self.queue.put(PIPELINE_FLUSH)
+    
+    def close(self):
+        if self.batch:
+            self.queue.put(self.batch)
+            self.batch = []
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+    
+    # stop the writer thread once the conversion has failed,
+    # dropping the rows not yet written, and its own error, if any
+    def abort(self):
+        self.batch = []
+        self.queue.put(None)
+        self.thread.join()
+
+
+# library interface, for converting zip archive members without
+# going through the command line, e.g. streaming the converted rows
+# straight into the caller's own sink:
+#
+#     config = make_config(tox_path='TOXs', tox_file_name='tox.csv')
+#     tox_dict = config_tox_dict(config)
+#     for row in iter_converted_rows('FracFocusCSV.zip',
+#                                    'FracFocusRegistry_1.csv',
+#                                    config,
+#                                    tox_dict):
+#         ...
+
+# configuration of a conversion, i.e. the command line's
+# default parameter values overridden by the specified settings
+
+def make_config(**settings):
+    config = arg_parser.parse_args([])
+    config.char_xform_tuples_list = list(char_xform_tuples_list)
+    for key, value in settings.items():
+        if not hasattr(config, key):
+            raise TypeError('unknown setting: %s' % key)
+        setattr(config, key, value)
+    return config
+
+
+# toxicities lookup dictionary of a configuration,
+# empty if its toxicities file is not specified or found
+
+def config_tox_dict(config):
+    if config.tox_path is None or config.tox_file_name is None:
+        return {}
+    tox_file_name = os.path.join(os.path.expanduser(config.tox_path),
+                                 config.tox_file_name)
+    if not os.path.exists(tox_file_name):
+        return {}
+    return load_tox_dict(tox_file_name,
+                         config.tox_lookup_key_col_name,
+                         config.tox_lookup_result_col_names,
+                         config.tox_col_delimiter,
+                         config.tox_col_quotechar,
+                         config.tox_cache_path,
+                         config.tox_no_cache,
+                         config.progress_interval,
+                         config.progress_msg_template,
+                         config.tox_key_normalization)
+
+
+# generator of the converted rows of a zip archive member, streamed
+# straight from the zip archive, the header row first unless bypassed;
+# the toxicities lookup dictionary is loaded from the configuration's
+# toxicities file unless provided, an empty one meaning no lookups
+
+def iter_converted_rows(zip_file_name,
+                        member_name,
+                        config=None,
+                        tox_dict=None,
+                        bypass_header_row=False,
+                        **settings):
+    
+    if config is None:
+        config = make_config(**settings)
+    elif settings:
+        config_settings = vars(config).copy()
+        config_settings.update(settings)
+        config = make_config(**config_settings)
+    
+    if tox_dict is None:
+        tox_dict = config_tox_dict(config)
+    else:
+        tox_dict = tox_tuples_dict(tox_dict, config.tox_lookup_result_col_names)
+    
+    tox_default_values = (config.tox_default_value,) * len(config.tox_lookup_result_col_names)
+    
+    with zipfile.ZipFile(zip_file_name) as zh:
+        with io.TextIOWrapper(zh.open(member_name),
+                              encoding=config.src_encoding or locale.getpreferredencoding(False),
+                              newline='') as src_file:
+            # transform the raw bytes, if need be, before they're decoded
+            if config.byte_char_xforms and not config.where:
+                byte_xformer = compile_byte_xforms(config.char_xform_tuples_list,
+                                                   src_file.encoding,
+                                                   config.src_col_delimiter,
+                                                   config.src_col_quotechar)
+                if byte_xformer is not None:
+                    src_file = open_byte_xformed_src_file(src_file, byte_xformer)
+            csv_reader = csv.reader(src_file,
+                                    delimiter=config.src_col_delimiter,
+                                    quotechar=config.src_col_quotechar,
+                                    quoting=csv.QUOTE_MINIMAL)
+            rows = 0
+            for row in convert_rows(csv_reader,
+                                    compile_char_xforms(config.char_xform_tuples_list),
+                                    tox_dict,
+                                    tox_default_values,
+                                    config.src_tox_lookup_col_name,
+                                    config.tox_lookup_result_col_names,
+                                    bypass_header_row,
+                                    columns=config.columns,
+                                    row_conditions=parse_where(config.where) if config.where else None,
+                                    dedupe_on=config.dedupe_on,
+                                    row_fingerprints=RowFingerprintSet() if config.dedupe_on is not None else None,
+                                    batch_rows=config.batch_rows,
+                                    normalize_tox_key=bind_tox_key_normalizer(config.tox_key_normalization)):
+                rows += 1
+                if row is not None:
+                    yield row
+                if config.max_rows_per_file > 0 and rows >= config.max_rows_per_file:
+                    break
+
+
+# row conditions, e.g. StateName=Texas|Oklahoma or JobStartDate>=1/1/2015,
+# parsed into (column name, operator, value(s), value kind) tuples, the
+# values being compared as numbers if they're numeric, as dates if they're
+# m/d/yyyy (or yyyy-mm-dd) dates, or otherwise as text
+
+WHERE_PATTERN = re.compile(r'^\s*([^!<>=]+?)\s*(!=|<=|>=|=|<|>)\s*(.*?)\s*$')
+
+WHERE_DATE_FORMATS = ('%m/%d/%Y', '%Y-%m-%d')
+
+
+def parse_where_number(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_where_date(value):
+    # ignoring any time of day, e.g. 1/1/2015 12:00:00 AM
+    value = value.split(' ', 1)[0]
+    for date_format in WHERE_DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    return None
+
+
+def parse_where(where):
+    
+    row_conditions = []
+    
+    for condition in where:
+        match = WHERE_PATTERN.match(condition)
+        if match is None:
+            raise ValueError('--where: invalid row condition: %s' % condition)
+        col_name, operator, value = match.groups()
+        # equality is tested against a set of text values
+        if operator in ('=', '!='):
+            row_conditions.append((col_name, operator, frozenset(value.split('|')), 'text'))
+            continue
+        if parse_where_number(value) is not None:
+            row_conditions.append((col_name, operator, parse_where_number(value), 'number'))
+        elif parse_where_date(value) is not None:
+            row_conditions.append((col_name, operator, parse_where_date(value), 'date'))
+        else:
+            row_conditions.append((col_name, operator, value, 'text'))
+    
+    return row_conditions
+
+
+# row filter of parsed row conditions, bound to a header row's
+# column indexes, testing the parsed, stripped, column values,
+# i.e. before the rows are transformed; a value that can't be
+# compared, e.g. one that isn't numeric, doesn't meet its condition
+
+WHERE_OPERATORS = {'<': lambda a, b: a < b,
+                   '<=': lambda a, b: a <= b,
+                   '>': lambda a, b: a > b,
+                   '>=': lambda a, b: a >= b}
+
+
+def bind_row_filter(row_conditions, header_row):
+    
+    tests = []
+    
+    for col_name, operator, value, kind in row_conditions:
+        try:
+            col_index = header_row.index(col_name)
+        except ValueError:
+            raise ValueError('--where: column not found: %s' % col_name)
+        if operator == '=':
+            tests.append((col_index, value.__contains__, None))
+        elif operator == '!=':
+            tests.append((col_index, lambda cell, values=value: cell not in values, None))
+        else:
+            parse_value = {'number': parse_where_number, 'date': parse_where_date, 'text': None}[kind]
+            compare = WHERE_OPERATORS[operator]
+            tests.append((col_index, lambda cell, compare=compare, value=value: compare(cell, value), parse_value))
+    
+    def row_filter(row):
+        for col_index, test, parse_value in tests:
+            if col_index >= len(row):
+                return False
+            cell = row[col_index].strip()
+            if parse_value is not None:
+                cell = parse_value(cell)
+                if cell is None:
+                    return False
+            if not test(cell):
+                return False
+        return True
+    
+    return row_filter
+
+
+# column projection of a header row's columns, keeping
+# the specified columns in the order they were specified
+
+def bind_projection(columns, header_row):
+    
+    col_indexes = []
+    
+    for col_name in columns:
+        try:
+            col_indexes.append(header_row.index(col_name))
+        except ValueError:
+            raise ValueError('--columns: column not found: %s' % col_name)
+    
+    col_count = max(col_indexes) + 1
+    get_cols = itemgetter(*col_indexes)
+    
+    def project(row):
+        # a row missing some of its columns has them as empty
+        if len(row) < col_count:
+            row = row + [''] * (col_count - len(row))
+        if len(col_indexes) == 1:
+            return [get_cols(row)]
+        return list(get_cols(row))
+    
+    return project
+
+
+# de-duplication of the converted rows, by their 64-bit fingerprints,
+# i.e. the first 8 bytes of the BLAKE2b hash of their key column values,
+# kept in an open-addressing hash set backed by an array of unsigned
+# 64-bit integers, taking up 8 to 16 bytes per row (rather than the
+# 100 or so bytes per row of a set of Python strings or tuples); with
+# 64-bit fingerprints, the odds of two different rows colliding stay
+# below one in ten thousand up to a few hundred million rows
+
+ROW_FINGERPRINT_SEPARATOR = '\x00'
+
+
+def row_fingerprint(cells):
+    digest = hashlib.blake2b(ROW_FINGERPRINT_SEPARATOR.join(cells).encode('utf-8'), digest_size=8).digest()
+    # zero marks an empty slot of the fingerprint set
+    return int.from_bytes(digest, 'little') or 1
+
+
+class RowFingerprintSet(object):
+    
+    def __init__(self, capacity=1 << 16):
+        self.slots = array.array('Q', bytes(8 * capacity))
+        self.mask = capacity - 1
+        self.count = 0
+        self.duplicates = 0
+    
+    def __len__(self):
+        return self.count
+    
+    def add(self, fingerprint):
+        # linear probing, the fingerprint's low bits being
+        # as good as any, returning False for a duplicate
+        slots = self.slots
+        mask = self.mask
+        i = fingerprint & mask
+        slot = slots[i]
+        while slot:
+            if slot == fingerprint:
+                self.duplicates += 1
+                return False
+            i = (i + 1) & mask
+            slot = slots[i]
+        slots[i] = fingerprint
+        self.count += 1
+        # keep the load factor at or below 3/4
+        if self.count * 4 > (mask + 1) * 3:
+            self.grow()
+        return True
+    
+    def grow(self):
+        old_slots = self.slots
+        capacity = 2 * len(old_slots)
+        slots = array.array('Q', bytes(8 * capacity))
+        mask = capacity - 1
+        for fingerprint in old_slots:
+            if fingerprint:
+                i = fingerprint & mask
+                while slots[i]:
+                    i = (i + 1) & mask
+                slots[i] = fingerprint
+        self.slots = slots
+        self.mask = mask
+
+
+# the fingerprint sets of the target files' rows, by target file
+# name, outliving the conversion of any one member into them
+
+row_fingerprint_sets = {}
+
+
+def tgt_row_fingerprints(tgt_file_name, tgt_file_mode):
+    # a target file being (re)written starts over
+    if tgt_file_mode.startswith('w') or tgt_file_name not in row_fingerprint_sets:
+        row_fingerprint_sets[tgt_file_name] = RowFingerprintSet()
+    return row_fingerprint_sets[tgt_file_name]
+
+
+# de-duplication key of a target header row's columns,
+# i.e. the specified column values, or the whole row
+
+def bind_dedupe_key(dedupe_on, tgt_header_row):
+    
+    if not dedupe_on:
+        return lambda row: row
+    
+    col_indexes = []
+    
+    for col_name in dedupe_on:
+        try:
+            col_indexes.append(tgt_header_row.index(col_name))
+        except ValueError:
+            raise ValueError('--dedupe_on: target column not found: %s' % col_name)
+    
+    def dedupe_key(row):
+        return [row[col_index] if col_index < len(row) else '' for col_index in col_indexes]
+    
+    return dedupe_key
+
+
+# column statistics of the target files' rows, gathered in the same pass
+# as the rows are written, i.e. each column's number of nulls (empty
+# values), estimated number of distinct values, inferred type (integer,
+# float, date or text, or None if it's all nulls), minimum and maximum
+# values (as numbers, yyyy-mm-dd dates or text) and maximum length, for
+# sizing the columns when loading the target files; the distinct values
+# are estimated by a HyperLogLog sketch of each column, i.e. 2^12 one-byte
+# registers (about 1.6% standard error) rather than the values themselves,
+# and the rows are summarized a batch at a time, column by column, only
+# the distinct values of each batch being hashed and typed
+#
+# the statistics are written to a JSON sidecar file beside the target
+# file, with a .stats.json extension, their sketches included, so that
+# the statistics of the shards, chunks and segments of a target file can
+# be merged, and appended to, member after member; they're kept in memory
+# as well, by target file name, while the members are converted, so that
+# appending a member to a target file doesn't mean reading them back
+
+COLUMN_STATS_VERSION = 1
+
+COLUMN_STATS_BATCH_ROWS = 4096
+
+HLL_PRECISION = 12
+HLL_RANK_BITS = 64 - HLL_PRECISION
+HLL_RANK_MASK = (1 << HLL_RANK_BITS) - 1
+
+# the values of each batch are typed and hashed joined together by a
+# separator, i.e. all at once, a value holding the separator being text
+COLUMN_VALUE_SEPARATOR = '\x1f'
+
+# integers with leading zeros, e.g. codes, are left as text, neither
+# integers nor floats (a zero only leads a float's fraction or exponent,
+# e.g. 0.5 or 0e3); dates are m/d/yyyy or yyyy-mm-dd, ignoring any time
+# of day, as for the row conditions
+INTEGER_VALUE_PATTERN = r'[-+]?(?:0|[1-9][0-9]*)'
+FLOAT_VALUE_PATTERN = r'[-+]?(?:(?:0|[1-9][0-9]*)(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][-+]?[0-9]+)?'
+DATE_VALUE_PATTERN = r'(?:([0-9]{1,2})/([0-9]{1,2})/([0-9]{4})|([0-9]{4})-([0-9]{2})-([0-9]{2}))(?: [^\x1f]*)?'
+
+def joined_values_regex(value_pattern):
+    return re.compile(r'{0}(?:\x1f{0})*\Z'.format(value_pattern))
+
+INTEGER_VALUES_REGEX = joined_values_regex(INTEGER_VALUE_PATTERN)
+FLOAT_VALUES_REGEX = joined_values_regex(FLOAT_VALUE_PATTERN)
+DATE_VALUES_REGEX = joined_values_regex(DATE_VALUE_PATTERN)
+DATE_VALUE_REGEX = re.compile(DATE_VALUE_PATTERN)
+
+column_stats_sets = {}
+
+
+def column_stats_file_name(tgt_file_name):
+    return tgt_file_name + '.stats.json'
+
+
+# a date value's (year, month, day), or None if it's not a valid date,
+# e.g. 13/45/2015, which is only shaped like one
+
+def date_value_key(value):
+    match = DATE_VALUE_REGEX.match(value)
+    if match is None:
+        return None
+    month, day, year, iso_year, iso_month, iso_day = match.groups()
+    if year is None:
+        key = (int(iso_year), int(iso_month), int(iso_day))
+    else:
+        key = (int(year), int(month), int(day))
+    try:
+        datetime.date(*key)
+    except ValueError:
+        return None
+    return key
+
+
+# the narrowest type of a batch's distinct (non-null) values, along with
+# their minimum and maximum, not bothering with the types that couldn't
+# be joined with the column's type so far to anything but text
+
+def typed_value_bounds(values, joined_values, col_type):
+    if joined_values is None:
+        return 'text', None, None
+    if col_type != 'date':
+        if col_type != 'float' and INTEGER_VALUES_REGEX.match(joined_values):
+            numbers = [int(value) for value in values]
+            return 'integer', min(numbers), max(numbers)
+        # floats overflowing to infinity, e.g. 1e400, are text,
+        # as they'd make for invalid JSON in the sidecar file
+        if FLOAT_VALUES_REGEX.match(joined_values):
+            numbers = [float(value) for value in values]
+            if all(map(math.isfinite, numbers)):
+                return 'float', min(numbers), max(numbers)
+    if (col_type is None or col_type == 'date') and DATE_VALUES_REGEX.match(joined_values):
+        keys = [date_value_key(value) for value in values]
+        if None not in keys:
+            return 'date', min(keys), max(keys)
+    return 'text', None, None
+
+
+def join_column_types(col_type, other_col_type):
+    if col_type is None or col_type == other_col_type:
+        return other_col_type
+    if other_col_type is None:
+        return col_type
+    if set((col_type, other_col_type)) == set(('integer', 'float')):
+        return 'float'
+    return 'text'
+
+
+# the values' 64-bit hashes, i.e. the first 8 bytes of their BLAKE2b
+# digests, as little-endian unsigned integers, all in one bytes object;
+# the values are encoded all at once, and split apart again, if they're
+# joined, and each one is hashed by a copy of the same empty hasher,
+# which is cheaper than setting up a hasher from scratch
+
+HLL_HASHER = hashlib.blake2b(digest_size=8)
+
+def hll_value_hashes(values, joined_values):
+    
+    if joined_values is not None:
+        encoded_values = joined_values.encode('utf-8', 'surrogatepass').split(COLUMN_VALUE_SEPARATOR.encode('ascii'))
+    else:
+        encoded_values = [value.encode('utf-8', 'surrogatepass') for value in values]
+    
+    value_hashes = []
+    
+    for encoded_value in encoded_values:
+        hasher = HLL_HASHER.copy()
+        hasher.update(encoded_value)
+        value_hashes.append(hasher.digest())
+    
+    return b''.join(value_hashes)
+
+
+# update the HyperLogLog registers with the hashes, each one picking
+# a register by its top bits and keeping there the highest position
+# of the first one bit of the bits below, in a NumPy array if NumPy
+# is installed, rather than hash by hash
+
+def update_hll_registers(registers, value_hashes):
+    
+    np = load_numpy()
+    
+    if np:
+        hashes = np.frombuffer(value_hashes, dtype='<u8')
+        # the float exponent of the rank bits is their bit length, exactly,
+        # as there are fewer of them than a double's 53 mantissa bits
+        ranks = HLL_RANK_BITS + 1 - np.frexp((hashes & np.uint64(HLL_RANK_MASK)).astype(np.float64))[1]
+        np.maximum.at(np.frombuffer(registers, dtype=np.uint8),
+                      (hashes >> np.uint64(HLL_RANK_BITS)).astype(np.intp),
+                      ranks.astype(np.uint8))
+        return
+    
+    hashes = array.array('Q', value_hashes)
+    if sys.byteorder == 'big':
+        hashes.byteswap()
+    
+    for value_hash in hashes:
+        register = value_hash >> HLL_RANK_BITS
+        rank = HLL_RANK_BITS - (value_hash & HLL_RANK_MASK).bit_length() + 1
+        if rank > registers[register]:
+            registers[register] = rank
+
+
+class ColumnSketch(object):
+    
+    def __init__(self, nulls=0):
+        self.nulls = nulls
+        self.col_type = None
+        self.min = None
+        self.max = None
+        self.text_min = None
+        self.text_max = None
+        self.max_length = 0
+        self.registers = bytearray(1 << HLL_PRECISION)
+    
+    def add_values(self, values):
+        self.nulls += values.count('')
+        distinct_values = set(values)
+        distinct_values.discard('')
+        if not distinct_values:
+            return
+        self.max_length = max(self.max_length, max(map(len, distinct_values)))
+        self.update_text_bounds(min(distinct_values), max(distinct_values))
+        joined_values = COLUMN_VALUE_SEPARATOR.join(distinct_values)
+        if joined_values.count(COLUMN_VALUE_SEPARATOR) != len(distinct_values) - 1:
+            joined_values = None
+        if self.col_type != 'text':
+            self.update_typed_bounds(*typed_value_bounds(distinct_values, joined_values, self.col_type))
+        update_hll_registers(self.registers, hll_value_hashes(distinct_values, joined_values))
+    
+    def update_text_bounds(self, text_min, text_max):
+        if self.text_min is None or text_min < self.text_min:
+            self.text_min = text_min
+        if self.text_max is None or text_max > self.text_max:
+            self.text_max = text_max
+    
+    def update_typed_bounds(self, col_type, typed_min, typed_max):
+        joined_col_type = join_column_types(self.col_type, col_type)
+        if joined_col_type == 'text':
+            self.min = None
+            self.max = None
+        elif self.col_type is None:
+            self.min = typed_min
+            self.max = typed_max
+        else:
+            self.min = min(self.min, typed_min)
+            self.max = max(self.max, typed_max)
+        self.col_type = joined_col_type
+    
+    def merge(self, other):
+        self.nulls += other.nulls
+        if other.col_type is None:
+            return
+        self.max_length = max(self.max_length, other.max_length)
+        self.update_text_bounds(other.text_min, other.text_max)
+        self.update_typed_bounds(other.col_type, other.min, other.max)
+        self.registers = bytearray(map(max, self.registers, other.registers))
+    
+    def distinct_estimate(self):
+        registers = self.registers
+        m = len(registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -rank for rank in registers)
+        # linear counting of the empty registers, for small cardinalities
+        zeros = registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+    
+    def as_dict(self, name):
+        if self.col_type == 'date':
+            col_min = '%04d-%02d-%02d' % self.min
+            col_max = '%04d-%02d-%02d' % self.max
+        elif self.col_type == 'text':
+            col_min = self.text_min
+            col_max = self.text_max
+        else:
+            col_min = self.min
+            col_max = self.max
+        return collections.OrderedDict((('name', name),
+                                        ('type', self.col_type),
+                                        ('nulls', self.nulls),
+                                        ('distinct', self.distinct_estimate() if self.col_type is not None else 0),
+                                        ('min', col_min),
+                                        ('max', col_max),
+                                        ('max_length', self.max_length),
+                                        ('sketch', collections.OrderedDict((('text_min', self.text_min),
+                                                                            ('text_max', self.text_max),
+                                                                            ('registers', base64.b64encode(zlib.compress(bytes(self.registers))).decode('ascii')))))))
+    
+    @classmethod
+    def from_dict(cls, col_dict):
+        column_sketch = cls(col_dict['nulls'])
+        column_sketch.col_type = col_dict['type']
+        column_sketch.max_length = col_dict['max_length']
+        column_sketch.text_min = col_dict['sketch']['text_min']
+        column_sketch.text_max = col_dict['sketch']['text_max']
+        if column_sketch.col_type == 'date':
+            column_sketch.min = tuple(int(part) for part in col_dict['min'].split('-'))
+            column_sketch.max = tuple(int(part) for part in col_dict['max'].split('-'))
+        elif column_sketch.col_type in ('integer', 'float'):
+            column_sketch.min = col_dict['min']
+            column_sketch.max = col_dict['max']
+        column_sketch.registers = bytearray(zlib.decompress(base64.b64decode(col_dict['sketch']['registers'])))
+        return column_sketch
+
+
+class ColumnStats(object):
+    
+    def __init__(self, tgt_file_name, header):
+        self.tgt_file_name = tgt_file_name
+        # whether the next row added is a header row
+        self.header = header
+        self.col_names = None
+        self.rows = 0
+        self.columns = []
+        self.batch = []
+        # the target file's size as of the last write
+        self.tgt_bytes = None
+    
+    def add(self, row):
+        if self.header:
+            self.header = False
+            if self.col_names is None:
+                self.col_names = list(row)
+            return
+        self.batch.append(row)
+        if len(self.batch) >= COLUMN_STATS_BATCH_ROWS:
+            self.add_batch()
+    
+    def add_columns(self, width):
+        # the rows before a column first showed up had nulls in it
+        while len(self.columns) < width:
+            self.columns.append(ColumnSketch(self.rows))
+    
+    def add_batch(self):
+        batch = self.batch
+        self.batch = []
+        if not batch:
+            return
+        width = max(map(len, batch))
+        self.add_columns(width)
+        # ragged rows' missing values count as nulls
+        for column, values in zip(self.columns, itertools.zip_longest(*batch, fillvalue='')):
+            column.add_values(values)
+        for column in self.columns[width:]:
+            column.nulls += len(batch)
+        self.rows += len(batch)
+    
+    def merge(self, other):
+        self.add_batch()
+        other.add_batch()
+        if self.col_names is None:
+            self.col_names = other.col_names
+        self.add_columns(len(other.columns))
+        for column in self.columns[len(other.columns):]:
+            column.nulls += other.rows
+        for column, other_column in zip(self.columns, other.columns):
+            column.merge(other_column)
+        self.rows += other.rows
+    
+    def col_name(self, col_index):
+        if self.col_names is not None and col_index < len(self.col_names):
+            return self.col_names[col_index]
+        return 'column_%d' % (col_index + 1)
+    
+    def write(self):
+        self.add_batch()
+        self.tgt_bytes = os.path.getsize(self.tgt_file_name) if os.path.exists(self.tgt_file_name) else 0
+        stats_file_name = column_stats_file_name(self.tgt_file_name)
+        tmp_file_name = '%s.%d.tmp' % (stats_file_name, os.getpid())
+        with io.open(tmp_file_name, 'w', encoding='utf-8') as stats_file:
+            json.dump(collections.OrderedDict((('version', COLUMN_STATS_VERSION),
+                                               ('target', os.path.basename(self.tgt_file_name)),
+                                               ('tgt_bytes', self.tgt_bytes),
+                                               ('rows', self.rows),
+                                               ('columns', [column.as_dict(self.col_name(col_index)) for col_index, column in enumerate(self.columns)]))),
+                      stats_file,
+                      indent=1,
+                      allow_nan=False)
+        os.replace(tmp_file_name, stats_file_name)
+
+
+def read_column_stats(stats_file_name, tgt_file_name=None):
+    
+    with io.open(stats_file_name, 'r', encoding='utf-8') as stats_file:
+        stats = json.load(stats_file)
+    
+    if stats.get('version') != COLUMN_STATS_VERSION:
+        return None
+    
+    column_stats = ColumnStats(tgt_file_name, False)
+    column_stats.tgt_bytes = stats['tgt_bytes']
+    column_stats.rows = stats['rows']
+    column_stats.columns = [ColumnSketch.from_dict(col_dict) for col_dict in stats['columns']]
+    column_stats.col_names = [col_dict['name'] for col_dict in stats['columns']]
+    
+    return column_stats
+
+
+# the column statistics of a target file being written ('w') or
+# appended to ('a'), or None if the ones of the rows already in it
+# can't be had, i.e. their sidecar file is missing or out of date
+
+def open_column_stats(tgt_file_name,
+                      tgt_file_mode,
+                      header):
+    
+    if tgt_file_mode.startswith('w') or not os.path.exists(tgt_file_name):
+        column_stats = ColumnStats(tgt_file_name, header)
+        column_stats_sets[tgt_file_name] = column_stats
+        return column_stats
+    
+    tgt_file_size = os.path.getsize(tgt_file_name)
+    
+    # the column statistics kept in memory since the last
+    # member, or else those of the sidecar file
+    column_stats = column_stats_sets.pop(tgt_file_name, None)
+    
+    if column_stats is None or column_stats.tgt_bytes != tgt_file_size:
+        stats_file_name = column_stats_file_name(tgt_file_name)
+        column_stats = None
+        if os.path.exists(stats_file_name):
+            column_stats = read_column_stats(stats_file_name, tgt_file_name)
+        if column_stats is None or column_stats.tgt_bytes != tgt_file_size:
+            print('%s: column statistics sidecar file missing or out of date, so no column statistics are gathered' % tgt_file_name)
+            return None
+    
+    # a header row written after the rows already
+    # in the target file is one of its data rows
+    column_stats.header = header and tgt_file_size == 0
+    column_stats_sets[tgt_file_name] = column_stats
+    
+    return column_stats
+
+
+# NumPy, the first time round, if it's installed, False otherwise
+
+def load_numpy():
+    
+    global numpy
+    
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+    
+    return numpy
+
+
+# transform a batch of rows in place, all of its cells at once, i.e.
+# searching them all with a single search, and transforming only the
+# matching ones, as a whole, in a NumPy array if NumPy is installed,
+# rather than searching each of the rows, and then each of the cells
+# of the rows with matches in them, one by one
+
+def xform_row_batch(char_xformer, batch):
+    
+    # the batch's cells, row after row, and the end
+    # of each row, by the index of its last cell + 1
+    cells = list(itertools.chain.from_iterable(batch))
+    row_ends = None
+    
+    for i, cell in char_xformer.xform_cells(cells):
+        if row_ends is None:
+            row_ends = list(itertools.accumulate(map(len, batch)))
+        row_index = bisect.bisect_right(row_ends, i)
+        row = batch[row_index]
+        row[i - row_ends[row_index] + len(row)] = cell
+
+
+# generator of the converted rows of a CSV reader, i.e. each row with its
+# characters transformed and its toxicities lookup results appended, or
+# None in place of a bypassed header row, of a row that doesn't meet
+# the row conditions, or of a duplicate row, if the row fingerprints of
+# the target file are given, so that the rows can be counted; the rows are
+# filtered and their columns projected right after they're parsed, so
+# that dropped rows and columns are neither transformed nor looked up;
+# given a number of batch rows, the data rows are converted that many
+# at a time, transformed all at once, and looked up once per distinct
+# lookup key, with the same results; the lookup results (or the default
+# values, if not found) are appended all at once, and the lookups are
+# counted in the toxicities lookup statistics, if given
+
+def convert_rows(csv_reader,
+                 char_xformer,
+                 tox_dict,
+                 tox_default_values,
+                 src_tox_lookup_col_name,
+                 tox_lookup_result_col_names,
+                 bypass_header_row,
+                 src_header_row=None,
+                 columns=None,
+                 row_conditions=None,
+                 dedupe_on=None,
+                 row_fingerprints=None,
+                 batch_rows=0,
+                 normalize_tox_key=None,
+                 tox_lookup_stats=None):
+    
+    rows = 0
+    row_filter = None
+    project = None
+    dedupe_key = None
+    
+    if tox_lookup_stats is None:
+        tox_lookup_stats = ToxLookupStats()
+    
+    # the lookup results of a key, and whether it only
+    # matched once it was normalized, i.e. changed
+    def look_up(tox_key):
+        if normalize_tox_key is not None:
+            normalized_tox_key = normalize_tox_key(tox_key)
+            try:
+                return tox_dict[normalized_tox_key], normalized_tox_key != tox_key
+            except KeyError:
+                return tox_default_values, False
+        try:
+            return tox_dict[tox_key], False
+        except KeyError:
+            return tox_default_values, False
+    
+    def bind_header_row(header_row):
+        # find index of src_tox_lookup_col_name, either
+        # amongst the projected columns or, if it's
+        # not amongst them, amongst the source columns
+        src_tox_lookup_col_index = header_row.index(src_tox_lookup_col_name)
+        tox_key_col_index = src_tox_lookup_col_index
+        if columns:
+            if src_tox_lookup_col_name in columns:
+                tox_key_col_index = columns.index(src_tox_lookup_col_name)
+            else:
+                tox_key_col_index = None
+        # the de-duplication key is made of target columns,
+        # i.e. the projected ones and the lookup results
+        if row_fingerprints is not None:
+            tgt_header_row = list(columns or header_row)
+            if tox_dict:
+                tgt_header_row.extend(tox_lookup_result_col_names)
+            dedupe_key = bind_dedupe_key(dedupe_on, tgt_header_row)
+        else:
+            dedupe_key = None
+        return (src_tox_lookup_col_index,
+                tox_key_col_index,
+                bind_row_filter(row_conditions, header_row) if row_conditions else None,
+                bind_projection(columns, header_row) if columns else None,
+                dedupe_key)
+    
+    # if the header row was already read, e.g. for
+    # a byte-range chunk that isn't the first one,
+    # set up as if it had just been read from the source
+    if src_header_row is not None:
+        rows = 1
+        src_tox_lookup_col_index, tox_key_col_index, row_filter, project, dedupe_key = bind_header_row(src_header_row)
+    
+    # row-by-row, or, when converting batches of rows,
+    # only the header row, if it wasn't already read
+    if batch_rows > 0:
+        csv_reader = iter(csv_reader)
+        csv_rows = itertools.islice(csv_reader, 1 - rows)
+    else:
+        csv_rows = csv_reader
+    for row in csv_rows:
+        rows += 1
+        if rows == 1:
+            src_tox_lookup_col_index, tox_key_col_index, row_filter, project, dedupe_key = bind_header_row(row)
+        # assuming each file has a header row
+        if not bypass_header_row or rows > 1:
+            # drop the data rows that don't meet the row conditions
+            if row_filter is not None and rows > 1 and not row_filter(row):
+                yield None
+                continue
+            # keep only the specified columns, holding on
+            # to the toxicities lookup key if it's not one
+            if project is not None:
+                if tox_key_col_index is None and rows > 1 and len(row) > src_tox_lookup_col_index:
+                    tox_key = row[src_tox_lookup_col_index]
+                else:
+                    tox_key = ''
+                row = project(row)
+            # if character transformations
+            # were specified in the tuples list
+            if char_xformer:
+                # transform the matching characters
+                # of each of the row's columns into
+                # the specified target characters
+                char_xformer.xform_row(row)
+            # if toxicities lookup
+            # file was specified
+            if tox_dict:
+                # if this is
+                # a data row
+                if rows > 1:
+                    if tox_key_col_index is not None:
+                        tox_key = row[tox_key_col_index]
+                    # the lookup key isn't amongst the projected
+                    # columns, so it wasn't transformed along with them
+                    elif char_xformer:
+                        tox_key = char_xformer.xform_cell(tox_key)
+                    tox_values, normalized_hit = look_up(tox_key)
+                    # print("%s: %s" % (src_tox_lookup_col_name, tox_key))
+                    # pprint(tox_values)
+                    row.extend(tox_values)
+                    if tox_values is tox_default_values:
+                        tox_lookup_stats.misses += 1
+                    else:
+                        tox_lookup_stats.hits += 1
+                        if normalized_hit:
+                            tox_lookup_stats.normalized_hits += 1
+                # otherwise, it's a header
+                else:
+                    for col_name in tox_lookup_result_col_names:
+                        row.append(col_name)
+            # drop the data rows already written to the target file
+            if dedupe_key is not None and rows > 1 and not row_fingerprints.add(row_fingerprint(dedupe_key(row))):
+                yield None
+                continue
+            yield row
+        else:
+            yield None
+    
+    if batch_rows <= 0:
+        return
+    
+    # batch-by-batch
+    while True:
+        batch = list(itertools.islice(csv_reader, batch_rows))
+        if not batch:
+            break
+        # the converted rows, None in place of the dropped
+        # ones, and the rows to transform and look up
+        converted_rows = []
+        data_rows = []
+        tox_keys = []
+        for row in batch:
+            if row_filter is not None and not row_filter(row):
+                converted_rows.append(None)
+                continue
+            if project is not None:
+                if tox_key_col_index is None and len(row) > src_tox_lookup_col_index:
+                    tox_keys.append(row[src_tox_lookup_col_index])
+                else:
+                    tox_keys.append('')
+                row = project(row)
+            converted_rows.append(row)
+            data_rows.append(row)
+        if char_xformer:
+            xform_row_batch(char_xformer, data_rows)
+        if tox_dict and data_rows:
+            if tox_key_col_index is not None:
+                tox_keys = [row[tox_key_col_index] for row in data_rows]
+            elif char_xformer:
+                tox_keys = char_xformer.xform_column(tox_keys)
+            # each distinct key looked up once per batch
+            batch_lookups = {}
+            misses = 0
+            normalized_hits = 0
+            for row, tox_key in zip(data_rows, tox_keys):
+                try:
+                    tox_values, normalized_hit = batch_lookups[tox_key]
+                except KeyError:
+                    tox_values, normalized_hit = batch_lookups[tox_key] = look_up(tox_key)
+                row.extend(tox_values)
+                if tox_values is tox_default_values:
+                    misses += 1
+                elif normalized_hit:
+                    normalized_hits += 1
+            tox_lookup_stats.hits += len(data_rows) - misses
+            tox_lookup_stats.misses += misses
+            tox_lookup_stats.normalized_hits += normalized_hits
+        if dedupe_key is None:
+            yield from converted_rows
+            continue
+        for row in converted_rows:
+            # drop the data rows already written to the target file
+            if row is not None and not row_fingerprints.add(row_fingerprint(dedupe_key(row))):
+                yield None
+            else:
+                yield row
+
+
+# source to target CSV file converter routine, by default:
 
 def src2tgt_file(src_file_name,
                  tgt_file_name,
@@ -472,7 +5461,44 @@ def src2tgt_file(src_file_name,
                  rows_flush_interval=None,
                  progress_msg_template=None,
                  max_rows_per_file=None,
-                 char_xform_tuples_list=None):
+                 char_xform_tuples_list=None,
+                 src_file=None,
+                 src_raw_range=None,
+                 src_header_row=None,
+                 chunk_workers=None,
+                 chunk_size=None,
+                 pipeline=None,
+                 pipeline_queue_size=None,
+                 pipeline_batch_rows=None,
+                 progress_interval=None,
+                 flush_bytes=None,
+                 flush_secs=None,
+                 write_batch_rows=None,
+                 write_buffer_size=None,
+                 tgt_format=None,
+                 tgt_sqlite_table_name=None,
+                 collect_metrics=None,
+                 columns=None,
+                 where=None,
+                 partition_by=None,
+                 partition_max_open=None,
+                 partition_buffer_rows=None,
+                 shard_rows=None,
+                 shard_bytes=None,
+                 shard_key_col_name=None,
+                 tgt_compression=None,
+                 tgt_compression_level=None,
+                 compression_workers=None,
+                 compression_block_size=None,
+                 dedupe_on=None,
+                 src_encoding=None,
+                 tgt_encoding=None,
+                 byte_char_xforms=None,
+                 batch_rows=None,
+                 tox_key_normalization=None,
+                 tgt_offset_index_rows=None,
+                 tgt_offset_index_col_name=None,
+                 tgt_stats=None):
     
     if src_col_delimiter is None:
         src_col_delimiter = args.src_col_delimiter
@@ -506,94 +5532,397 @@ def src2tgt_file(src_file_name,
         max_rows_per_file = args.max_rows_per_file
     if char_xform_tuples_list is None:
         char_xform_tuples_list = []
-        
-    tox_empty_dict = {}
+    
+    if collect_metrics is None:
+        collect_metrics = args.metrics_file is not None
+    if columns is None:
+        columns = args.columns
+    if where is None:
+        where = args.where
+    if partition_by is None:
+        partition_by = args.partition_by
+    if partition_max_open is None:
+        partition_max_open = args.partition_max_open
+    if partition_buffer_rows is None:
+        partition_buffer_rows = args.partition_buffer_rows
+    if shard_rows is None:
+        shard_rows = args.shard_rows
+    if shard_bytes is None:
+        shard_bytes = args.shard_bytes
+    if shard_key_col_name is None:
+        shard_key_col_name = args.shard_key_col_name
+    if tgt_compression is None:
+        tgt_compression = args.tgt_compression
+    if tgt_compression_level is None:
+        tgt_compression_level = args.tgt_compression_level
+    if compression_workers is None:
+        compression_workers = args.compression_workers
+    if compression_block_size is None:
+        compression_block_size = args.compression_block_size
+    if dedupe_on is None:
+        dedupe_on = args.dedupe_on
+    if src_encoding is None:
+        src_encoding = args.src_encoding
+    if src_encoding is None:
+        src_encoding = locale.getpreferredencoding(False)
+    if tgt_encoding is None:
+        tgt_encoding = args.tgt_encoding
+    if tgt_encoding is None:
+        tgt_encoding = locale.getpreferredencoding(False)
+    if byte_char_xforms is None:
+        byte_char_xforms = args.byte_char_xforms
+    if batch_rows is None:
+        batch_rows = args.batch_rows
+    if tox_key_normalization is None:
+        tox_key_normalization = args.tox_key_normalization
+    if tgt_offset_index_rows is None:
+        tgt_offset_index_rows = args.tgt_offset_index_rows
+    if tgt_offset_index_col_name is None:
+        tgt_offset_index_col_name = args.tgt_offset_index_col_name
+    if tgt_stats is None:
+        tgt_stats = args.tgt_stats
+    if chunk_workers is None:
+        chunk_workers = args.chunk_workers
+    if chunk_workers < 1:
+        chunk_workers = os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = args.chunk_size
+    if pipeline is None:
+        pipeline = args.pipeline
+    if pipeline_queue_size is None:
+        pipeline_queue_size = args.pipeline_queue_size
+    if pipeline_batch_rows is None:
+        pipeline_batch_rows = args.pipeline_batch_rows
+    if progress_interval is None:
+        progress_interval = args.progress_interval
+    if flush_bytes is None:
+        flush_bytes = args.flush_bytes
+    if flush_secs is None:
+        flush_secs = args.flush_secs
+    if write_batch_rows is None:
+        write_batch_rows = args.write_batch_rows
+    if write_buffer_size is None:
+        write_buffer_size = args.write_buffer_size
+    if tgt_format is None:
+        tgt_format = args.tgt_format
+    if tgt_sqlite_table_name is None:
+        tgt_sqlite_table_name = args.tgt_sqlite_table_name
+    
+    # if the source file is large enough, and its bytes can be
+    # read by byte range, convert it in byte-range chunks in parallel
+    # (truncating at max rows per file needs the rows to be counted
+    # in order, and neither SQLite, partition, shard, de-duplicated nor offset
+    # indexed files can be stitched together from chunks, so those are only
+    # supported serially)
+    sharding = shard_rows > 0 or shard_bytes > 0
+    
+    # the offset index of the target CSV file's records, if need be
+    if ((tgt_offset_index_rows > 0 or tgt_offset_index_col_name is not None) and
+            tgt_format == 'csv' and partition_by is None and not sharding and tgt_compression == 'none'):
+        offset_index = open_offset_index(tgt_file_name,
+                                         tgt_file_mode,
+                                         bypass_header_row,
+                                         tgt_offset_index_rows,
+                                         tgt_offset_index_col_name,
+                                         tgt_col_delimiter,
+                                         tgt_col_quotechar,
+                                         tgt_encoding or locale.getpreferredencoding(False))
+    else:
+        offset_index = None
+    if chunk_workers > 1 and src_header_row is None and max_rows_per_file == 0 and tgt_format == 'csv' and partition_by is None and not sharding and dedupe_on is None and offset_index is None:
+        if src_file is None:
+            src_raw_range = (src_file_name, 0, os.path.getsize(src_file_name))
+            chunk_encoding = src_encoding
+        else:
+            chunk_encoding = src_file.encoding
+        # the encoding needs to be ASCII-compatible for line-feeds
+        # and quote characters to be found amongst the raw bytes
+        try:
+            quotechar_byte = src_col_quotechar.encode(chunk_encoding)
+            ascii_compatible = '\n'.encode(chunk_encoding) == b'\n' and len(quotechar_byte) == 1
+        except (UnicodeError, LookupError):
+            ascii_compatible = False
+        if src_raw_range is not None and src_raw_range[2] >= 2 * chunk_size and ascii_compatible:
+            return src2tgt_file_chunked(src_file_name,
+                                        tgt_file_name,
+                                        tgt_file_mode,
+                                        bypass_header_row,
+                                        src_raw_range,
+                                        chunk_encoding,
+                                        quotechar_byte,
+                                        chunk_workers,
+                                        chunk_size,
+                                        src_col_delimiter=src_col_delimiter,
+                                        tgt_col_delimiter=tgt_col_delimiter,
+                                        src_col_quotechar=src_col_quotechar,
+                                        tgt_col_quotechar=tgt_col_quotechar,
+                                        src_tox_lookup_col_name=src_tox_lookup_col_name,
+                                        tox_dict=tox_dict,
+                                        tox_lookup_key_col_name=tox_lookup_key_col_name,
+                                        tox_lookup_result_col_names=tox_lookup_result_col_names,
+                                        tox_col_delimiter=tox_col_delimiter,
+                                        tox_col_quotechar=tox_col_quotechar,
+                                        tox_default_value=tox_default_value,
+                                        rows_flush_interval=rows_flush_interval,
+                                        progress_msg_template=progress_msg_template,
+                                        max_rows_per_file=max_rows_per_file,
+                                        char_xform_tuples_list=char_xform_tuples_list,
+                                        pipeline=pipeline,
+                                        pipeline_queue_size=pipeline_queue_size,
+                                        pipeline_batch_rows=pipeline_batch_rows,
+                                        progress_interval=progress_interval,
+                                        flush_bytes=flush_bytes,
+                                        flush_secs=flush_secs,
+                                        write_batch_rows=write_batch_rows,
+                                        write_buffer_size=write_buffer_size,
+                                        collect_metrics=collect_metrics,
+                                        columns=columns,
+                                        where=where,
+                                        partition_by=partition_by,
+                                        partition_max_open=partition_max_open,
+                                        partition_buffer_rows=partition_buffer_rows,
+                                        shard_rows=shard_rows,
+                                        shard_bytes=shard_bytes,
+                                        shard_key_col_name=shard_key_col_name,
+                                        tgt_compression=tgt_compression,
+                                        tgt_compression_level=tgt_compression_level,
+                                        compression_workers=compression_workers,
+                                        compression_block_size=compression_block_size,
+                                        dedupe_on=dedupe_on,
+                                        src_encoding=src_encoding,
+                                        tgt_encoding=tgt_encoding,
+                                        byte_char_xforms=byte_char_xforms,
+                                        batch_rows=batch_rows,
+                                        tox_key_normalization=tox_key_normalization,
+                                        tgt_offset_index_rows=tgt_offset_index_rows,
+                                        tgt_offset_index_col_name=tgt_offset_index_col_name,
+                                        tgt_stats=tgt_stats)
+    
+    # the column statistics of the target file's rows, if need be,
+    # the first row written being the header row unless it's bypassed
+    if tgt_stats and partition_by is None and not sharding:
+        column_stats = open_column_stats(tgt_file_name,
+                                         tgt_file_mode,
+                                         not bypass_header_row and src_header_row is None)
+    else:
+        column_stats = None
+    
+    # compile the character transformations (once per run)
+    char_xformer = compile_char_xforms(char_xform_tuples_list)
+    
+    # parse the row conditions, if any
+    row_conditions = parse_where(where) if where else None
+    
+    # the fingerprints of the rows already written to the target file,
+    # and how many duplicates were dropped before this source file
+    if dedupe_on is not None:
+        row_fingerprints = tgt_row_fingerprints(tgt_file_name, tgt_file_mode)
+        duplicates = row_fingerprints.duplicates
+    else:
+        row_fingerprints = None
+    
+    # the toxicities lookup results as tuples, and the default
+    # values tuple for later usage when no lookup match is found,
+    # whether or not the header row is bypassed, shared by all rows
+    tox_dict = tox_tuples_dict(tox_dict, tox_lookup_result_col_names)
+    tox_default_values = (tox_default_value,) * len(tox_lookup_result_col_names)
+    
+    # the normalization of the source files' lookup keys,
+    # and the statistics of their lookups
+    normalize_tox_key = bind_tox_key_normalizer(tox_key_normalization)
+    tox_lookup_stats = ToxLookupStats()
     
     print('')
     print('=============================')
     print('SRC file: %s' % src_file_name)
     print('-----------------------------')
                     
+    # open the source file for reading, unless
+    # an already opened source stream was provided,
+    # e.g. a member streamed from a zip archive
+    if src_file is None:
+        src_file = io.open(src_file_name, 'r', newline='', encoding=src_encoding)
+    
+    # apply the single-byte character transformations to the raw
+    # source bytes, if need be (the row conditions are tested before
+    # the rows are transformed, so they're left to the rows then)
+    if byte_char_xforms and not where:
+        byte_xformer = compile_byte_xforms(char_xform_tuples_list,
+                                           src_file.encoding,
+                                           src_col_delimiter,
+                                           src_col_quotechar)
+        if byte_xformer is not None:
+            src_file = open_byte_xformed_src_file(src_file, byte_xformer)
+    
+    # when collecting metrics, wrap each stage
+    # of the conversion in its metered stand-in
+    if collect_metrics:
+        member_metrics = MemberMetrics(src_file_name, tgt_file_name)
+        member_start_time = time.perf_counter()
+        if tgt_file_mode.startswith('a') and os.path.exists(tgt_file_name):
+            tgt_file_size = os.path.getsize(tgt_file_name)
+        else:
+            tgt_file_size = 0
+        src_file = open_metered_src_file(src_file, member_metrics)
+        if char_xformer:
+            char_xformer = MeteredCharXformer(char_xformer, member_metrics)
+        if tox_dict:
+            tox_dict = MeteredToxDict(tox_dict, member_metrics)
+    
     # open the target file for either write or append,
-    # depending upon the incoming file_mode value ('w' or 'a')
-    with io.open(tgt_file_name, tgt_file_mode, newline='') as tgt_file:
+    # depending upon the incoming file_mode value ('w' or 'a'),
+    # either as a CSV file, as partition or shard
+    # CSV files or as an SQLite database file
+    if sharding:
+        tgt_file = ShardedRowWriter(tgt_file_name,
+                                    tgt_file_mode,
+                                    shard_rows,
+                                    shard_bytes,
+                                    shard_key_col_name,
+                                    write_buffer_size,
+                                    tgt_col_delimiter,
+                                    tgt_col_quotechar,
+                                    tgt_encoding)
+    elif partition_by is not None:
+        tgt_file = PartitionedRowWriter(tgt_file_name,
+                                        tgt_file_mode,
+                                        partition_by,
+                                        partition_max_open,
+                                        partition_buffer_rows,
+                                        tgt_col_delimiter,
+                                        tgt_col_quotechar,
+                                        tgt_encoding)
+    elif tgt_format == 'sqlite':
+        tgt_file = SqliteRowWriter(tgt_file_name,
+                                   tgt_file_mode,
+                                   sqlite_table_name(tgt_file_name, tgt_sqlite_table_name),
+                                   bypass_header_row,
+                                   write_batch_rows,
+                                   flush_secs)
+    else:
+        tgt_file = open_tgt_file(tgt_file_name,
+                                 tgt_file_mode,
+                                 write_buffer_size,
+                                 tgt_compression,
+                                 tgt_compression_level,
+                                 compression_workers,
+                                 compression_block_size,
+                                 tgt_encoding)
+    
+    with tgt_file:
         
-        # instantiate a CSV writer
-        csv_writer = csv.writer(tgt_file,
-                                delimiter=tgt_col_delimiter,
-                                quotechar=tgt_col_quotechar,
-                                quoting=csv.QUOTE_MINIMAL)
+        # instantiate a CSV writer, writing
+        # the rows to the target file in batches
+        if sharding or partition_by is not None or tgt_format == 'sqlite':
+            csv_writer = tgt_file
+        else:
+            if offset_index is not None:
+                row_writer = OffsetIndexingCsvWriter(tgt_file,
+                                                     offset_index,
+                                                     delimiter=tgt_col_delimiter,
+                                                     quotechar=tgt_col_quotechar,
+                                                     quoting=csv.QUOTE_MINIMAL)
+            else:
+                row_writer = csv.writer(tgt_file,
+                                        delimiter=tgt_col_delimiter,
+                                        quotechar=tgt_col_quotechar,
+                                        quoting=csv.QUOTE_MINIMAL)
+            csv_writer = BatchedRowWriter(row_writer,
+                                          tgt_file,
+                                          write_batch_rows,
+                                          flush_bytes,
+                                          flush_secs)
         
-        # open the source file for reading
-        with io.open(src_file_name, 'r', newline='') as src_file:
-            
-            # instantiate a CSV reader
-            csv_reader = csv.reader(src_file,
-                                    delimiter=src_col_delimiter,
-                                    quotechar=src_col_quotechar,
-                                    quoting=csv.QUOTE_MINIMAL)
+        # in pipeline mode, the source file is read (and decompressed)
+        # and the target file is written by threads of their own
+        pipeline_writer = None
+        if pipeline:
+            pipeline_reader, src_file = open_pipeline_src_file(src_file,
+                                                               pipeline_queue_size)
+            pipeline_writer = PipelineWriter(csv_writer,
+                                             pipeline_queue_size,
+                                             pipeline_batch_rows)
+            csv_writer = pipeline_writer
         
-            rows = 0
-            start_time = time.time()
+        if collect_metrics:
+            csv_writer = MeteredRowWriter(csv_writer, member_metrics)
+        
+        # if the conversion fails, the pipeline's writer thread
+        # is stopped, rather than left blocked on its queue
+        try:
+            with src_file:
+                
+                # instantiate a CSV reader
+                csv_reader = csv.reader(src_file,
+                                        delimiter=src_col_delimiter,
+                                        quotechar=src_col_quotechar,
+                                        quoting=csv.QUOTE_MINIMAL)
+                if collect_metrics:
+                    csv_reader = MeteredCsvReader(csv_reader, member_metrics)
             
-            # row-by-row
-            for row in csv_reader:
-                rows += 1
-                if rows == 1:
-                    # find index of src_tox_lookup_col_name
-                    src_tox_lookup_col_index = row.index(src_tox_lookup_col_name)
-                # assuming each file has a header row
-                if not bypass_header_row or rows > 1:
-                    # if character transformations
-                    # were specified in the tuples list
-                    if len(char_xform_tuples_list) > 0:
-                        # for each row column
-                        for i in range(len(row)):
-                            # character transform by character transform
-                            for char_xform_tuple in char_xform_tuples_list:
-                                # while any matching characters are found
-                                while char_xform_tuple[0] in row[i]:
-                                    # transform the matching characters into the specified target characters
-                                    row[i] = row[i].replace(char_xform_tuple[0], char_xform_tuple[1]).strip()
-                    # if toxicities lookup
-                    # file was specified
-                    if tox_dict:
-                        # if this is
-                        # a data row
-                        if rows > 1:
-                            try:
-                                tox_values_dict = tox_dict[row[src_tox_lookup_col_index]]
-                            except KeyError:
-                                tox_values_dict = tox_empty_dict
-                            # print("%s: %s" % (src_tox_lookup_col_name, row[src_tox_lookup_col_index]))
-                            # pprint(tox_values_dict)
-                            for value in tox_values_dict.values():
-                                row.append(value)
-                        # otherwise, it's a header
-                        else:
-                            # build empty toxicities results dictionary
-                            # for later usage when no lookup match is found
-                            tox_empty_dict = {}
-                            for col_name in tox_lookup_result_col_names:
-                                row.append(col_name)
-                                tox_empty_dict[col_name] = tox_default_value
-                    # output row to CSV writer
-                    csv_writer.writerow(row)
-                # flush output based on the interval
-                if rows % rows_flush_interval == 0:
-                    tgt_file.flush()
-                    # output a progress message
-                    elapsed_time = time.time() - start_time
-                    print(progress_msg_template.format(src_file_name,
-                                                       rows,
-                                                       elapsed_time,
-                                                       rows / elapsed_time if elapsed_time > 0 else rows))
-                    
-                # if max rows per file is not unlimited, i.e. equal to zero
-                # and the number of rows exceeds the max rows per file value
-                if max_rows_per_file > 0 and rows >= max_rows_per_file:
-                    # cease processing this file
-                    break
+                rows = 0
+                start_time = time.time()
+                
+                # if the header row was already read, e.g. for
+                # a byte-range chunk that isn't the first one,
+                # count it as if it had just been read from the source
+                if src_header_row is not None:
+                    rows = 1
+                
+                # row-by-row, each converted row being None if it's
+                # a bypassed header row, or if it was filtered out
+                # (the partition and shard files each need the header
+                # row, so it's never bypassed when partitioning or sharding)
+                for row in convert_rows(csv_reader,
+                                        char_xformer,
+                                        tox_dict,
+                                        tox_default_values,
+                                        src_tox_lookup_col_name,
+                                        tox_lookup_result_col_names,
+                                        bypass_header_row and partition_by is None and not sharding,
+                                        src_header_row,
+                                        columns,
+                                        row_conditions,
+                                        dedupe_on,
+                                        row_fingerprints,
+                                        batch_rows,
+                                        normalize_tox_key,
+                                        tox_lookup_stats):
+                    rows += 1
+                    if row is not None:
+                        # output row to CSV writer
+                        csv_writer.writerow(row)
+                        if column_stats is not None:
+                            column_stats.add(row)
+                    # flush output based on the interval, if any
+                    if rows_flush_interval > 0 and rows % rows_flush_interval == 0:
+                        csv_writer.flush()
+                    # output a progress message based on the interval,
+                    # without flushing, so that frequent progress
+                    # messages don't make for small disk writes
+                    if rows % progress_interval == 0:
+                        # output a progress message
+                        elapsed_time = time.time() - start_time
+                        print(progress_msg_template.format(src_file_name,
+                                                           rows,
+                                                           elapsed_time,
+                                                           rows / elapsed_time if elapsed_time > 0 else rows))
+                        
+                    # if max rows per file is not unlimited, i.e. equal to zero
+                    # and the number of rows exceeds the max rows per file value
+                    if max_rows_per_file > 0 and rows >= max_rows_per_file:
+                        # cease processing this file, saying so,
+                        # rather than silently dropping the rest
+                        print('%s: max rows per file reached, the remaining rows are not converted (--shard_rows rolls over to new shard files instead)' % src_file_name)
+                        break
+                
+                # write the remaining rows, waiting
+                # for the pipeline's writer if need be
+                csv_writer.close()
+        except BaseException:
+            if pipeline_writer is not None:
+                pipeline_writer.abort()
+            raise
         
         # flush output at the end
         # of the CSV input file
@@ -604,6 +5933,31 @@ def src2tgt_file(src_file_name,
                                            rows,
                                            elapsed_time,
                                            rows / elapsed_time if elapsed_time > 0 else rows))
+        if tox_dict:
+            print(tox_lookup_stats.stats_msg(src_file_name))
+        if row_fingerprints is not None:
+            print('%s: %d duplicate rows dropped' % (src_file_name, row_fingerprints.duplicates - duplicates))
+        # output the pipeline stages' statistics,
+        # showing which stage is the bottleneck
+        if pipeline:
+            print(pipeline_reader.queue.stats_msg())
+            print(pipeline_writer.queue.stats_msg())
+    
+    # write the offset index once the target file is complete
+    if offset_index is not None:
+        offset_index.write()
+    
+    # and the column statistics
+    if column_stats is not None:
+        column_stats.write()
+    
+    if collect_metrics:
+        member_metrics.secs = time.perf_counter() - member_start_time
+        if os.path.exists(tgt_file_name):
+            member_metrics.bytes_out = os.path.getsize(tgt_file_name) - tgt_file_size
+        member_metrics_list.append(member_metrics.as_dict())
+    
+    return rows
 
 
 # invoke mainline routine
@@ -611,8 +5965,15 @@ def src2tgt_file(src_file_name,
   
 if __name__ == "__main__":
     
+    args = arg_parser.parse_args()
+    
     print(os.linesep + "PyZip2Src2Tgt.Zip2Src2Tgt.py processing started...")
     
+    # profile the run, if need be
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    
     main(args.zip_path,
          args.src_path,
          args.tgt_path,
@@ -638,7 +5999,59 @@ if __name__ == "__main__":
          args.rows_flush_interval,
          args.progress_msg_template,
          args.max_rows_per_file,
-         char_xform_tuples_list)
+         char_xform_tuples_list,
+         args.src_extract_to_disk,
+         args.workers,
+         args.chunk_workers,
+         args.chunk_size,
+         args.tox_cache_path,
+         args.tox_no_cache,
+         args.incremental,
+         args.pipeline,
+         args.pipeline_queue_size,
+         args.pipeline_batch_rows,
+         args.progress_interval,
+         args.flush_bytes,
+         args.flush_secs,
+         args.write_batch_rows,
+         args.write_buffer_size,
+         args.tgt_format,
+         args.tgt_sqlite_table_name,
+         args.tgt_index_col_names,
+         args.metrics_file,
+         args.columns,
+         args.where,
+         args.partition_by,
+         args.partition_max_open,
+         args.partition_buffer_rows,
+         args.shard_rows,
+         args.shard_bytes,
+         args.shard_key_col_name,
+         args.tgt_compression,
+         args.tgt_compression_level,
+         args.compression_workers,
+         args.compression_block_size,
+         args.dedupe_on,
+         args.src_encoding,
+         args.tgt_encoding,
+         args.byte_char_xforms,
+         args.batch_rows,
+         args.tox_key_normalization,
+         args.plan,
+         args.plan_sample_bytes,
+         args.tgt_offset_index_rows,
+         args.tgt_offset_index_col_name,
+         args.watch,
+         args.watch_interval,
+         args.watch_status_file,
+         args.tgt_stats)
+    
+    if args.profile:
+        profiler.disable()
+        profiler.dump_stats(args.profile_file)
+        print('')
+        print('profile statistics written to: %s' % args.profile_file)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
 
     print(os.linesep + "PyZip2Src2Tgt.Zip2Src2Tgt.py processing finished!")
 
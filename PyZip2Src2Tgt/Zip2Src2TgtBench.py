@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+
+# ========================================================================
+#
+# Copyright © 2017 Khepry Quixote
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ========================================================================
+#
+# This program will benchmark the Zip2Src2Tgt.py conversion against
+# reproducible, synthetic FracFocus-style zip archive(s) and toxicities
+# file, timing each stage of the conversion (decompressing, parsing and
+# converting) as well as the main() routine across its modes, e.g.
+# extracting vs streaming, serial vs parallel, with vs without toxicities,
+# and outputting the throughput numbers as JSON for later comparison.
+#
+# ========================================================================
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import Zip2Src2Tgt
+
+# handle incoming parameters,
+# pushing their values into the
+# args dictionary for later usage
+
+arg_parser = argparse.ArgumentParser(description='Benchmark the conversion of synthetic FracFocus-style zip archive(s)')
+
+arg_parser.add_argument('--bench_path',
+                        type=str,
+                        default=None,
+                        help='benchmark working path (default is a temporary directory, removed afterwards)')
+arg_parser.add_argument('--members',
+                        type=int,
+                        default=4,
+                        help='number of source files within the synthetic zip archive')
+arg_parser.add_argument('--rows',
+                        type=int,
+                        default=50000,
+                        help='number of rows per source file')
+arg_parser.add_argument('--cols',
+                        type=int,
+                        default=24,
+                        help='number of columns per source file (at least the FracFocus-style columns)')
+arg_parser.add_argument('--cas_numbers',
+                        type=int,
+                        default=2000,
+                        help='number of distinct CAS numbers in the source files')
+arg_parser.add_argument('--tox_share',
+                        type=float,
+                        default=0.5,
+                        help='share of the CAS numbers found in the toxicities file')
+arg_parser.add_argument('--special_share',
+                        type=float,
+                        default=0.02,
+                        help='share of the free-text values holding cp1252 quotes, tabs, non-breaking or double spaces')
+arg_parser.add_argument('--newline_share',
+                        type=float,
+                        default=0.005,
+                        help='share of the free-text values holding embedded newlines')
+arg_parser.add_argument('--seed',
+                        type=int,
+                        default=20171004,
+                        help='random seed, for reproducible synthetic data')
+arg_parser.add_argument('--workers',
+                        type=int,
+                        default=0,
+                        help='number of worker processes for the parallel modes (0 for one per CPU)')
+arg_parser.add_argument('--repeat',
+                        type=int,
+                        default=3,
+                        help='number of times each benchmark is run, the fastest run being reported')
+arg_parser.add_argument('--modes',
+                        type=str,
+                        nargs='*',
+                        default=None,
+                        help='names of the benchmarks to be run (default is all of them)')
+arg_parser.add_argument('--output',
+                        type=str,
+                        default=None,
+                        help='JSON results file name (default is the standard output)')
+
+
+# FracFocus-style columns of the synthetic source files,
+# any others being filled in as generic numeric columns
+
+FRACFOCUS_COL_NAMES = ['pKey',
+                       'JobStartDate',
+                       'JobEndDate',
+                       'APINumber',
+                       'StateNumber',
+                       'CountyNumber',
+                       'OperatorName',
+                       'WellName',
+                       'Latitude',
+                       'Longitude',
+                       'Projection',
+                       'StateName',
+                       'CountyName',
+                       'TotalBaseWaterVolume',
+                       'TradeName',
+                       'Supplier',
+                       'Purpose',
+                       'IngredientName',
+                       'CASNumber',
+                       'PercentHFJob']
+
+# characters the converter transforms, as they appear
+# when cp1252 text was decoded as latin-1 on its way in
+
+SPECIAL_CHARS = [u'\x91', u'\x92', u'\x93', u'\x94', u'\xa0', '\t', '  ']
+
+WORDS = ['acid', 'water', 'sand', 'guar', 'gum', 'friction', 'reducer', 'biocide',
+         'surfactant', 'scale', 'inhibitor', 'crosslinker', 'breaker', 'iron', 'control',
+         'clay', 'stabilizer', 'gelling', 'agent', 'solvent', 'buffer', 'proppant']
+
+
+# random, but valid, CAS registry number, i.e.
+# with a matching check digit
+
+def cas_number(rnd):
+    body = str(rnd.randint(50, 9999999))
+    check = sum(int(digit) * (position + 1) for position, digit in enumerate(reversed(body))) % 10
+    return '%s-%s-%d' % (body[:-2], body[-2:], check)
+
+
+# random free-text value, sometimes holding characters to be
+# transformed by the converter, or newlines to be quoted
+
+def free_text(rnd, special_share, newline_share):
+    words = [rnd.choice(WORDS) for _i in range(rnd.randint(1, 4))]
+    if rnd.random() < special_share:
+        words.insert(rnd.randint(0, len(words)), rnd.choice(SPECIAL_CHARS))
+    if rnd.random() < newline_share:
+        words.insert(rnd.randint(0, len(words)), rnd.choice(['\n', '\r\n']))
+    return ' '.join(words).title()
+
+
+def synthetic_row(rnd, row, col_names, cas_numbers, special_share, newline_share):
+    values = {'pKey': str(row),
+              'JobStartDate': '%d/%d/%d 12:00:00 AM' % (rnd.randint(1, 12), rnd.randint(1, 28), rnd.randint(2011, 2017)),
+              'JobEndDate': '%d/%d/%d 12:00:00 AM' % (rnd.randint(1, 12), rnd.randint(1, 28), rnd.randint(2011, 2017)),
+              'APINumber': '%02d%03d%05d0000' % (rnd.randint(1, 50), rnd.randint(1, 999), rnd.randint(0, 99999)),
+              'StateNumber': str(rnd.randint(1, 50)),
+              'CountyNumber': str(rnd.randint(1, 999)),
+              'OperatorName': free_text(rnd, special_share, newline_share),
+              'WellName': free_text(rnd, special_share, newline_share),
+              'Latitude': '%.6f' % rnd.uniform(25, 49),
+              'Longitude': '%.6f' % rnd.uniform(-124, -67),
+              'Projection': rnd.choice(['NAD27', 'NAD83', 'WGS84']),
+              'StateName': rnd.choice(['Texas', 'Oklahoma', 'Colorado', 'North Dakota', 'Pennsylvania']),
+              'CountyName': free_text(rnd, special_share, newline_share),
+              'TotalBaseWaterVolume': str(rnd.randint(0, 20000000)),
+              'TradeName': free_text(rnd, special_share, newline_share),
+              'Supplier': free_text(rnd, special_share, newline_share),
+              'Purpose': free_text(rnd, special_share, newline_share),
+              'IngredientName': free_text(rnd, special_share, newline_share),
+              'CASNumber': rnd.choice(cas_numbers),
+              'PercentHFJob': '%.8f' % rnd.uniform(0, 100)}
+    return [values[col_name] if col_name in values else '%.4f' % rnd.uniform(0, 1000) for col_name in col_names]
+
+
+# generate the synthetic zip archive (alternately storing and
+# deflating its members) and matching toxicities file
+
+def generate(zip_path,
+             tox_path,
+             members,
+             rows,
+             cols,
+             cas_number_count,
+             tox_share,
+             special_share,
+             newline_share,
+             seed):
+
+    rnd = random.Random(seed)
+
+    col_names = list(FRACFOCUS_COL_NAMES)
+    while len(col_names) < cols:
+        col_names.append('Col%02d' % len(col_names))
+
+    cas_numbers = sorted(set(cas_number(rnd) for _i in range(cas_number_count)))
+
+    for path in (zip_path, tox_path):
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    tox_file_name = os.path.join(tox_path, 'tox.csv')
+    with io.open(tox_file_name, 'w', newline='') as tox_file:
+        csv_writer = csv.writer(tox_file)
+        csv_writer.writerow(['tox_cas_edf_id', 'tox_recognized', 'tox_suspected'])
+        for cas in cas_numbers:
+            if rnd.random() < tox_share:
+                csv_writer.writerow([cas,
+                                     ','.join(rnd.sample(['Cancer', 'Endocrine', 'Respiratory', 'Skin'], rnd.randint(1, 2))),
+                                     ','.join(rnd.sample(['Kidney', 'Liver', 'Neuro', 'Reproductive'], rnd.randint(0, 2)))])
+
+    zip_file_name = os.path.join(zip_path, 'FracFocusCSV.zip')
+    src_bytes = 0
+    with zipfile.ZipFile(zip_file_name, 'w') as zh:
+        for member in range(members):
+            text = io.StringIO(newline='')
+            csv_writer = csv.writer(text)
+            csv_writer.writerow(col_names)
+            for row in range(rows):
+                csv_writer.writerow(synthetic_row(rnd, member * rows + row, col_names, cas_numbers, special_share, newline_share))
+            data = text.getvalue().encode('utf-8')
+            src_bytes += len(data)
+            info = zipfile.ZipInfo('FracFocusRegistry_%d.csv' % (member + 1),
+                                   (2017, 10, 4, 0, 0, 2 * member))
+            info.compress_type = zipfile.ZIP_STORED if member % 2 else zipfile.ZIP_DEFLATED
+            zh.writestr(info, data)
+
+    return zip_file_name, tox_file_name, src_bytes
+
+
+# load the toxicities file into the same
+# lookup dictionary that main() would build
+
+def load_tox_dict(tox_file_name):
+    tox_dict = {}
+    with io.open(tox_file_name, 'r', newline='') as tox_file:
+        for row in csv.DictReader(tox_file):
+            tox_dict[row['tox_cas_edf_id']] = (row['tox_recognized'],
+                                               row['tox_suspected'])
+    return tox_dict
+
+
+# run a benchmark the specified number of
+# times, returning its fastest elapsed time
+
+def best_time(repeat, setup, run):
+    elapsed_times = []
+    for _i in range(repeat):
+        setup()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start_time = time.perf_counter()
+            run()
+            elapsed_times.append(time.perf_counter() - start_time)
+    return min(elapsed_times)
+
+
+def count_target_rows(tgt_path):
+    rows = 0
+    for file_name in sorted(os.listdir(tgt_path)):
+        with io.open(os.path.join(tgt_path, file_name), 'r', newline='') as tgt_file:
+            rows += sum(1 for _row in csv.reader(tgt_file))
+    return rows
+
+
+def bench(bench_path,
+          members,
+          rows,
+          cols,
+          cas_number_count,
+          tox_share,
+          special_share,
+          newline_share,
+          seed,
+          workers,
+          repeat,
+          modes):
+
+    if workers < 1:
+        workers = os.cpu_count() or 1
+
+    zip_path = os.path.join(bench_path, 'ZIPs')
+    src_path = os.path.join(bench_path, 'CSVs')
+    tgt_path = os.path.join(bench_path, 'TGTs')
+    tox_path = os.path.join(bench_path, 'TOXs')
+
+    start_time = time.perf_counter()
+    zip_file_name, tox_file_name, src_bytes = generate(zip_path,
+                                                       tox_path,
+                                                       members,
+                                                       rows,
+                                                       cols,
+                                                       cas_number_count,
+                                                       tox_share,
+                                                       special_share,
+                                                       newline_share,
+                                                       seed)
+    generate_secs = time.perf_counter() - start_time
+
+    with zipfile.ZipFile(zip_file_name) as zh:
+        member_names = [info.filename for info in zh.infolist()]
+        # the first source file, extracted to disk,
+        # for benchmarking the single-file stages
+        src_file_name = zh.extract(member_names[0], src_path)
+    src_file_bytes = os.path.getsize(src_file_name)
+    tox_dict = load_tox_dict(tox_file_name)
+
+    def reset_tgt_path():
+        if os.path.exists(tgt_path):
+            shutil.rmtree(tgt_path)
+        os.makedirs(tgt_path)
+
+    def decompress():
+        with zipfile.ZipFile(zip_file_name) as zh:
+            for member_name in member_names:
+                with zh.open(member_name) as member_file:
+                    while member_file.read(1024 * 1024):
+                        pass
+
+    def parse():
+        with io.open(src_file_name, 'r', newline='') as src_file:
+            for _row in csv.reader(src_file):
+                pass
+
+    def convert_file(**kwargs):
+        src2tgt_file_kwargs = dict(char_xform_tuples_list=Zip2Src2Tgt.char_xform_tuples_list,
+                                   chunk_workers=1)
+        src2tgt_file_kwargs.update(kwargs)
+        return lambda: Zip2Src2Tgt.src2tgt_file(src_file_name,
+                                                os.path.join(tgt_path, 'src2tgt_file.csv'),
+                                                **src2tgt_file_kwargs)
+
+    def convert_zip(**kwargs):
+        main_kwargs = dict(tox_path=tox_path,
+                           tox_file_name='tox.csv',
+                           char_xform_tuples_list=Zip2Src2Tgt.char_xform_tuples_list,
+                           workers=1,
+                           chunk_workers=1)
+        main_kwargs.update(kwargs)
+        return lambda: Zip2Src2Tgt.main(zip_path, src_path, tgt_path, **main_kwargs)
+
+    # (name, target, bytes processed, function) benchmarks, the
+    # stages first, then the single file and the whole archive
+    benchmarks = [('decompress', 'zipfile', src_bytes, decompress),
+                  ('parse', 'csv.reader', src_file_bytes, parse),
+                  ('src2tgt_file', 'src2tgt_file', src_file_bytes, convert_file(tox_dict=tox_dict)),
+                  ('src2tgt_file_no_tox', 'src2tgt_file', src_file_bytes, convert_file(tox_dict={})),
+                  ('src2tgt_file_no_xforms', 'src2tgt_file', src_file_bytes, convert_file(tox_dict=tox_dict, char_xform_tuples_list=[])),
+                  ('src2tgt_file_pipeline', 'src2tgt_file', src_file_bytes, convert_file(tox_dict=tox_dict, pipeline=True)),
+                  ('src2tgt_file_batch', 'src2tgt_file', src_file_bytes, convert_file(tox_dict=tox_dict, batch_rows=10000)),
+                  ('src2tgt_file_chunked', 'src2tgt_file', src_file_bytes, convert_file(tox_dict=tox_dict,
+                                                                                        chunk_workers=workers,
+                                                                                        chunk_size=max(1, src_file_bytes // workers))),
+                  ('main_stream', 'main', src_bytes, convert_zip()),
+                  ('main_extract', 'main', src_bytes, convert_zip(src_extract_to_disk=True)),
+                  ('main_no_tox', 'main', src_bytes, convert_zip(tox_path=None, tox_file_name=None)),
+                  ('main_no_tox_cache', 'main', src_bytes, convert_zip(tox_no_cache=True)),
+                  ('main_pipeline', 'main', src_bytes, convert_zip(pipeline=True)),
+                  ('main_workers', 'main', src_bytes, convert_zip(workers=workers)),
+                  ('main_chunk_workers', 'main', src_bytes, convert_zip(chunk_workers=workers))]
+
+    results = []
+    for name, target, bench_bytes, run in benchmarks:
+        if modes and name not in modes:
+            continue
+        secs = best_time(repeat, reset_tgt_path, run)
+        result = {'name': name,
+                  'target': target,
+                  'secs': round(secs, 6),
+                  'bytes': bench_bytes,
+                  'mb_per_sec': round(bench_bytes / secs / 1024 / 1024, 3) if secs > 0 else None}
+        # the rows written by the conversions, header rows included
+        if target in ('main', 'src2tgt_file'):
+            tgt_rows = count_target_rows(tgt_path)
+            result['rows'] = tgt_rows
+            result['rows_per_sec'] = round(tgt_rows / secs, 1) if secs > 0 else None
+        results.append(result)
+        print('%s: %.3f secs' % (name, secs), file=sys.stderr)
+
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'workers': workers,
+            'repeat': repeat,
+            'data': {'members': members,
+                     'rows': rows,
+                     'cols': cols,
+                     'cas_numbers': cas_number_count,
+                     'tox_share': tox_share,
+                     'special_share': special_share,
+                     'newline_share': newline_share,
+                     'seed': seed,
+                     'src_bytes': src_bytes,
+                     'generate_secs': round(generate_secs, 6)},
+            'results': results}
+
+
+# invoke benchmark routine
+
+if __name__ == '__main__':
+
+    args = arg_parser.parse_args()
+
+    bench_path = args.bench_path
+    if bench_path is None:
+        bench_path = tempfile.mkdtemp(prefix='zip2src2tgt_bench_')
+    elif bench_path.startswith('~'):
+        bench_path = os.path.expanduser(bench_path)
+
+    try:
+        results = bench(bench_path,
+                        args.members,
+                        args.rows,
+                        args.cols,
+                        args.cas_numbers,
+                        args.tox_share,
+                        args.special_share,
+                        args.newline_share,
+                        args.seed,
+                        args.workers,
+                        args.repeat,
+                        args.modes)
+    finally:
+        if args.bench_path is None:
+            shutil.rmtree(bench_path)
+
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with io.open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)